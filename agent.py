@@ -1,196 +1,364 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
-from openai import OpenAI
 from dotenv import load_dotenv
 import json
 from datetime import datetime
 import time
 from config import *
+from history import ConversationHistory
+from response_cache import CachedUsage, CacheMiss
+import clients
 import traceback
+import re
 # 设置标准输出编码为UTF-8
 sys.stdout.reconfigure(encoding='utf-8')
 
+
+class ReplyError(Exception):
+    """API 返回了无法使用的回复（没有 choices / 内容为空）"""
+
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符按 1 个计，其余按 4 字符 1 个计"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    rest = len(text) - cjk
+    return cjk + (rest + 3) // 4
+
+
 class MultiTurnChatAgent:
-    def __init__(self, api_key = None, base_url = "", model = "deepseek-r1",stream_mode = True, system_prompt = None):
+    def __init__(self, api_key = None, base_url = "", model = "deepseek-r1",stream_mode = True, system_prompt = None, json_mode = False):
         """初始化多轮对话代理"""
         if api_key is None:
             load_dotenv()
-            self.client = OpenAI(
-                api_key=os.getenv("DASHSCOPE_API_KEY"),
-                base_url= base_url,
-            )
-        else:
-            self.client = OpenAI(
-                api_key=api_key,
-                base_url=base_url,
-            )
+            api_key = os.getenv("DASHSCOPE_API_KEY")
+        # 同一 (base_url, api_key) 的客户端全进程共享（见 clients.py），异步客户端在异步请求时按事件循环取
+        self.api_key = api_key
+        self.base_url = base_url
+        self.client = clients.get_client(api_key, base_url)
         
-        # 初始化对话历史
-        if system_prompt:
-            self.conversation_history = [{'role': 'system', 'content': system_prompt},
-                                         {'role': 'system', 'content': 'Important events are below:\n'}]
-        else:
-            self.conversation_history = [
-                {'role': 'system', 
-                'content':  (
+        # 初始化对话历史：系统提示 + 事件块 + 最近 MAX_HISTORY_LENGTH 条消息（见 history.py）
+        if not system_prompt:
+            system_prompt = (
                 'You must reply in the same language as the user input: '
                 'if the user speaks Chinese, reply in Chinese; '
                 'if the user speaks English, reply in English.\n'
                 '你必须与用户使用相同语言回答：用户用中文就用中文回答，用户用英文就用英文回答。\n\n'
                 'You are a helpful assistant. Answering user questions correctly is your highest priority, if you are answring valuable questions, you need to give more than 400 words detailed answer to explain'
-            )},
-            {'role': 'system', 'content': 'Important events are below:\n'}
-            ]
+            )
+        self.history = ConversationHistory(system_prompt, MAX_HISTORY_LENGTH)
         
         # 配置参数
         self.model = model
         self.max_history_length = MAX_HISTORY_LENGTH # 最大保留的对话轮数
         self.stream_mode = stream_mode # 默认使用流式回复
+        self.call_log = [] # 每次调用的请求长度 / 实际输出长度
+        self.json_mode = json_mode # 服务端是否支持 response_format=json_object
+        self.usage_hook = None # 每次调用后回调 usage_hook(record)，用于 token / 费用统计
+        self.response_cache = None # 响应缓存（见 response_cache.py），None = 不使用
+        self.rate_limit = None # 异步请求的限额 {"rpm": .., "concurrency": ..}（见 clients.py），None = 不限
+
+        # 共享的全局事件日志（见 event_log.py）；未挂接时沿用 history.events 中的事件文本
+        self.event_log = None
+        self.event_viewer = None
+        self.event_cursor = 0
+
+    @property
+    def conversation_history(self):
+        """对话历史的只读快照（list of dict，含 timestamp）"""
+        return self.history.to_list()
 
     def set_system_prompt(self, prompt):
-        """设置系统提示语"""
-        self.conversation_history[0]['content'] = prompt
+        """设置系统提示语：字符串，或由共享段组成的 tuple（请求时才拼接）"""
+        self.history.set_system(prompt)
 
-    def append_global_event(self, text, max_events=20):
-        if len(self.conversation_history) < 2:
-            self.conversation_history.append({'role': 'system', 'content': ""})
+    def attach_event_log(self, log, viewer):
+        """挂接共享事件日志：只看挂接之后、viewer 可见的事件，请求时才渲染"""
+        self.event_log = log
+        self.event_viewer = viewer
+        self.event_cursor = len(log)
 
-        # 用 "\n" 保证不会粘在一起
-        current = self.conversation_history[1]['content']
+    def _events_suffix(self):
+        if self.event_log is None:
+            return ""
+        return self.event_log.render(self.event_viewer, since=self.event_cursor)
 
-        # 分割成事件列表
-        events = current.split("\n") if current else []
+    def build_api_messages(self):
+        """发送给 API 的消息（不包含 timestamp），事件块在此时才从共享日志渲染"""
+        return self.history.api_view(self._events_suffix())
 
-        # 追加新事件
-        events.append(text.strip())
+    def export_history(self):
+        """保存用的对话历史：事件块渲染成文本"""
+        return self.history.to_list(self._events_suffix())
 
-        # 只保留最近 max_events 条
-        events = events[-max_events:]
+    def append_global_event(self, text, max_events=20):
+        """未挂接共享事件日志时使用：事件块只保留最近 max_events 行"""
+        current = self.history.events.content
 
-        # 回写
-        self.conversation_history[1]['content'] = "\n".join(events)
+        # 分割成事件列表，追加新事件，只保留最近 max_events 条
+        events = current.split("\n") if current else []
+        events.append(text.strip())
+        self.history.set_events("\n".join(events[-max_events:]))
 
-        
     def add_message(self, role, content):
-        """添加消息到对话历史"""
-        self.conversation_history.append({
-            'role': role,
-            'content': content,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # 保持对话历史在合理长度内（保留system消息）
-        if len(self.conversation_history) > self.max_history_length + 1:
-            # 保留system消息和最近的对话
-            system_msg = self.conversation_history[0]
-            event_msg = self.conversation_history[1] if len(self.conversation_history) > 1 else None
-            recent_messages = self.conversation_history[2:][-self.max_history_length:]
-
-            self.conversation_history = [system_msg]
-            if event_msg:
-                self.conversation_history.append(event_msg)
-            self.conversation_history += recent_messages
-
-    def get_response_batch(self, user_input):
-        """获取AI批量回复（一次性返回完整回复）"""
+        """添加消息到对话历史（超出 max_history_length 时自动丢弃最旧的）"""
+        self.history.append(role, content)
+
+    def pin_message(self, key, role, content):
+        """置顶消息（如自我介绍汇总），不参与裁剪"""
+        self.history.pin(key, role, content)
+
+    def _request_params(self, profile, schema=None):
+        """
+        把调用配置（profile）转换成 API 参数。
+        profile 形如 {'name': 'speech', 'max_tokens': 100, 'temperature': 0.8, 'stop': [...]}，
+        缺省项回落到 config.py 中的全局 MAX_TOKENS / TEMPERATURE。
+        schema 不为空且服务端支持 JSON mode 时，要求返回 JSON 对象。
+        """
+        profile = profile or {}
+        params = {
+            'temperature': profile.get('temperature', TEMPERATURE),
+            'max_tokens': profile.get('max_tokens') or MAX_TOKENS,
+        }
+        if profile.get('stop'):
+            params['stop'] = profile['stop']
+        if schema is not None and self.json_mode:
+            params['response_format'] = {'type': 'json_object'}
+        return params
+
+    def _cache_lookup(self, messages, params):
+        """查响应缓存：返回 (key, entry)，entry 为 None 时需要请求 API"""
+        if self.response_cache is None:
+            return None, None
+        return self.response_cache.lookup(self.model, params, messages)
+
+    def _cache_store(self, key, content, finish_reason=None, usage=None):
+        if self.response_cache is not None:
+            self.response_cache.store(key, content, finish_reason, usage)
+
+    def _record_call(self, profile, params, messages, content, usage=None, finish_reason=None, cached=False):
+        """
+        记录一次调用：请求的 max_tokens、输入 / 输出 token 数。
+        服务端返回 usage 时以其为准，否则（如流式）按文本估算。
+        cached=True 表示回复来自响应缓存（token 数沿用录制时的 usage）。
+        """
+        prompt_tokens = getattr(usage, 'prompt_tokens', None)
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(m['content']) for m in messages)
+        output_tokens = getattr(usage, 'completion_tokens', None)
+        if output_tokens is None:
+            output_tokens = estimate_tokens(content)
+
+        record = {
+            'call_type': (profile or {}).get('name', 'default'),
+            'max_tokens': params['max_tokens'],
+            'prompt_tokens': prompt_tokens,
+            'output_tokens': output_tokens,
+            'output_chars': len(content or ''),
+            'finish_reason': finish_reason,
+            'cached': cached,
+        }
+        self.call_log.append(record)
+        if self.usage_hook is not None:
+            self.usage_hook(record)
+
+    # ---------------- 请求：同步 / 异步两种传输，缓存和记账逻辑共用 ----------------
+    @staticmethod
+    def _unpack(completion):
+        """非流式返回 -> (content, usage, finish_reason)"""
+        if not hasattr(completion, "choices") or not completion.choices:
+            raise ReplyError(f"API 未返回 choices，请检查模型配置。\n完整返回：{completion}")
+        content = completion.choices[0].message.content
+        if not content:
+            raise ReplyError(f"choices[0].message.content 为空。\n完整返回：{completion}")
+        return content, getattr(completion, "usage", None), getattr(completion.choices[0], "finish_reason", None)
+
+    @staticmethod
+    def _read_chunk(chunk):
+        """流式分片 -> (文本, finish_reason)"""
+        # 过滤掉空包
+        if not chunk.choices or len(chunk.choices) == 0:
+            return "", None
+        finish_reason = getattr(chunk.choices[0], "finish_reason", None)
+        # finish_reason 阶段没有 content
+        return getattr(chunk.choices[0].delta, "content", None) or "", finish_reason
+
+    def _create(self, messages, params, stream):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=stream,
+            **params,
+        )
+        if not stream:
+            return self._unpack(response)
+
+        full_response = ""
+        finish_reason = None
+        for chunk in response:
+            text, reason = self._read_chunk(chunk)
+            full_response += text
+            finish_reason = reason or finish_reason
+        return full_response, None, finish_reason
+
+    async def _create_async(self, messages, params, stream):
+        """异步请求：使用当前事件循环共享的客户端，并按 (base_url, model) 限流"""
+        client = clients.get_async_client(self.api_key, self.base_url)
+        limiter = clients.get_limiter(self.base_url, self.model, self.rate_limit)
+        if limiter is None:
+            return await self._call_async(client, messages, params, stream)
+
+        # 按估算的输入 token 预占额度，结束后按实际用量结算
+        reserved = sum(estimate_tokens(m['content']) for m in messages)
+        used = reserved
+        await limiter.acquire(reserved)
         try:
-            # 添加用户消息到历史
-            self.add_message('user', user_input)
-            
-            # 准备发送给API的消息（不包含timestamp）
-            api_messages = [
-                {'role': msg['role'], 'content': msg['content']} 
-                for msg in self.conversation_history
-            ]
-            
-            # 调用API（非流式）
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=api_messages,
-                temperature=TEMPERATURE,
-                max_tokens=MAX_TOKENS,
-                stream=False,
-            )
-            
-            # 获取回复
-            if not hasattr(completion, "choices") or not completion.choices:
-                return f"发生错误: API 未返回 choices，请检查模型配置。\n完整返回：{completion}"
+            content, usage, finish_reason = await self._call_async(client, messages, params, stream)
+            used = getattr(usage, 'total_tokens', None) or reserved + estimate_tokens(content)
+            return content, usage, finish_reason
+        finally:
+            limiter.release(reserved, used)
+
+    async def _call_async(self, client, messages, params, stream):
+        response = await client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=stream,
+            **params,
+        )
+        if not stream:
+            return self._unpack(response)
 
+        full_response = ""
+        finish_reason = None
+        async for chunk in response:
+            text, reason = self._read_chunk(chunk)
+            full_response += text
+            finish_reason = reason or finish_reason
+        return full_response, None, finish_reason
 
-            response_content = completion.choices[0].message.content
-            if not response_content:
-                return f"发生错误: choices[0].message.content 为空。\n完整返回：{completion}"
+    def _request(self, messages, params, stream=False):
+        """缓存命中直接返回，否则请求 API 并写入缓存：(content, usage, finish_reason, cached)"""
+        key, cached = self._cache_lookup(messages, params)
+        if cached is not None:
+            return cached["content"], CachedUsage(cached["usage"]), cached["finish_reason"], True
+        content, usage, finish_reason = self._create(messages, params, stream)
+        self._cache_store(key, content, finish_reason, usage)
+        return content, usage, finish_reason, False
 
+    async def _request_async(self, messages, params, stream=False):
+        key, cached = self._cache_lookup(messages, params)
+        if cached is not None:
+            return cached["content"], CachedUsage(cached["usage"]), cached["finish_reason"], True
+        content, usage, finish_reason = await self._create_async(messages, params, stream)
+        self._cache_store(key, content, finish_reason, usage)
+        return content, usage, finish_reason, False
 
-            
+    def _accept(self, profile, params, messages, reply, keep_history=True):
+        """记账；keep_history 时把回复写入对话历史"""
+        content, usage, finish_reason, cached = reply
+        self._record_call(profile, params, messages, content, usage=usage, finish_reason=finish_reason, cached=cached)
+        if keep_history:
+            self.history.release_view()
             # 添加AI回复到历史
-            self.add_message('assistant', response_content)
-            
-            return response_content
-            
-        except Exception as e:
+            self.add_message('assistant', content)
+        return content
 
-            full_stack = traceback.format_exc()
-            return f"发生错误: {str(e)}\n\n==== 详细错误堆栈 ====\n{full_stack}"
-    
-    def get_response_stream(self, user_input):
-        """获取AI流式回复（逐字符显示）"""
+    @staticmethod
+    def _error(e, label="详细错误堆栈"):
+        """请求失败时作为回复返回的错误文本（replay 模式的 CacheMiss 不走这里，直接抛给调用方）"""
+        if isinstance(e, ReplyError):
+            return f"发生错误: {e}"
+        full_stack = traceback.format_exc()
+        return f"发生错误: {str(e)}\n\n==== {label} ====\n{full_stack}"
+
+    def get_response_batch(self, user_input, profile=None, schema=None):
+        """获取AI批量回复（一次性返回完整回复）"""
         try:
             # 添加用户消息到历史
             self.add_message('user', user_input)
-            
+
             # 准备发送给API的消息（不包含timestamp）
-            api_messages = [
-                {'role': msg['role'], 'content': msg['content']} 
-                for msg in self.conversation_history
-            ]
-            
-            # 调用API（流式）
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=api_messages,
-                temperature=TEMPERATURE,
-                max_tokens=MAX_TOKENS,
-                stream=True,
-            )
-            
-            # 收集完整回复内容
-            full_response = ""
-            
-            # 逐块处理流式回复
-            for chunk in stream:
+            api_messages = self.build_api_messages()
+            params = self._request_params(profile, schema)
+            return self._accept(profile, params, api_messages, self._request(api_messages, params))
+        except CacheMiss:
+            raise
+        except Exception as e:
+            return self._error(e)
 
-                # 过滤掉空包
-                if not chunk.choices or len(chunk.choices) == 0:
-                    continue
+    async def get_response_batch_async(self, user_input, profile=None, schema=None):
+        try:
+            self.add_message('user', user_input)
+            api_messages = self.build_api_messages()
+            params = self._request_params(profile, schema)
+            reply = await self._request_async(api_messages, params)
+            return self._accept(profile, params, api_messages, reply)
+        except CacheMiss:
+            raise
+        except Exception as e:
+            return self._error(e)
 
-                delta = chunk.choices[0].delta
+    def get_oneshot_response(self, messages, profile=None, schema=None):
+        """一次性请求：不读写对话历史（多人设批量推理等场景），messages 由调用方给出"""
+        try:
+            params = self._request_params(profile, schema)
+            return self._accept(profile, params, messages, self._request(messages, params), keep_history=False)
+        except CacheMiss:
+            raise
+        except Exception as e:
+            return self._error(e)
 
-                # finish_reason 阶段没有 content
-                if not getattr(delta, "content", None):
-                    continue
+    async def get_oneshot_response_async(self, messages, profile=None, schema=None):
+        try:
+            params = self._request_params(profile, schema)
+            reply = await self._request_async(messages, params)
+            return self._accept(profile, params, messages, reply, keep_history=False)
+        except CacheMiss:
+            raise
+        except Exception as e:
+            return self._error(e)
 
-                content = delta.content
-                full_response += content
+    def get_response_stream(self, user_input, profile=None):
+        """获取AI流式回复（收集完整文本后返回；缓存命中时直接返回）"""
+        try:
+            self.add_message('user', user_input)
+            api_messages = self.build_api_messages()
+            params = self._request_params(profile)
+            return self._accept(profile, params, api_messages, self._request(api_messages, params, stream=True))
+        except CacheMiss:
+            raise
+        except Exception as e:
+            return self._error(e, "流式详细堆栈")
 
-            #print()  # 换行
-            
-            # 添加AI回复到历史
-            self.add_message('assistant', full_response)
-            
-            return full_response
-            
+    async def get_response_stream_async(self, user_input, profile=None):
+        try:
+            self.add_message('user', user_input)
+            api_messages = self.build_api_messages()
+            params = self._request_params(profile)
+            reply = await self._request_async(api_messages, params, stream=True)
+            return self._accept(profile, params, api_messages, reply)
+        except CacheMiss:
+            raise
         except Exception as e:
-            full_stack = traceback.format_exc()
-            return f"发生错误: {str(e)}\n\n==== 流式详细堆栈 ====\n{full_stack}"
-    
-    def get_response(self, user_input):
+            return self._error(e, "流式详细堆栈")
+
+    def get_response(self, user_input, profile=None):
         """根据当前模式获取AI回复"""
         if self.stream_mode:
-            return self.get_response_stream(user_input)
+            return self.get_response_stream(user_input, profile)
         else:
-            return self.get_response_batch(user_input)
+            return self.get_response_batch(user_input, profile)
+
+    async def get_response_async(self, user_input, profile=None):
+        if self.stream_mode:
+            return await self.get_response_stream_async(user_input, profile)
+        return await self.get_response_batch_async(user_input, profile)
     
     def toggle_mode(self):
         """切换回复模式"""
@@ -217,7 +385,7 @@ class MultiTurnChatAgent:
     
     def clear_history(self):
         """清除对话历史（保留system消息）"""
-        self.conversation_history = [self.conversation_history[0]]
+        self.history.clear()
         print("对话历史已清除！")
     
     def save_conversation(self, filename=None):
@@ -227,8 +395,7 @@ class MultiTurnChatAgent:
             filename = f"conversation_{timestamp}.json"
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.conversation_history, f, ensure_ascii=False, indent=2)
+            self.history.dump(filename, self._events_suffix())
             print(f"对话已保存到: {filename}")
         except Exception as e:
             print(f"保存失败: {str(e)}")
@@ -236,8 +403,7 @@ class MultiTurnChatAgent:
     def load_conversation(self, filename):
         """从文件加载对话"""
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                self.conversation_history = json.load(f)
+            self.history = ConversationHistory.load(filename, self.max_history_length)
             print(f"对话已从 {filename} 加载")
         except Exception as e:
             print(f"加载失败: {str(e)}")
@@ -0,0 +1,234 @@
+"""
+无人值守的批量对局（命令行 / 库）：按配置文件连续跑 N 局全 LLM 对局，每局得到一个 GameResult。
+模型只在开始时创建一次（默认不发 "hi" 测试请求），之后各局复用同一批座位，只清空对话历史。
+
+配置文件（JSON）：
+{
+    "models": "llm_configs.json",          // 或直接写 {名字: {"base_url": ..., "model": ...}}
+    "bots": {"bot": {"policy": "heuristic", "seed": 0}},   // 可选：脚本机器人
+    "players": 8,                          // 座位数（缺省 = 每个模型 / 机器人一个座位）
+    "games": 10,
+    "seed": 1,                             // 第 i 局的种子为 seed + i（缺省随机）
+    "validate": false,                     // 是否先对每个模型发一次测试请求
+    "cache": {"mode": "readthrough", "path": "response_cache.sqlite"},  // 可选：响应缓存
+    "game": {"language": "English", "post_game_summary": false},      // GameManager 参数
+    "concurrency": 1,                      // 同时进行的对局数（>1 时在一个事件循环里并发）
+    "output": "batch_results.jsonl"        // 每局结果写一行
+}
+
+    python batch_runner.py batch.json --games 20 --seed 100
+    python batch_runner.py batch.json --games 200 --concurrency 32
+
+并发模式下每局有自己的一套 agent（对话历史互不干扰），HTTP 连接池和各模型的 "rate_limit"
+在同一事件循环里的所有对局之间共享（见 clients.py）。
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import traceback
+
+from llm_manager import LLMManager
+from role_manager import RoleManager
+from game import GameManager
+from response_cache import ResponseCache
+
+# 批量对局的 GameManager 默认参数（配置中的 "game" 可覆盖）
+DEFAULT_GAME_KWARGS = {"quiet": True, "save_history": False}
+
+
+def build_llm_manager(config):
+    """按配置创建 LLMManager：模型（默认不验证）+ 脚本机器人 + 可选的响应缓存"""
+    cache_cfg = config.get("cache")
+    cache = ResponseCache(**cache_cfg) if cache_cfg else ResponseCache.from_env()
+    manager = LLMManager(response_cache=cache)
+
+    models = config.get("models") or {}
+    if isinstance(models, str):
+        manager.load_configs(models)
+        models = dict(manager.configs)
+    else:
+        manager.configs = {name: dict(cfg) for name, cfg in models.items()}
+
+    validate = config.get("validate", False)
+    for name, cfg in models.items():
+        if cfg.get("bot"):
+            continue
+        if not manager.add_llm(name, cfg["base_url"], cfg["model"], validate=validate):
+            raise RuntimeError(f"模型 {name} 验证失败")
+
+    for name, cfg in (config.get("bots") or {}).items():
+        manager.add_bot(name, policy=cfg.get("policy", "heuristic"), seed=cfg.get("seed"),
+                        keep_history=cfg.get("keep_history", False))
+
+    if not manager.llm_dict:
+        raise ValueError("配置中没有任何模型或机器人")
+    return manager
+
+
+def seat_rng(seed):
+    """抽选模型 / 排座位用的随机数：只由批次种子决定，顺序、并发和多进程模式下每局的座位都一样"""
+    return random.Random(None if seed is None else f"{seed}:seats")
+
+
+def run_games(llm_manager, games, players=None, seed=None, game_kwargs=None, on_result=None):
+    """
+    连续跑 games 局，返回 (results, failures)。
+    on_result(i, result) 在每局结束后调用（如写文件）；单局异常记入 failures，不影响后续对局。
+    """
+    kwargs = dict(DEFAULT_GAME_KWARGS)
+    kwargs.update(game_kwargs or {})
+
+    role_manager = RoleManager(llm_manager=llm_manager, rng=seat_rng(seed))
+    role_manager.add_llm_agents(player_number=players)
+    seats = list(role_manager.slots)
+
+    results = []
+    failures = []
+    for i in range(games):
+        # 各局复用同一批 agent，只清空对话历史；座位恢复初始顺序（上一局分配角色时打乱过）
+        role_manager.slots[:] = seats
+        for slot in seats:
+            slot.llm_obj.history.clear()
+
+        game_seed = None if seed is None else seed + i
+        try:
+            gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=game_seed, **kwargs)
+            result = gm.game()
+        except Exception as e:
+            failures.append({"game": i, "seed": game_seed, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+            continue
+
+        results.append(result)
+        if on_result is not None:
+            on_result(i, result)
+    return results, failures
+
+
+async def play_game_async(config, seed=None, players=None, game_kwargs=None, response_cache=None, batch_seed=None):
+    """
+    按 config 新建一套 agent（不做验证请求）并以协程跑完一局，返回 GameResult。
+    batch_seed 为批次种子（决定抽选哪些模型入座，见 seat_rng）。
+    """
+    kwargs = dict(DEFAULT_GAME_KWARGS)
+    kwargs.update(game_kwargs or {})
+    llm_manager = build_llm_manager(dict(config, validate=False, cache={"mode": "off"}))
+    llm_manager.response_cache = response_cache
+    for agent in llm_manager.llm_dict.values():
+        if hasattr(agent, "response_cache"):
+            agent.response_cache = response_cache
+    role_manager = RoleManager(llm_manager=llm_manager, rng=seat_rng(batch_seed))
+    role_manager.add_llm_agents(player_number=players)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=seed, **kwargs)
+    return await gm.game_async()
+
+
+async def run_games_async(config, games, concurrency=8, players=None, seed=None, game_kwargs=None,
+                          on_result=None, response_cache=None):
+    """
+    在当前事件循环里并发跑 games 局（同时最多 concurrency 局），返回 (results, failures)，结果按局号排序。
+    每局按 config 新建一套 agent（不做验证请求）；response_cache 为各局共用的缓存。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = {}
+    failures = []
+
+    async def one(i):
+        game_seed = None if seed is None else seed + i
+        async with semaphore:
+            try:
+                result = await play_game_async(config, game_seed, players, game_kwargs, response_cache, seed)
+            except Exception as e:
+                failures.append({"game": i, "seed": game_seed, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+                return
+        results[i] = result
+        if on_result is not None:
+            on_result(i, result)
+
+    await asyncio.gather(*(one(i) for i in range(games)))
+    failures.sort(key=lambda f: f["game"])
+    return [results[i] for i in sorted(results)], failures
+
+
+def summarize(results, failures=(), elapsed=None):
+    wins = {}
+    for r in results:
+        side = r.winner.split()[0]
+        wins[side] = wins.get(side, 0) + 1
+    n = len(results)
+    elapsed = elapsed if elapsed is not None else sum(r.timings["total"] for r in results)
+    return {
+        "games": n,
+        "failed": len(failures),
+        "wins": wins,
+        "avg_nights": sum(r.nights for r in results) / n if n else 0.0,
+        "avg_seconds": sum(r.timings["total"] for r in results) / n if n else 0.0,
+        "games_per_hour": n / elapsed * 3600 if elapsed else 0.0,
+        "calls": sum(r.usage["calls"] for r in results),
+        "total_tokens": sum(r.usage["total_tokens"] for r in results),
+        "cost": round(sum(r.usage["cost"] for r in results), 6),
+        "cached_calls": sum(r.usage["cached_calls"] for r in results),
+    }
+
+
+def make_reporter(out, games):
+    """on_result 回调：结果写入 out（JSON Lines，可为 None），进度打印到 stderr"""
+    def on_result(i, result):
+        if out:
+            out.write(json.dumps(result.to_dict(), ensure_ascii=False) + "\n")
+            out.flush()
+        print(f"[{i + 1}/{games}] seed={result.seed} winner={result.winner} "
+              f"nights={result.nights} {result.timings['total']:.1f}s "
+              f"tokens={result.usage['total_tokens']}", file=sys.stderr)
+    return on_result
+
+
+def run_batch(config, games=None, seed=None, output=None, concurrency=None):
+    """库入口：按配置跑完整批，返回 (results, summary)"""
+    games = games if games is not None else config.get("games", 1)
+    seed = seed if seed is not None else config.get("seed")
+    output = output if output is not None else config.get("output")
+    concurrency = concurrency if concurrency is not None else config.get("concurrency", 1)
+
+    llm_manager = build_llm_manager(config)
+    out = open(output, "a", encoding="utf-8") if output else None
+    on_result = make_reporter(out, games)
+
+    start = time.perf_counter()
+    try:
+        if concurrency > 1:
+            results, failures = asyncio.run(run_games_async(
+                config, games, concurrency, config.get("players"), seed, config.get("game"), on_result,
+                response_cache=llm_manager.response_cache,
+            ))
+        else:
+            results, failures = run_games(
+                llm_manager, games, config.get("players"), seed, config.get("game"), on_result
+            )
+    finally:
+        if out:
+            out.close()
+        if llm_manager.response_cache is not None:
+            llm_manager.response_cache.close()
+
+    for f in failures:
+        print(f"[game {f['game']} seed={f['seed']}] failed: {f['error']}", file=sys.stderr)
+    return results, summarize(results, failures, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="无人值守批量对局")
+    parser.add_argument("config", help="批量对局配置文件（JSON）")
+    parser.add_argument("--games", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="结果文件（JSON Lines），覆盖配置中的 output")
+    parser.add_argument("--concurrency", type=int, default=None, help="同时进行的对局数，覆盖配置中的 concurrency")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    _, summary = run_batch(config, args.games, args.seed, args.output, args.concurrency)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
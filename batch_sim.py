@@ -0,0 +1,282 @@
+"""
+数组化的批量对局引擎：成千上万局同时按 game() 的阶段顺序推进
+（狼人夜杀 → 狼人胜利判定 → 女巫 → 夜晚结算 / 猎人 → 公投 / 小丑 / 猎人 → 好人胜利判定）。
+所有玩家都按 random 策略行动（与 bots.RandomPolicy 相同的分布），预言家查验和发言不影响随机策略，因此省略。
+
+状态全部是 NumPy 数组：roles (G, N)、alive (G, N)、女巫药水 (G,)、每轮的票数 (G, N)。
+角色配置用 role_allocation.allocate_batch，与 RoleManager.generate_role_list 规则一致。
+
+    python batch_sim.py --players 8 --games 1000000
+    python batch_sim.py --players 8 --check 2000     # 与对象引擎（脚本机器人）对比胜率
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+import role_allocation
+
+DEFAULT_ROLE_COUNTS = {"villager": 2, "werewolf": 2, "seer": 1, "witch": 1, "hunter": 1, "jester": 1}
+
+ONGOING, WEREWOLVES, VILLAGERS, JESTER, UNFINISHED = 0, 1, 2, 3, 4
+WINNER_NAMES = {WEREWOLVES: "Werewolves", VILLAGERS: "Villagers", JESTER: "Jester", UNFINISHED: "Unfinished"}
+
+
+class BatchSimulator:
+    def __init__(self, players, role_counts=None, seed=None, max_nights=50, single_roles=("witch", "jester")):
+        self.players = players
+        self.role_counts = dict(role_counts or DEFAULT_ROLE_COUNTS)
+        self.gen = np.random.default_rng(seed)
+        self.max_nights = max_nights
+        self.single_roles = single_roles
+
+    # ---------------- 随机选择 ----------------
+    def _pick(self, candidates, allow_none=False):
+        """
+        每行在 candidates 为 True 的座位中均匀选一个，返回座位号；
+        allow_none=True 时“放弃”也算一个选项（返回 -1），没有候选的行返回 -1。
+        """
+        keys = np.where(candidates, self.gen.random(candidates.shape), -1.0)
+        pick = keys.argmax(axis=1)
+        n = candidates.sum(axis=1)
+        if allow_none:
+            skip = self.gen.random(len(n)) * (n + 1) < 1.0
+        else:
+            skip = np.zeros(len(n), dtype=bool)
+        return np.where((n > 0) & ~skip, pick, -1)
+
+    def _tally(self, voters, alive):
+        """每个 voter 在存活玩家中（除自己）均匀投一票，返回票数 (G, N)"""
+        g, n = alive.shape
+        tally = np.zeros((g, n), dtype=np.int32)
+        for j in range(n):
+            rows = np.flatnonzero(voters[:, j])
+            if not len(rows):
+                continue
+            cand = alive[rows].copy()
+            cand[:, j] = False
+            target = self._pick(cand)
+            ok = target >= 0
+            np.add.at(tally, (rows[ok], target[ok]), 1)
+        return tally
+
+    def _top(self, tally):
+        """最高票座位：(唯一最高票的座位或 -1, 平票时随机选一个最高票座位或 -1)"""
+        mx = tally.max(axis=1)
+        tied = (tally == mx[:, None]) & (mx[:, None] > 0)
+        unique = np.where(tied.sum(axis=1) == 1, tied.argmax(axis=1), -1)
+        return unique, self._pick(tied)
+
+    # ---------------- 死亡与猎人 ----------------
+    def _kill(self, rows, seats, can_shoot):
+        """rows 局中的 seats 座位死亡；猎人（can_shoot）在存活者中选一个带走，可连锁"""
+        while len(rows):
+            self.alive[rows, seats] = False
+            shooters = can_shoot & (self.roles[rows, seats] == self.hunter)
+            rows = rows[shooters]
+            if not len(rows):
+                return
+            target = self._pick(self.alive[rows], allow_none=True)
+            ok = target >= 0
+            rows, seats = rows[ok], target[ok]
+            can_shoot = np.ones(len(rows), dtype=bool)    # 被猎人带走的猎人也能开枪
+
+    # ---------------- 主循环 ----------------
+    def run(self, games):
+        """模拟 games 局，返回 (setups, winners)：setups 为每局的角色计数 (G, R)，winners 为胜方编码"""
+        role_names, counts = role_allocation.allocate_batch(
+            self.role_counts, self.players, games, self.gen, self.single_roles
+        )
+        self.role_names = role_names
+        code = {r: i for i, r in enumerate(role_names)}
+        self.wolf, self.hunter = code["werewolf"], code.get("hunter", -1)
+        witch, jester = code.get("witch", -1), code.get("jester", -1)
+
+        # 计数向量展开成座位上的角色，再按行随机打乱
+        n = self.players
+        bounds = np.cumsum(counts, axis=1)
+        seats = np.arange(n)
+        roles = (seats[None, None, :] >= bounds[:, :, None]).sum(axis=1)
+        order = np.argsort(self.gen.random((games, n)), axis=1)
+        self.roles = np.take_along_axis(roles, order, axis=1)
+
+        self.alive = np.ones((games, n), dtype=bool)
+        heal_left = np.ones(games, dtype=bool)
+        poison_left = np.ones(games, dtype=bool)
+        winner = np.zeros(games, dtype=np.int8)
+        is_wolf = self.roles == self.wolf
+        # 每轮的 (进入该夜的局数, 这些局的存活总数, 进入白天的局数, 这些局的存活总数)，供 length_profile 使用
+        self.trace = []
+
+        for night in range(1, self.max_nights + 1):
+            active = winner == ONGOING
+            if not active.any():
+                break
+            night_games, night_alive = int(active.sum()), int(self.alive[active].sum())
+
+            # ---- 狼人夜杀：平票随机，没人投票则随机一个存活玩家 ----
+            tally = self._tally(self.alive & is_wolf & active[:, None], self.alive)
+            _, kill = self._top(tally)
+            fallback = active & (kill < 0)
+            kill[fallback] = self._pick(self.alive[fallback])
+
+            # ---- 狼人胜利判定（夜杀结算之前）----
+            n_alive = self.alive.sum(axis=1)
+            n_wolf = (self.alive & is_wolf).sum(axis=1)
+            winner[active & (n_alive - 2 * n_wolf <= 0)] = WEREWOLVES
+            active = winner == ONGOING
+
+            # ---- 女巫：救 / 毒一次决定，不能救和毒同一个人 ----
+            heal = np.zeros(games, dtype=bool)
+            poison = np.full(games, -1)
+            has_witch = active & (self.alive & (self.roles == witch)).any(axis=1)
+            can_heal = has_witch & heal_left
+            can_poison = has_witch & poison_left
+            todo = np.flatnonzero(can_heal | can_poison)
+            while len(todo):
+                h = can_heal[todo] & (self.gen.random(len(todo)) < 0.5)
+                p = np.where(can_poison[todo], self._pick(self.alive[todo], allow_none=True), -1)
+                heal[todo], poison[todo] = h, p
+                todo = todo[h & (p == kill[todo])]
+            heal_left &= ~heal
+            poison_left &= ~(poison >= 0)
+
+            # ---- 夜晚结算：按座位顺序，毒死的猎人不能开枪 ----
+            dead_kill = np.zeros_like(self.alive)
+            rows = np.flatnonzero(active & ~heal)
+            dead_kill[rows, kill[rows]] = True
+            dead_poison = np.zeros_like(self.alive)
+            rows = np.flatnonzero(active & (poison >= 0))
+            dead_poison[rows, poison[rows]] = True
+            for j in range(n):
+                rows = np.flatnonzero((dead_kill[:, j] | dead_poison[:, j]) & self.alive[:, j])
+                if len(rows):
+                    self._kill(rows, np.full(len(rows), j), ~dead_poison[rows, j])
+
+            self.trace.append((night_games, night_alive, int(active.sum()), int(self.alive[active].sum())))
+
+            # ---- 白天公投：唯一最高票出局，平票无人出局 ----
+            tally = self._tally(self.alive & active[:, None], self.alive)
+            out, _ = self._top(tally)
+            rows = np.flatnonzero(active & (out >= 0))
+            seats_out = out[rows]
+            jester_out = self.roles[rows, seats_out] == jester
+            self.alive[rows[jester_out], seats_out[jester_out]] = False
+            winner[rows[jester_out]] = JESTER
+            rows, seats_out = rows[~jester_out], seats_out[~jester_out]
+            self._kill(rows, seats_out, np.ones(len(rows), dtype=bool))
+
+            # ---- 好人胜利判定 ----
+            active = winner == ONGOING
+            winner[active & ~(self.alive & is_wolf).any(axis=1)] = VILLAGERS
+
+        winner[winner == ONGOING] = UNFINISHED
+        return counts, winner
+
+
+def win_rates(winners):
+    total = len(winners)
+    return {WINNER_NAMES[c]: float((winners == c).sum()) / total for c in WINNER_NAMES if (winners == c).any()}
+
+
+def win_rates_by_setup(role_names, setups, winners):
+    """每种角色配置的局数和胜率：[(配置 dict, 局数, 胜率 dict)]，按局数降序"""
+    keys, inverse = np.unique(setups, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    result = []
+    for k, setup in enumerate(keys):
+        mask = inverse == k
+        result.append((
+            {r: int(c) for r, c in zip(role_names, setup) if c},
+            int(mask.sum()),
+            win_rates(winners[mask]),
+        ))
+    result.sort(key=lambda item: -item[1])
+    return result
+
+
+def simulate(players, games, role_counts=None, seed=None):
+    sim = BatchSimulator(players, role_counts, seed)
+    setups, winners = sim.run(games)
+    return {
+        "players": players,
+        "games": games,
+        "win_rates": win_rates(winners),
+        "by_setup": win_rates_by_setup(sim.role_names, setups, winners),
+    }
+
+
+def length_profile(players, role_counts=None, games=20000, seed=0):
+    """
+    随机策略下对局长度的期望：每轮一个 (进入该夜的概率, 该夜平均存活, 进入该白天的概率, 该白天平均存活)，
+    用于 usage.estimate_game 按期望局长估算调用次数。
+    """
+    sim = BatchSimulator(players, role_counts, seed)
+    sim.run(games)
+    return [
+        (ng / games, na / ng, dg / games, da / dg if dg else 0.0)
+        for ng, na, dg, da in sim.trace
+    ]
+
+
+def run_object_engine(players, games, seed=0):
+    """对象引擎（GameManager + random 策略的脚本机器人）跑 games 局，返回胜率"""
+    from llm_manager import LLMManager
+    from role_manager import RoleManager
+    from game import GameManager
+
+    counts = {}
+    for g in range(games):
+        lm = LLMManager()
+        for i in range(players):
+            lm.add_bot(f"bot{i}", policy="random", seed=f"{seed}:{g}:{i}")
+        rm = RoleManager(llm_manager=lm)
+        rm.add_llm_agents(player_number=None)
+        gm = GameManager(llm_manager=lm, role_manager=rm, quiet=True, save_history=False, seed=seed * games + g)
+        gm.game()
+        name = gm.winner.split()[0]
+        counts[name] = counts.get(name, 0) + 1
+    return {k: v / games for k, v in counts.items()}
+
+
+def check_equivalence(players, object_games=2000, batch_games=200_000, seed=0, z_max=4.0):
+    """
+    对比两套引擎的胜率：每个胜方的差异按二项分布换算成 z 值，全部 |z| <= z_max 视为一致。
+    返回 (是否一致, {胜方: (对象引擎, 批量引擎, z)})
+    """
+    obj = run_object_engine(players, object_games, seed)
+    batch = simulate(players, batch_games, seed=seed)["win_rates"]
+
+    report = {}
+    ok = True
+    for name in sorted(set(obj) | set(batch)):
+        p_obj, p_batch = obj.get(name, 0.0), batch.get(name, 0.0)
+        p = (p_obj * object_games + p_batch * batch_games) / (object_games + batch_games)
+        se = math.sqrt(max(p * (1 - p), 1e-12) * (1 / object_games + 1 / batch_games))
+        z = (p_obj - p_batch) / se
+        report[name] = (p_obj, p_batch, z)
+        ok = ok and abs(z) <= z_max
+    return ok, report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量模拟随机策略对局的胜率")
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--games", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--check", type=int, default=0, help="同时用对象引擎跑这么多局并对比胜率")
+    args = parser.parse_args()
+
+    start = time.time()
+    result = simulate(args.players, args.games, seed=args.seed)
+    print(f"{args.games} games, {args.players} players, {time.time() - start:.1f}s")
+    print("win rates:", {k: round(v, 4) for k, v in result["win_rates"].items()})
+    for setup, n, rates in result["by_setup"][:10]:
+        print(f"{n:>8}  {setup}  {({k: round(v, 4) for k, v in rates.items()})}")
+
+    if args.check:
+        ok, report = check_equivalence(args.players, args.check, min(args.games, 200_000), args.seed or 0)
+        for name, (p_obj, p_batch, z) in report.items():
+            print(f"{name:<11} object={p_obj:.4f} batch={p_batch:.4f} z={z:+.2f}")
+        print("equivalent" if ok else "MISMATCH")
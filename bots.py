@@ -0,0 +1,246 @@
+"""
+不调用 LLM 的脚本机器人：
+接口与 MultiTurnChatAgent 一致（get_response / get_response_batch / get_oneshot_response /
+append_global_event / set_system_prompt ...），GameManager 不需要区分座位背后是模型还是脚本。
+结构化决策直接按传入的 schema 生成合法的 JSON，用于零成本地跑通整局、验证规则和做性能分析。
+
+策略：
+- "random"：在合法选项中均匀随机
+- "heuristic"：狼人不选同伴；好人优先选已查验的狼人和被投票最多的人；预言家优先查没查过的人
+"""
+import json
+import random
+import re
+
+import decision
+from history import ConversationHistory
+from config import MAX_HISTORY_LENGTH
+
+_SEER_RESULT_RE = re.compile(r"Seer result: (.+?) is (Werewolf|Not Werewolf)\.")
+
+
+class RandomPolicy:
+    name = "random"
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def pick(self, bot, key, spec, prompt):
+        choices = list(spec.get("choices") or [])
+        if spec.get("allow_empty", False):
+            choices.append("")
+        return self.rng.choice(choices) if choices else ""
+
+
+class HeuristicPolicy(RandomPolicy):
+    name = "heuristic"
+
+    def pick(self, bot, key, spec, prompt):
+        choices = list(spec.get("choices") or [])
+        if not choices:
+            return ""
+        if key == "heal":
+            return "yes" if self.rng.random() < 0.8 else "no"
+
+        game, me = bot.game, bot.slot
+        if game is None or me is None:
+            return super().pick(bot, key, spec, prompt)
+
+        known = bot.seer_results()
+        is_wolf = me.role.lower() == "werewolf"
+        checking = "check" in prompt.lower()
+        received = game.stats.votes_received()
+
+        def score(name):
+            slot = game.state.get(name)
+            if slot is None:
+                return -1.0
+            if is_wolf:
+                if slot.role.lower() == "werewolf":
+                    return -100.0
+                return received[game.stats.index[name]] * 0.5
+            if checking:
+                return -100.0 if name in known else 0.0
+            if known.get(name) is True:
+                return 100.0
+            if known.get(name) is False:
+                return -50.0
+            return received[game.stats.index[name]] * 0.5
+
+        scored = [(score(c) + self.rng.random(), c) for c in choices]
+        best_score, best = max(scored)
+
+        # 毒药只用在已查验的狼人身上
+        if key == "poison" and spec.get("allow_empty", False) and best_score < 50:
+            return ""
+        return best
+
+
+POLICIES = {"random": RandomPolicy, "heuristic": HeuristicPolicy}
+
+
+class ScriptedAgent:
+    reads_prompts = False   # 不读提示文本，GameManager 可以跳过只为模型准备的检索块
+
+    def __init__(self, policy="heuristic", seed=None, model=None, keep_history=False, system_prompt=""):
+        self.rng = random.Random(seed)
+        self.policy = POLICIES[policy](self.rng)
+        self.model = model or f"bot-{self.policy.name}"
+        self.client = None
+        self.json_mode = True
+        self.stream_mode = False
+        self.keep_history = keep_history    # False 时不保存对话，纯引擎模拟最快
+        self.max_history_length = MAX_HISTORY_LENGTH
+        self.history = ConversationHistory(system_prompt, MAX_HISTORY_LENGTH)
+        self.call_log = []
+        self.usage_hook = None
+        self.event_log = None
+        self.event_viewer = None
+        self.event_cursor = 0
+
+        # GameManager 绑定的座位和对局，启发式策略从这里读取私有信息
+        self.slot = None
+        self.game = None
+
+    # ---------------- 与 MultiTurnChatAgent 相同的接口 ----------------
+    @property
+    def conversation_history(self):
+        return self.history.to_list()
+
+    def bind(self, slot, game):
+        """
+        绑定到本局的座位；决策用的随机数按 (对局种子, 座位号) 重新播种，
+        同一种子下无论顺序、并发还是多进程跑，机器人的选择都相同（构造时的 seed 只在未绑定对局时生效）
+        """
+        self.slot = slot
+        self.game = game
+        self.rng.seed(f"{game.seed}:{game.stats.index[slot.player_name]}")
+
+    def attach_event_log(self, log, viewer):
+        self.event_log = log
+        self.event_viewer = viewer
+        self.event_cursor = len(log)
+
+    def set_system_prompt(self, prompt):
+        self.history.set_system(prompt)
+
+    def append_global_event(self, text, max_events=20):
+        pass
+
+    def add_message(self, role, content):
+        if self.keep_history:
+            self.history.append(role, content)
+
+    def pin_message(self, key, role, content):
+        if self.keep_history:
+            self.history.pin(key, role, content)
+
+    def clear_history(self):
+        self.history.clear()
+
+    def export_history(self):
+        suffix = self.event_log.render(self.event_viewer, since=self.event_cursor) if self.event_log else ""
+        return self.history.to_list(suffix)
+
+    def get_response(self, user_input, profile=None):
+        call_type = (profile or {}).get("name", "default")
+        reply = self._speak(call_type)
+        self._record(profile, user_input, reply)
+        return reply
+
+    def get_response_batch(self, user_input, profile=None, schema=None):
+        if schema is None:
+            return self.get_response(user_input, profile)
+        reply = json.dumps(self._decide(schema, user_input, self.slot), ensure_ascii=False)
+        self._record(profile, user_input, reply)
+        return reply
+
+    def get_oneshot_response(self, messages, profile=None, schema=None):
+        """多人设批量请求：schema 为 {座位名: schema}，逐个座位按各自的信息作答"""
+        prompt = messages[-1]["content"] if messages else ""
+        if schema is None:
+            return self._speak((profile or {}).get("name", "default"))
+        game = self.game
+        reply = {
+            name: self._decide(s, prompt, game.state.get(name) if game else None)
+            for name, s in schema.items()
+        }
+        text = json.dumps(reply, ensure_ascii=False)
+        self._record(profile, None, text)
+        return text
+
+    # ---------------- 内部 ----------------
+    def _record(self, profile, user_input, reply):
+        if self.keep_history and user_input is not None:
+            self.history.append("user", user_input)
+            self.history.append("assistant", reply)
+        record = {
+            "call_type": (profile or {}).get("name", "default"),
+            "max_tokens": (profile or {}).get("max_tokens") or 0,
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+            "output_chars": len(reply),
+            "finish_reason": "stop",
+        }
+        self.call_log.append(record)
+        if self.usage_hook is not None:
+            self.usage_hook(record)
+
+    def _decide(self, schema, prompt, seat):
+        """按 schema 生成合法决策；有跨字段校验时最多重抽几次"""
+        bot = self if seat is self.slot else _SeatView(self, seat)
+        data = {}
+        for _ in range(5):
+            data = {}
+            for key, spec in schema.items():
+                if key.startswith("__"):
+                    continue
+                if spec.get("choices") is None:
+                    data[key] = self._speak(key)
+                else:
+                    data[key] = self.policy.pick(bot, key, spec, prompt)
+            if decision.validate(data, schema)[1] is None:
+                break
+        return data
+
+    def _speak(self, call_type):
+        name = self.slot.player_name if self.slot else "bot"
+        if call_type == "intro":
+            return f"Hi, I am {name}. Let's find the wolves."
+        if call_type == "speech":
+            target = self._suspect()
+            return f"I think {target} is suspicious." if target else "No strong read yet."
+        if call_type == "last_words":
+            return "Good luck, everyone."
+        return "Good game."
+
+    def _suspect(self):
+        if self.game is None or self.slot is None:
+            return None
+        names = [n for n in self.game.state.alive_names if n != self.slot.player_name]
+        if not names:
+            return None
+        spec = {"choices": names}
+        return self.policy.pick(self, "target", spec, "")
+
+    def seer_results(self):
+        """本座位可见的查验结果：{名字: 是否狼人}"""
+        if self.game is None or self.slot is None:
+            return {}
+        results = {}
+        for item in self.game.memory.private_items(self.slot.player_name, limit=50):
+            m = _SEER_RESULT_RE.search(item.text)
+            if m:
+                results[m.group(1)] = m.group(2) == "Werewolf"
+        return results
+
+
+class _SeatView:
+    """批量请求里代替其他座位作答时，让策略看到该座位自己的信息"""
+
+    def __init__(self, bot, seat):
+        self.game = bot.game
+        self.slot = seat
+
+    def seer_results(self):
+        return ScriptedAgent.seer_results(self)
@@ -0,0 +1,157 @@
+"""
+共享的 API 客户端与限流器：
+- 同步客户端：同一 (base_url, api_key) 全进程共用一个 OpenAI 实例（线程安全，复用连接池）
+- 异步客户端和限流器：按事件循环共用，同一个事件循环里并发的所有对局共享连接和额度
+  （异步连接池和 asyncio 原语都绑定在创建它们的事件循环上，不能跨循环复用）
+
+限流按 (base_url, model) 计，配置来自 llm_configs.json 中每个模型的
+"rate_limit": {"rpm": 每分钟请求数, "concurrency": 同时在途的请求数, "tpm": 每分钟 token 数}（0 = 不限）。
+多进程运行时（farm.py）用 set_limiter_factory 换成跨进程共享额度的限流器。
+"""
+import asyncio
+import collections
+import threading
+import time
+import weakref
+
+from openai import AsyncOpenAI, OpenAI
+
+_lock = threading.Lock()
+_sync_clients = {}
+_per_loop = weakref.WeakKeyDictionary()     # 事件循环 -> {"clients": {...}, "limiters": {...}}
+_limiter_factory = None                     # None = 进程内的 RateLimiter
+
+
+def get_client(api_key, base_url):
+    key = (base_url, api_key)
+    with _lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = _sync_clients[key] = OpenAI(api_key=api_key, base_url=base_url)
+        return client
+
+
+def _loop_state():
+    loop = asyncio.get_running_loop()
+    state = _per_loop.get(loop)
+    if state is None:
+        state = _per_loop[loop] = {"clients": {}, "limiters": {}}
+    return state
+
+
+def get_async_client(api_key, base_url):
+    """当前事件循环中共享的 AsyncOpenAI 客户端"""
+    clients = _loop_state()["clients"]
+    key = (base_url, api_key)
+    if key not in clients:
+        clients[key] = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    return clients[key]
+
+
+class Quota:
+    """
+    一个 endpoint 的额度状态（不做等待，只做判断）：
+    try_acquire 成功返回 0 并占用一个名额，否则返回建议的重试等待秒数；请求结束后 release。
+    tpm 按最近 60 秒的滑动窗口计：请求前按估算的输入 token 预占，结束后按实际用量补差。
+    """
+    POLL = 0.02     # 并发名额占满时的轮询间隔
+
+    def __init__(self, rpm=0, concurrency=0, tpm=0):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self.concurrency = concurrency or 0
+        self.tpm = tpm or 0
+        self.in_flight = 0
+        self.granted = 0
+        self._next = 0.0
+        self._window = collections.deque()     # (时间, token 数)
+        self._window_tokens = 0
+
+    def _expire(self, now):
+        while self._window and self._window[0][0] <= now - 60.0:
+            self._window_tokens -= self._window.popleft()[1]
+
+    def try_acquire(self, tokens=0, now=None):
+        now = time.monotonic() if now is None else now
+        if self.concurrency and self.in_flight >= self.concurrency:
+            return self.POLL
+        if self.tpm:
+            self._expire(now)
+            # 窗口为空时总是放行，避免单个超大请求永远等不到
+            if self._window and self._window_tokens + tokens > self.tpm:
+                return max(self._window[0][0] + 60.0 - now, self.POLL)
+        if self.interval and self._next > now:
+            return self._next - now
+
+        self.in_flight += 1
+        self.granted += 1
+        if self.interval:
+            self._next = max(now, self._next) + self.interval
+        if self.tpm:
+            self._window.append((now, tokens))
+            self._window_tokens += tokens
+        return 0.0
+
+    def release(self, tokens=0, used=None, now=None):
+        self.in_flight = max(0, self.in_flight - 1)
+        if self.tpm and used is not None and used != tokens:
+            now = time.monotonic() if now is None else now
+            self._window.append((now, used - tokens))
+            self._window_tokens += used - tokens
+
+    def stats(self):
+        return {"granted": self.granted, "in_flight": self.in_flight, "window_tokens": self._window_tokens}
+
+
+class RateLimiter:
+    """
+    进程内的异步限流器。
+    用法：await limiter.acquire(估算 token)；请求结束后 limiter.release(估算 token, 实际 token)。
+    也可以 async with limiter:（不计 token）
+    """
+
+    def __init__(self, rpm=0, concurrency=0, tpm=0):
+        self.quota = Quota(rpm, concurrency, tpm)
+        self.waited = 0.0       # 累计因限流等待的秒数
+
+    async def acquire(self, tokens=0):
+        while True:
+            delay = self.quota.try_acquire(tokens)
+            if not delay:
+                return
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+    def release(self, tokens=0, used=None):
+        self.quota.release(tokens, used)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+        return False
+
+
+def set_limiter_factory(factory):
+    """
+    替换限流器的创建方式：factory(base_url, model, rate_limit) -> 带 acquire / release 的限流器。
+    传 None 恢复为进程内的 RateLimiter。
+    """
+    global _limiter_factory
+    _limiter_factory = factory
+
+
+def get_limiter(base_url, model, rate_limit=None):
+    """当前事件循环中 (base_url, model) 的限流器；没有配置限额时返回 None"""
+    if not rate_limit:
+        return None
+    limiters = _loop_state()["limiters"]
+    key = (base_url, model)
+    if key not in limiters:
+        if _limiter_factory is not None:
+            limiters[key] = _limiter_factory(base_url, model, rate_limit)
+        else:
+            limiters[key] = RateLimiter(rate_limit.get("rpm", 0), rate_limit.get("concurrency", 0),
+                                        rate_limit.get("tpm", 0))
+    return limiters[key]
@@ -0,0 +1,187 @@
+"""
+结构化决策：
+- extract_json：从模型回复中容错地抽取 JSON 对象（代码块、前后多余文字、单引号等）
+- validate：按每种决策的 schema 校验并规范化
+- parse_decision：extract + validate，返回 (data, error)
+- output_budget：按 schema 估算一次完整回复需要的输出 token 数（max_tokens 的下限）
+
+schema 形如：
+{
+    "target": {"type": "str", "choices": [...], "allow_empty": False},
+    "reason": {"type": "str", "required": False, "default": "", "max_len": 200},
+}
+"""
+import ast
+import json
+import re
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.S)
+
+
+def _find_object(text):
+    """找到第一个括号平衡的 {...} 片段（忽略字符串内的括号）"""
+    start = text.find("{")
+    while start != -1:
+        depth = 0
+        quote = None
+        escaped = False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if quote:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == quote:
+                    quote = None
+                continue
+            if ch in "\"'":
+                # 单引号只在紧跟 { , : [ 之后才当作字符串开头，避免 they're 之类的撇号
+                if ch == "'" and text[:i].rstrip()[-1:] not in ("{", ",", ":", "["):
+                    continue
+                quote = ch
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start:i + 1]
+        start = text.find("{", start + 1)
+    return None
+
+
+def _loads(snippet):
+    try:
+        return json.loads(snippet)
+    except (ValueError, TypeError):
+        pass
+    # Python 字面量风格：{'target': 'Pine_12'}
+    try:
+        return ast.literal_eval(snippet)
+    except (ValueError, SyntaxError):
+        pass
+    # 兜底：把作为分隔符的单引号换成双引号，保留单词内部的撇号
+    fixed = re.sub(r"(?<=[{,:\[\s])'|'(?=\s*[}:,\]])", '"', snippet)
+    try:
+        return json.loads(fixed)
+    except (ValueError, TypeError):
+        return None
+
+
+def extract_json(raw):
+    """从模型回复中抽取第一个 JSON 对象，失败返回 None"""
+    if not isinstance(raw, str) or not raw.strip():
+        return None
+
+    candidates = [m.group(1) for m in _FENCE_RE.finditer(raw)] + [raw]
+    for text in candidates:
+        snippet = _find_object(text)
+        if snippet is None:
+            continue
+        data = _loads(snippet)
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def validate(data, schema):
+    """
+    按 schema 校验并规范化决策，返回 (clean, error)。
+    - choices 大小写不敏感，结果统一为 choices 中的原始写法
+    - allow_empty=True 时允许空字符串（表示放弃行动）
+    - schema 中的 "__check__" 是可选的跨字段校验函数：check(clean) -> error 或 None
+    """
+    if not isinstance(data, dict):
+        return None, "reply is not a JSON object"
+
+    clean = {}
+    for key, spec in schema.items():
+        if key.startswith("__"):
+            continue
+
+        value = data.get(key)
+        if value is None:
+            if spec.get("required", True):
+                return None, f'missing field "{key}"'
+            clean[key] = spec.get("default", "")
+            continue
+
+        if spec.get("type", "str") == "str":
+            value = str(value).strip()
+            if spec.get("max_len"):
+                value = value[:spec["max_len"]]
+
+        choices = spec.get("choices")
+        if choices is not None:
+            if value == "" and spec.get("allow_empty", False):
+                clean[key] = ""
+                continue
+            lookup = {str(c).lower(): c for c in choices}
+            if str(value).lower() not in lookup:
+                shown = list(choices)[:20]
+                return None, f'"{key}" must be one of {shown}' + (
+                    ' or ""' if spec.get("allow_empty", False) else "")
+            value = lookup[str(value).lower()]
+
+        clean[key] = value
+
+    check = schema.get("__check__")
+    if check:
+        error = check(clean)
+        if error:
+            return None, error
+
+    return clean, None
+
+
+def parse_decision(raw, schema):
+    """extract + validate，返回 (data, error)"""
+    if isinstance(raw, str) and raw.strip().startswith("发生错误:"):
+        return None, "request failed"
+    data = extract_json(raw)
+    if data is None:
+        return None, "no valid JSON object found"
+    return validate(data, schema)
+
+
+def schema_hint(schema):
+    """生成给模型看的 JSON 示例，例如 {"target": "<name>", "reason": "<short>"}"""
+    parts = []
+    for key, spec in schema.items():
+        if key.startswith("__"):
+            continue
+        hint = spec.get("hint")
+        if hint is None:
+            if spec.get("choices") is not None and len(spec["choices"]) <= 3:
+                hint = " | ".join(json.dumps(c, ensure_ascii=False) for c in spec["choices"])
+                parts.append(f'"{key}": {hint}')
+                continue
+            hint = "<name>" if spec.get("choices") is not None else "<short>"
+        parts.append(f'"{key}": "{hint}"')
+    return "{" + ", ".join(parts) + "}"
+
+
+def output_budget(schema, overhead=20):
+    """
+    一次合格回复需要的输出 token 数：JSON 框架 + 每个字段的键和最长取值。
+    自由文本按 max_len 个 token 计（中文约一字一 token，按最坏情况），没有 max_len 的按 60 计。
+    """
+    total = overhead
+    for key, spec in schema.items():
+        if key.startswith("__"):
+            continue
+        total += 4 + len(key) // 4
+        choices = spec.get("choices")
+        if choices is not None:
+            total += max((len(str(c)) for c in choices), default=0) // 2 + 2
+        else:
+            total += spec.get("max_len") or 60
+    return total
+
+
+def correction_message(error, schema):
+    """格式错误后的纠正提示，尽量短以降低重试成本"""
+    return (
+        f"Invalid reply: {error}. "
+        f"Reply again with ONLY one JSON object, no other text: {schema_hint(schema)}"
+    )
@@ -0,0 +1,70 @@
+"""
+白天讨论的可见窗口：
+- 每条发言在产生时生成一次单行摘要（digest），所有座位共用
+- 渲染时最近 K 条原文，更早的只给摘要（可限制条数、可只看提到自己的）
+这样每个发言者的提示长度有上界，一天的总 token 近似随人数线性增长。
+"""
+import re
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?。！？])\s*")
+_SPACE_RE = re.compile(r"\s+")
+
+
+class Speech:
+    __slots__ = ("name", "text", "digest", "mentions")
+
+    def __init__(self, name, text, digest, mentions):
+        self.name = name
+        self.text = text
+        self.digest = digest
+        self.mentions = mentions
+
+
+def _mentions(lowered_text, lowered_name):
+    """英文名按词边界匹配（避免 "A" 命中 "a wolf"），中文名直接子串匹配"""
+    if lowered_name.isascii():
+        return re.search(rf"(?<!\w){re.escape(lowered_name)}(?!\w)", lowered_text) is not None
+    return lowered_name in lowered_text
+
+
+def make_speech(name, text, known_names, digest_chars=80):
+    """生成发言记录：单行摘要 + 提到的玩家"""
+    flat = _SPACE_RE.sub(" ", text or "").strip()
+    first = _SENTENCE_END_RE.split(flat, maxsplit=1)[0] if flat else ""
+    if len(first) > digest_chars:
+        first = first[:digest_chars - 1] + "…"
+
+    lowered = flat.lower()
+    mentions = frozenset(
+        n for n in known_names
+        if n != name and _mentions(lowered, n.lower())
+    )
+    if mentions:
+        first += f" [mentions: {', '.join(sorted(mentions))}]"
+
+    return Speech(name, text, first, mentions)
+
+
+def render_visible(speeches, window, viewer=None, digest_max=None, mention_only=False):
+    """
+    speeches：按时间顺序的可见发言（Speech）
+    window：最近多少条给原文；更早的给摘要
+    digest_max：摘要最多保留多少条（取最近的）
+    mention_only：摘要部分只保留提到 viewer 的发言
+    """
+    recent = speeches[-window:] if window > 0 else []
+    older = speeches[:len(speeches) - len(recent)]
+
+    if mention_only and viewer is not None:
+        older = [s for s in older if viewer in s.mentions]
+    if digest_max is not None:
+        older = older[-digest_max:] if digest_max > 0 else []
+
+    lines = []
+    if older:
+        lines.append("Earlier (digest):")
+        lines += [f"- {s.name}: {s.digest}" for s in older]
+        if recent:
+            lines.append("Recent:")
+    lines += [f"{s.name}: {s.text}" for s in recent]
+    return "\n".join(lines)
@@ -0,0 +1,51 @@
+"""
+全局广播事件日志：一局只存一份，只追加。
+每个 agent 持有 (日志, 视角, 游标)，在构造请求时才按可见性取最近的若干条渲染，
+广播一条事件是 O(1)，内存也不再随座位数增长。
+"""
+
+
+class EventLog:
+    def __init__(self, max_events=10):
+        self.max_events = max_events    # 每次请求最多带最近多少条事件
+        self.events = []                # [(text, visible_to)]，visible_to=None 表示公开
+        self.private_count = 0
+        self._cache = {}                # 选中的事件下标 -> 渲染文本（日志增长时清空）
+        self._cache_len = 0
+
+    def __len__(self):
+        return len(self.events)
+
+    def append(self, text, visible_to=None):
+        if visible_to is not None:
+            visible_to = frozenset(visible_to)
+            self.private_count += 1
+        self.events.append((text.strip(), visible_to))
+
+    def select(self, viewer, since=0, limit=None):
+        """viewer 可见、下标 >= since 的最近 limit 条事件下标（按时间顺序）"""
+        limit = self.max_events if limit is None else limit
+        if not self.private_count:
+            return range(max(since, len(self.events) - limit), len(self.events))
+
+        picked = []
+        for i in range(len(self.events) - 1, since - 1, -1):
+            visible_to = self.events[i][1]
+            if visible_to is None or viewer in visible_to:
+                picked.append(i)
+                if len(picked) >= limit:
+                    break
+        return picked[::-1]
+
+    def render(self, viewer, since=0, limit=None):
+        """渲染成事件块文本；可见事件相同的视角共用同一个字符串"""
+        if self._cache_len != len(self.events):
+            self._cache.clear()
+            self._cache_len = len(self.events)
+
+        key = tuple(self.select(viewer, since, limit))
+        text = self._cache.get(key)
+        if text is None:
+            text = "\n".join(self.events[i][0] for i in key)
+            self._cache[key] = text
+        return text
@@ -0,0 +1,263 @@
+"""
+多进程对局农场：把批量对局分到多个工作进程（吃满所有核），各进程共享同一份 endpoint 额度。
+
+- 父进程启动一个额度代理（multiprocessing.managers 的本地 socket 服务），按 (base_url, model)
+  维护 rpm / 并发 / tpm 额度（clients.Quota）；工作进程里的限流器每次请求前向它申请名额，
+  所以 N 个进程加起来也不会超过 llm_configs.json 里配置的 "rate_limit"。
+- 工作进程从任务队列取局号，在自己的事件循环里同时跑 concurrency 局（batch_runner.play_game_async），
+  每局的 GameResult 立刻经结果队列流回父进程，由父进程写文件和汇总。
+- 响应缓存（SQLite WAL）由各进程各自打开同一个文件；容量合计记在库里，max_mb 是整个文件（整个农场）的上限。
+
+配置文件与 batch_runner.py 相同，另可写 "workers"（进程数，缺省 = CPU 核数）和 "concurrency"（每进程并发局数）。
+
+    python farm.py batch.json --games 200 --workers 8 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+
+import clients
+from batch_runner import make_reporter, play_game_async, summarize
+from response_cache import ResponseCache
+
+
+class QuotaBroker:
+    """
+    额度代理（运行在 manager 进程里，各连接由不同线程服务）。
+    判断用一把锁串行化：CPython 没有跨进程的原子比较交换，无锁的共享内存方案做不到；
+    锁只包住 O(1) 的额度判断，不跨任何 I/O，相比一次 API 请求可以忽略。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._quotas = {}
+        self._waits = {}
+
+    def acquire(self, key, rate_limit, tokens=0):
+        """申请一个名额：成功返回 0，否则返回建议的重试等待秒数"""
+        with self._lock:
+            quota = self._quotas.get(key)
+            if quota is None:
+                quota = self._quotas[key] = clients.Quota(
+                    rate_limit.get("rpm", 0), rate_limit.get("concurrency", 0), rate_limit.get("tpm", 0)
+                )
+                self._waits[key] = 0.0
+            delay = quota.try_acquire(tokens)
+            self._waits[key] += delay
+            return delay
+
+    def release(self, key, tokens=0, used=None):
+        with self._lock:
+            if key in self._quotas:
+                self._quotas[key].release(tokens, used)
+
+    def stats(self):
+        with self._lock:
+            return {
+                f"{model}@{base_url}": dict(quota.stats(), waited=round(self._waits[(base_url, model)], 3))
+                for (base_url, model), quota in self._quotas.items()
+            }
+
+
+_broker = None
+
+
+def _get_broker():
+    global _broker
+    if _broker is None:
+        _broker = QuotaBroker()
+    return _broker
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+BrokerManager.register("broker", callable=_get_broker)
+
+
+class BrokeredLimiter:
+    """
+    工作进程里的限流器：额度判断交给父进程的 QuotaBroker，等待在本地事件循环里完成。
+    代理调用是阻塞的 socket 往返，一律放到 executor 线程里执行，不阻塞本进程里的其他对局。
+    归还名额不等待结果，但排在 executor 里，进程退出前 executor.shutdown(wait=True) 会把它们全部送达代理，
+    否则代理里的并发 / tpm 占用会泄漏，之后的进程按没人占用的额度被限流。
+    """
+
+    def __init__(self, broker, key, rate_limit, executor=None):
+        self.broker = broker
+        self.key = key
+        self.rate_limit = dict(rate_limit)
+        self.executor = executor
+        self.waited = 0.0
+
+    async def acquire(self, tokens=0):
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = await loop.run_in_executor(self.executor, self.broker.acquire, self.key, self.rate_limit, tokens)
+            if not delay:
+                return
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+    def release(self, tokens=0, used=None):
+        # 不等待结果：归还名额不影响本请求；直接交给线程池，事件循环先关闭也不会丢
+        if self.executor is None:
+            self.broker.release(self.key, tokens, used)
+        else:
+            self.executor.submit(self.broker.release, self.key, tokens, used)
+
+
+def connect_limiters(address, authkey, max_workers=8):
+    """
+    在当前进程里把 clients 的限流器换成连到 address 处额度代理的 BrokeredLimiter。
+    返回额度请求用的线程池：进程退出前调用 shutdown(wait=True)，排队中的归还全部送达代理。
+    """
+    manager = BrokerManager(address=address, authkey=authkey)
+    manager.connect()
+    broker = manager.broker()
+    # 额度请求用独立的线程池，不和任务队列的阻塞读取抢默认 executor
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quota")
+    clients.set_limiter_factory(
+        lambda base_url, model, rate_limit: BrokeredLimiter(broker, (base_url, model), rate_limit, executor)
+    )
+    return executor
+
+
+def _worker(worker_id, config, tasks, results, address, authkey, concurrency, batch_seed):
+    """工作进程：连上额度代理，按 concurrency 个协程从任务队列取局号并跑完，结果放进结果队列"""
+    quota_executor = connect_limiters(address, authkey)
+
+    cache_cfg = config.get("cache")
+    cache = ResponseCache(**cache_cfg) if cache_cfg else ResponseCache.from_env()
+
+    async def consume():
+        loop = asyncio.get_running_loop()
+        while True:
+            task = await loop.run_in_executor(None, tasks.get)
+            if task is None:
+                return
+            i, seed = task
+            try:
+                result = await play_game_async(config, seed, config.get("players"), config.get("game"), cache,
+                                               batch_seed)
+            except Exception as e:
+                results.put(("failure", i, {"game": i, "seed": seed, "worker": worker_id, "error": f"{type(e).__name__}: {e}",
+                                            "traceback": traceback.format_exc()}))
+            else:
+                results.put(("result", i, result))
+
+    async def main():
+        await asyncio.gather(*(consume() for _ in range(max(1, concurrency))))
+
+    try:
+        asyncio.run(main())
+    finally:
+        quota_executor.shutdown(wait=True)
+        if cache is not None:
+            cache.close()
+
+
+def run_farm(config, games=None, workers=None, concurrency=None, seed=None, on_result=None):
+    """
+    在 workers 个进程中跑 games 局（每进程同时 concurrency 局），返回 (results, failures, rate_stats)。
+    on_result(i, result) 在父进程中按完成顺序调用；results 按局号排序。
+    """
+    games = games if games is not None else config.get("games", 1)
+    workers = workers or config.get("workers") or os.cpu_count() or 1
+    concurrency = concurrency or config.get("concurrency", 1)
+    seed = seed if seed is not None else config.get("seed")
+
+    authkey = secrets.token_bytes(16)
+    manager = BrokerManager(address=("127.0.0.1", 0), authkey=authkey)
+    manager.start()
+    ctx = mp.get_context("spawn")
+    tasks = ctx.Queue()
+    result_queue = ctx.Queue()
+    for i in range(games):
+        tasks.put((i, None if seed is None else seed + i))
+    for _ in range(workers * max(1, concurrency)):
+        tasks.put(None)
+
+    procs = [
+        ctx.Process(target=_worker, daemon=True,
+                    args=(w, config, tasks, result_queue, manager.address, authkey, concurrency, seed))
+        for w in range(workers)
+    ]
+    for p in procs:
+        p.start()
+
+    results = {}
+    failures = []
+    try:
+        while len(results) + len(failures) < games:
+            try:
+                kind, i, payload = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(p.is_alive() for p in procs):
+                    break
+                continue
+            if kind == "failure":
+                failures.append(payload)
+                continue
+            results[i] = payload
+            if on_result is not None:
+                on_result(i, payload)
+
+        # 工作进程异常退出时，未返回的局记为失败
+        done = set(results) | {f["game"] for f in failures}
+        failures.extend(
+            {"game": i, "seed": None if seed is None else seed + i, "error": "工作进程退出，对局未完成"}
+            for i in range(games) if i not in done
+        )
+        rate_stats = manager.broker().stats()
+    finally:
+        for p in procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        manager.shutdown()
+
+    failures.sort(key=lambda f: f["game"])
+    return [results[i] for i in sorted(results)], failures, rate_stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多进程批量对局")
+    parser.add_argument("config", help="批量对局配置文件（JSON，格式同 batch_runner.py）")
+    parser.add_argument("--games", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数（缺省 = CPU 核数）")
+    parser.add_argument("--concurrency", type=int, default=None, help="每个进程同时进行的对局数")
+    parser.add_argument("--output", default=None, help="结果文件（JSON Lines），覆盖配置中的 output")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    games = args.games if args.games is not None else config.get("games", 1)
+    output = args.output if args.output is not None else config.get("output")
+    out = open(output, "a", encoding="utf-8") if output else None
+    start = time.perf_counter()
+    try:
+        results, failures, rate_stats = run_farm(config, games, args.workers, args.concurrency, args.seed,
+                                                 make_reporter(out, games))
+    finally:
+        if out:
+            out.close()
+
+    for f in failures:
+        print(f"[game {f['game']} seed={f['seed']}] failed: {f['error']}", file=sys.stderr)
+    summary = summarize(results, failures, time.perf_counter() - start)
+    summary["rate_limits"] = rate_stats
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
@@ -1,8 +1,24 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import random
+import time
 import json
+import bisect
 import role_manager
 import os
+import decision
+import discussion
+import persona_batch
+import batch_sim
+from memory import EventMemory
+from event_log import EventLog
+from game_stats import GameStats, CAUSE_NAMES
+from game_state import GameState
+from usage import UsageTracker, estimate_game
+from prompt_templates import TEMPLATES
+from io_channel import ConsoleChannel, NullChannel
+from response_cache import CacheMiss
 
 PERSONALITY_RULES = """
 Personality only affects HOW you speak, not WHAT you decide.
@@ -48,6 +64,154 @@ General constraints:
 - Only use information you have actually seen.
 """
 
+# 每类调用的生成配置：max_tokens / temperature / stop
+# speech 的 max_tokens 为 None 时按 speech_length 推算
+DEFAULT_CALL_PROFILES = {
+    "intro":      {"max_tokens": 60,   "temperature": 0.9, "stop": ["\n\n"]},
+    "speech":     {"max_tokens": None, "temperature": 0.8, "stop": None},
+    "decision":   {"max_tokens": 80,   "temperature": 0.3, "stop": None},
+    "decision_retry": {"max_tokens": 80, "temperature": 0.0, "stop": None},
+    "compound":   {"max_tokens": 150,  "temperature": 0.5, "stop": None},
+    "persona_batch": {"max_tokens": None, "temperature": 0.7, "stop": None},
+    "last_words": {"max_tokens": 60,   "temperature": 0.9, "stop": ["\n\n"]},
+    "comment":    {"max_tokens": 120,  "temperature": 0.9, "stop": None},
+    "summary":    {"max_tokens": 800,  "temperature": 0.7, "stop": None},
+}
+
+# 超出每局预算后叠加在调用配置上的省钱配置
+BUDGET_CALL_PROFILES = {
+    "intro":      {"max_tokens": 40},
+    "speech":     {"max_tokens": 60},
+    "decision":   {"max_tokens": 40},
+    "decision_retry": {"max_tokens": 40},
+    "compound":   {"max_tokens": 80},
+    "last_words": {"max_tokens": 40},
+}
+
+# ---------------- 提示词模板（导入时编译一次） ----------------
+TEMPLATES.register("intro", """
+    You are {role}. Give a short introduction (<=20 tokens) without revealing your real identity.
+    Current cycle: Night {night} / Day {day}.
+    You MUST reply with language : {language}
+    The roles in this game are:{role_summary}
+""")
+
+TEMPLATES.register("speak_round", """
+    Round {round_id}.
+    You are {role}.
+    Current cycle: Night {night} / Day {day}.
+    Visible speeches to you:
+    {visible_text}
+    {memory_block}
+
+    This is the **daytime speaking phase**, NOT the night action phase.
+    You must NOT output JSON.
+    You must NOT choose targets.
+    Do NOT output anything related to killing, voting, or checking.
+
+    Think step-by-step internally.
+    Evaluate:
+    1. Player consistency
+    2. Contradictions
+    3. Suspicious behavior
+
+    Give a concise speech (<={speech_length} tokens).
+    {state_summary}
+""")
+
+TEMPLATES.register("choose", """
+    {prompt_header}
+
+    {system_info}
+
+    Current cycle: Night {night} / Day {day}.
+
+    Visible info:
+    {visible_text}
+    {memory_block}
+
+    Round {round_no}/{turns}
+    Alive players: {alive_names}
+
+    Think step-by-step internally.
+    Give ONLY JSON: {json_schema}
+""")
+
+TEMPLATES.register("hunter_shot", """
+    You are the Hunter. You are dying.
+    Choose ONE alive player to shoot. If you don't want to shoot, return empty target.
+
+    Alive players: {alive_names}
+    Return only JSON: {json_schema}
+""")
+
+TEMPLATES.register("last_words", """
+    You are {role}. You are dying because {reason}. Give <=20 token last words.
+""")
+
+TEMPLATES.register("post_game_comment", """
+    Game ended.
+
+    TRUE identities:
+    {roles_json}
+
+    You are {player_name}, TRUE role: {role}.
+    Winner: {winner}.
+
+    Give a short (<=40 tokens), personality-consistent comment in {language}.
+    Content:
+    - Brief personal feeling about this match.
+    - Optional reveal of hidden info.
+    - One quick “lesson learned” about how to play better in future games
+    (based on what happened in this match).
+    - Keep humorous or sarcastic tone.
+    - No long storytelling.
+""")
+
+TEMPLATES.register("final_summary", """
+    Werewolf game ENDED.
+
+    TRUE identities:
+    {roles_json}
+
+    Alive: {alive_players}
+    Dead: {dead_players}
+    Werewolves: {werewolves}
+    Winner: {winner}
+
+    Write a concise, structured final summary in {language}.
+    Include:
+    1. Game flow (very brief).
+    2. Key turning points.
+    3. Good/bad plays from each faction.
+    4. Why the winner won (or others lost).
+    5. One short “meta tip” for future matches.
+
+    Tone:
+    - Omniscient narrator.
+    - No repetition.
+    - No long drama.
+""")
+
+
+@dataclass
+class GameResult:
+    """一局的结构化结果（GameManager.game() 的返回值）"""
+    seed: int
+    winner: str
+    roles: dict            # {player_name: role}
+    models: dict           # {player_name: model}，人类玩家为 "HUMAN"
+    deaths: list           # 按时间顺序：{"name", "role", "cycle", "phase", "cause"}
+    votes: list            # 每次公投：{"day", "votes": {voter: target}}
+    wolf_kills: list       # 每夜狼人选择的目标（无则为 None）
+    events: list           # 事件日志原文，按时间顺序（含私有事件）
+    nights: int
+    days: int
+    usage: dict            # UsageTracker.summary()
+    timings: dict          # {阶段: 秒}，"total" 为整局耗时
+
+    def to_dict(self):
+        return asdict(self)
 
 
 @dataclass
@@ -57,11 +221,33 @@ class GameManager:
     gamemode: list = field(default_factory=lambda: ["Werewolf", "TuringTest", "FakeScientist"])
     current_gamemode: str = "Werewolf"
 
-    alive: list = field(default_factory=list)
-    werewolf_list: list = field(default_factory=list)
-
     speech_length: int = 50
 
+    # 白天发言可见窗口：最近 speech_window 条给原文（0 = 全部原文），
+    # 更早的给单行摘要，最多 speech_digest_max 条；speech_mention_only 时摘要只保留提到自己的发言
+    speech_window: int = 0
+    speech_digest_max: int = 12
+    speech_digest_chars: int = 80
+    speech_mention_only: bool = False
+
+    # 检索记忆：每次决策 / 发言取回的旧记录条数（0 = 关闭）
+    memory_top_k: int = 3
+
+    # 在状态摘要中附带投票表 + 死亡时间线（最近 vote_digest_days 天，0 = 关闭）
+    vote_digest_days: int = 3
+
+    # 多人设批量推理：> 1 时同一模型的座位每 persona_batch_size 个合并成一次请求
+    # （只用于自我介绍和盲投这类同时行动、互不可见的动作，见 persona_batch.py）；
+    # 每个座位的角色说明、人设、私有记录和最近发言放在请求里它自己的座位块中
+    persona_batch_size: int = 0
+    # 合批范围："model" 同一模型的座位都可以合批，模型在同一请求里能看到整批座位的块（吞吐型模拟接受这一点）；
+    # "knowledge" 只合并彼此知道底细的座位（狼人同伴），座位块里只放批内所有座位都已知的私有记录
+    persona_batch_scope: str = "model"
+
+    # 白天公投是否为盲投：True 时同一轮的投票者互相看不到对方的选择（同时投票），可以批量推理；
+    # 默认 False，按座位顺序投票，后投的人能看到前面的人投给了谁
+    blind_vote: bool = False
+
     last_vote_result: any = None
     last_vote_eliminated_role: any = None
     last_night_death_message: any = None
@@ -74,37 +260,89 @@ class GameManager:
     night_count : int = 0
     winner : str = "Unknown"
 
+    # 调用配置表，以及按 model 覆盖的配置：{model: {call_type: {...}}}
+    call_profiles: dict = field(default_factory=lambda: {k: dict(v) for k, v in DEFAULT_CALL_PROFILES.items()})
+    model_profile_overrides: dict = field(default_factory=dict)
+
+    # 结构化决策解析失败后的纠正重试次数
+    decision_max_retry: int = 2
+
+    # 每局预算（0 = 不限）：超出后改用 budget_profiles，发言只保留一轮，
+    # 关闭检索记忆，并跳过赛后吐槽 / 总结
+    token_budget: int = 0
+    cost_budget: float = 0.0
+    budget_profiles: dict = field(default_factory=lambda: {k: dict(v) for k, v in BUDGET_CALL_PROFILES.items()})
+
+    # 输入输出通道（见 io_channel.py）；None 时按 quiet 选择：
+    # quiet=True 丢弃全部输出（纯引擎模式，配合 bots.ScriptedAgent 做大批量模拟），否则为控制台
+    channel: any = None
+    quiet: bool = False
+    # 是否保存对局记录
+    save_history: bool = True
+
+    # 角色配置（None = 默认的 2 村民 / 2 狼 / 预言家 / 女巫 / 猎人 / 小丑）
+    role_counts: dict = None
+    # 是否在终局后让每个 LLM 吐槽并生成总结（批量对局可关闭以节省调用）
+    post_game_summary: bool = True
+
+    # 本局随机种子（None = 自动生成）：洗牌、角色分配、起名、平票和兜底随机都由它决定，
+    # 同一种子 + 同样的决策可以复现整局轨迹；种子会写进对局记录
+    seed: int = None
+
 
     def __post_init__(self):
         if self.role_manager is None or self.llm_manager is None:
             raise ValueError("请确保 llm_manager 和 role_manager 已正确设置。")
+        if self.persona_batch_scope not in ("model", "knowledge"):
+            raise ValueError(f"未知的合批范围 {self.persona_batch_scope!r}，可选：'model' / 'knowledge'")
+
+        if self.channel is None:
+            self.channel = NullChannel() if self.quiet else ConsoleChannel()
+        self.role_manager.channel = self.channel
+
+        # 各阶段耗时（enter_phase 切换阶段时累计）
+        self.timings = {}
+        self._phase_start = time.perf_counter()
 
+        if self.seed is None:
+            self.seed = random.getrandbits(63)
+        self.rng = random.Random(self.seed)
+        self.role_manager.rng = self.rng
         
 
         self.set_gamemode_prompt(self.current_gamemode)
 
+        # llm_configs.json 中每个模型可带 "call_profiles" 字段，作为该 model 的覆盖配置
+        for cfg in self.llm_manager.configs.values():
+            overrides = cfg.get("call_profiles") if isinstance(cfg, dict) else None
+            if overrides:
+                merged = self.model_profile_overrides.setdefault(cfg["model"], {})
+                for call_type, prof in overrides.items():
+                    merged.setdefault(call_type, {}).update(prof)
+
         if self.current_gamemode == "Werewolf":
-            self.role_manager.name_strategy = role_manager.NameStrategyCategorized()
+            self.role_manager.name_strategy = role_manager.NameStrategyCategorized(seed=f"{self.seed}:names")
             self.role_manager.characterize_mode = self.characterize_mode
             self.role_manager.characterize_category = self.characterize_category
-            self.role_manager.role_counts = {
+            self.role_manager.role_counts = dict(self.role_counts or {
                 "villager": 2,
                 "werewolf": 2,
                 "seer": 1,
                 "witch": 1,
                 "hunter": 1,
                 "jester": 1
-            }
+            })
 
         elif self.current_gamemode == "Fakescientists":
-            self.role_manager.name_strategy = role_manager.NameStrategyCategorized()
+            self.role_manager.name_strategy = role_manager.NameStrategyCategorized(seed=f"{self.seed}:names")
         
             
 
+        self.channel.emit(f"本局随机种子：{self.seed}")
         self.role_manager.restart()
 
-        self.alive = self.get_alive_list()
-        self.werewolf_list = self.get_werewolf_list()
+        # 座位索引 + 存活 / 阵营集合，死亡统一走 self.state.kill
+        self.state = GameState(self.role_manager.slots)
         self.last_vote_result = None
         self.last_vote_eliminated_role = None
         self.last_night_death_message = None
@@ -112,63 +350,459 @@ class GameManager:
         self.pending_heal = None       # 女巫救人
         self.pending_poison = None     # 女巫毒人
 
+        # 全局广播事件只存一份，各 agent 通过游标 + 视角引用
+        self.events = EventLog()
+
+        # 本局事件的检索索引；memory_mark 之前的记录才参与检索（之后的仍在上下文里）
+        self.memory = EventMemory()
+        self.memory_mark = 0
+
+        # 数值化的投票 / 夜杀 / 死亡记录，座位号 = slots 的顺序
+        self.stats = GameStats([slot.player_name for slot in self.role_manager.slots])
+        self.is_night = False
+
+        # token / 费用统计：价格取自 llm_configs.json 中每个模型的 "price"
+        prices = {
+            cfg["model"]: cfg["price"]
+            for cfg in self.llm_manager.configs.values()
+            if isinstance(cfg, dict) and cfg.get("price")
+        }
+        self.usage = UsageTracker(prices, self.token_budget, self.cost_budget)
+        self.budget_exceeded = False
+
+        # 本局的调用统计从零开始
+        for slot in self.role_manager.slots:
+            if not slot.is_human:
+                slot.llm_obj.call_log.clear()
+                slot.llm_obj.attach_event_log(self.events, slot.player_name)
+                slot.llm_obj.usage_hook = (
+                    lambda rec, name=slot.player_name, model=slot.llm_obj.model: self.on_llm_call(name, model, rec)
+                )
+                # 脚本机器人需要读取自己的座位和对局信息
+                if hasattr(slot.llm_obj, "bind"):
+                    slot.llm_obj.bind(slot, self)
+
+        self.game_over = False
+        self.async_llm = False
+
     # game.py
 
     def game(self):
+        """
+        同步跑完整局（LLM 请求走各 agent 的同步接口），返回 GameResult。
+        当前线程已有事件循环在运行时（Jupyter、异步服务），asyncio.run 不能嵌套，整局改在一个工作线程的
+        新事件循环里跑完，调用方照样阻塞到结束；在协程里应直接 await game_async()，不阻塞宿主的事件循环。
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.game_async(async_llm=False))
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="game") as pool:
+            return pool.submit(asyncio.run, self.game_async(async_llm=False)).result()
+
+    async def game_async(self, async_llm=True):
+        """
+        协程形式的整局：每个阶段都是协程，在 LLM 请求和人类输入处让出事件循环，
+        同一个事件循环里可以交错跑很多局。async_llm=True 时使用 agent 的 *_async 接口
+        （按事件循环共享的异步客户端 + 按 endpoint 限流，见 clients.py）。
+        replay 模式的缓存未命中（CacheMiss）说明对局偏离了录制，整局作废并向上抛出。
+        """
+        self.async_llm = async_llm
+        try:
+            await self._game()
+        except CacheMiss as e:
+            self.enter_phase("failed")
+            self.channel.emit(f"[Cache] {e}，对局中止。")
+            raise
+        self.enter_phase("finished")
+        return self.result()
+
+    async def llm_call(self, agent, method, *args, **kwargs):
+        """调用 agent.method；异步模式下优先用 method_async（脚本机器人等没有异步接口的直接同步调用）"""
+        if self.async_llm:
+            fn = getattr(agent, method + "_async", None)
+            if fn is not None:
+                return await fn(*args, **kwargs)
+        return getattr(agent, method)(*args, **kwargs)
+
+    async def ask_human(self, prompt, player=None):
+        """人类输入：同步和异步路径都遵守通道的超时（如 QueueChannel.timeout），超时按空输入处理"""
+        if self.async_llm:
+            return await self.channel.ask_async(prompt, player)
+        return self.channel.ask(prompt, player)
+
+    def enter_phase(self, phase):
+        """切换当前阶段：之后的调用按该阶段记账，上一阶段的耗时累计到 timings"""
+        now = time.perf_counter()
+        last = self.usage.phase
+        self.timings[last] = self.timings.get(last, 0.0) + now - self._phase_start
+        self._phase_start = now
+        self.usage.phase = phase
+
+    def result(self):
+        stats = self.stats
+        slots = self.role_manager.slots
+        roles = {slot.player_name: slot.role for slot in slots}
+        deaths = [
+            {
+                "name": stats.names[i],
+                "role": roles.get(stats.names[i]),
+                "cycle": int(stats.death_cycle[i]),
+                "phase": "night" if stats.death_phase[i] == 1 else "day",
+                "cause": CAUSE_NAMES[int(stats.death_cause[i])],
+            }
+            for i in stats.death_order
+        ]
+        votes = [
+            {
+                "day": int(day),
+                "votes": {stats.names[v]: stats.names[t] for v, t in enumerate(row) if t >= 0},
+            }
+            for day, row in zip(stats.vote_days, stats.votes)
+        ]
+        timings = dict(self.timings)
+        timings["total"] = sum(timings.values())
+        return GameResult(
+            seed=self.seed,
+            winner=self.winner,
+            roles=roles,
+            models={slot.player_name: "HUMAN" if slot.is_human else slot.llm_obj.model for slot in slots},
+            deaths=deaths,
+            votes=votes,
+            wolf_kills=[stats.names[k] if k >= 0 else None for k in stats.wolf_kills],
+            events=[text for text, _ in self.events.events],
+            nights=self.night_count,
+            days=self.day_count,
+            usage=self.usage.summary(),
+            timings=timings,
+        )
+
+    async def _game(self):
         if self.current_gamemode == "Werewolf":
             self.day_count += 1
-            self.intro_phase()
+            self.enter_phase("intro")
+            await self.intro_phase()
 
-            # 安全注入 intro
+            # 自我介绍汇总置顶，不随历史裁剪丢失（所有座位共享同一个字符串）
+            intro_text = "Self Introductions:\n" + self.intro
             for slot in self.role_manager.slots:
                 if slot.is_human:
                     continue
-                intro_block = {
-                    "role": "user",
-                    "content": "Self Introductions:\n" + self.intro
-                }
-
-                if len(slot.llm_obj.conversation_history) <= 3:
-                    slot.llm_obj.conversation_history.append(intro_block)
-                else:
-                    slot.llm_obj.conversation_history[3] = intro_block
+                slot.llm_obj.pin_message("intro", "user", intro_text)
 
             while True:
                 self.night_count += 1
-                self.werewolf_mode()
+                self.memory_mark = len(self.memory)
+                self.is_night = True
+                self.enter_phase("night")
+                await self.werewolf_mode()
 
-                if len(self.alive) - 2 * len(self.werewolf_list) <= 0:
-                    print("Werewolves won.")
+                if self.state.count() - 2 * self.state.count("werewolf") <= 0:
+                    self.channel.emit("Werewolves won.")
                     self.notify_all_llms("Werewolves won.")
                     self.winner = "Werewolves"
                     break
 
-                self.seer_mode()
-                self.witch_mode()
-                self.process_night_results()
+                await self.seer_mode()
+                await self.witch_mode()
+                await self.process_night_results()
+                self.is_night = False
                 self.day_count += 1
-                self.speak(rounds=2)
-                self.vote()
+                self.enter_phase("speech")
+                await self.speak(rounds=1 if self.budget_exceeded else 2)
+                self.enter_phase("vote")
+                await self.vote()
+                if self.game_over:
+                    break
 
-                if len(self.werewolf_list) <= 0:
-                    print("Villagers won.")
+                if self.state.count("werewolf") <= 0:
+                    self.channel.emit("Villagers won.")
                     self.notify_all_llms("Villagers won.")
                     self.winner = "Villagers"
                     break
             
-            self.llm_summary()
-            self.save_all_llm_history()
+            self.game_over = True
+            if self.post_game_summary:
+                await self.llm_summary()
+            self.report_call_stats()
+            if self.save_history:
+                self.save_all_llm_history()
             
 
 
+    def get_call_profile(self, agent, call_type):
+        """取某类调用的生成配置：全局表 → 按 model 覆盖 → 超预算时的省钱配置"""
+        profile = dict(self.call_profiles.get(call_type, {}))
+        profile.update(self.model_profile_overrides.get(agent.model, {}).get(call_type, {}))
+        if self.budget_exceeded:
+            profile.update(self.budget_profiles.get(call_type, {}))
+        if call_type == "speech" and profile.get("max_tokens") is None:
+            profile["max_tokens"] = self.speech_length * 2
+        profile["name"] = call_type
+        return profile
+
+    def get_decision_profile(self, agent, call_type, schema):
+        """结构化决策的生成配置：max_tokens 不低于 schema 要求的长度，否则 JSON 会被截断，重试也一样被截断"""
+        profile = self.get_call_profile(agent, call_type)
+        if profile.get("max_tokens"):
+            profile["max_tokens"] = max(profile["max_tokens"], decision.output_budget(schema))
+        return profile
+
+    async def ask_decision(self, player, prompt, schema, max_retry=None, call_type="decision"):
+        """
+        向 LLM 请求一个结构化决策：
+        - 支持 JSON mode 的服务端直接要求返回 JSON 对象，否则用容错抽取
+        - 按 schema 校验，不合格时发送简短的纠正消息重试（最多 max_retry 次）
+        - 仍失败返回 None，由调用方决定兜底行为
+        """
+        if max_retry is None:
+            max_retry = self.decision_max_retry
+
+        agent = player.llm_obj
+        raw = await self.llm_call(
+            agent, "get_response_batch", prompt, self.get_decision_profile(agent, call_type, schema), schema=schema
+        )
+
+        for attempt in range(max_retry + 1):
+            data, error = decision.parse_decision(raw, schema)
+            if error is None:
+                return data
+            if attempt == max_retry:
+                break
+            raw = await self.llm_call(
+                agent, "get_response_batch",
+                decision.correction_message(error, schema),
+                self.get_decision_profile(agent, "decision_retry", schema),
+                schema=schema,
+            )
+
+        self.channel.emit(f"[Decision] {player.player_name} 的决策无效（{error}），使用默认行为。")
+        return None
+
+    async def ask_compound_action(self, player, header, parts, check=None, context=""):
+        """
+        多段角色行动合并为一次请求（如女巫的救 + 毒、猎人的遗言 + 开枪）。
+        parts: [(field, spec, instruction), ...]，合并为一个 schema 一次校验；
+        check(data) 为跨字段校验，返回错误描述或 None；context 放在 header 之后（见 decision_context）。
+        """
+        if not parts:
+            return {}
+
+        schema = {field: spec for field, spec, _ in parts}
+        if check:
+            schema["__check__"] = check
+
+        lines = [header]
+        if context:
+            lines.append(context)
+        lines += [f"- {field}: {instruction}" for field, _, instruction in parts]
+        lines.append(f"Return ONLY one JSON object: {decision.schema_hint(schema)}")
+
+        return await self.ask_decision(player, "\n".join(lines), schema, call_type="compound")
+
+    def decision_context(self, player, query):
+        """复合行动提示里的上下文：当前轮次、状态摘要和检索记忆，与投票 / 查验等决策提示一致"""
+        lines = [f"Current cycle: Night {self.night_count} / Day {self.day_count}.", self.get_state_summary().strip()]
+        memory_block = self.recall(player, query)
+        if memory_block:
+            lines.append(memory_block)
+        return "\n".join(lines)
+
+    def shared_knowledge(self, slot):
+        """
+        合批分组键（persona_batch_scope="knowledge" 时）：狼人彼此知道身份和夜聊，可以合批；
+        其他座位的私有信息只有自己知道，各自单独请求。scope 为 "model" 时不区分。
+        """
+        if self.persona_batch_scope == "model":
+            return None
+        if slot.role.lower() == "werewolf":
+            return "werewolf"
+        return f"seat:{slot.player_name}"
+
+    def seat_context_summary(self, slot, batch=()):
+        """
+        座位块：身份、角色说明和人设（与该座位单独请求时的系统提示相同）、狼人同伴、最近的私有结果、自己最近的发言。
+        scope 为 "knowledge" 时 batch 为同一请求里的座位，私有结果只保留批内所有座位都能看到的。
+        """
+        lines = [
+            f"You are {slot.player_name}, role: {slot.role}.",
+            "".join(self.role_manager.seat_prompt_segments(slot)).strip(),
+        ]
+        if slot.role.lower() == "werewolf":
+            partners = [p.player_name for p in self.werewolf_list if p is not slot]
+            lines.append(f"Your werewolf partners: {partners}")
+        names = {s.player_name for s in batch} if self.persona_batch_scope == "knowledge" else set()
+        for item in self.memory.private_items(slot.player_name, limit=3):
+            if names <= item.visible_to:
+                lines.append(f"Private note: {item.text}")
+        # 自己最近的两条回复，保持说话风格前后一致
+        recent = [m.content for m in slot.llm_obj.history.recent if m.role == "assistant"][-2:]
+        for text in recent:
+            lines.append(f"You said earlier: {text[:self.speech_digest_chars * 2]}")
+        return "\n".join(lines)
+
+    async def batch_persona_actions(self, seats, task, schema_for, call_type):
+        """
+        同模型（scope 为 "knowledge" 时还要 shared_knowledge 相同）的 LLM 座位按 persona_batch_size 合并成一次请求。
+        系统提示为所有座位共用的规则块，公开信息（状态摘要 + 最近的公开事件）只发送一次，其余放在各自的座位块里。
+        schema_for(slot) 返回该座位的 schema；call_type 决定每个座位的输出预算。
+        返回 {player_name: data}；没有合批或失败的座位不在结果里，由调用方单独请求。
+        """
+        results = {}
+        shared = self.get_state_summary()
+        events = self.events.render(None)
+        if events:
+            shared += "Recent events:\n" + events
+
+        for chunk in persona_batch.group_by_model(seats, self.persona_batch_size, self.shared_knowledge):
+            if len(chunk) < 2:
+                continue
+            blocks = {s.player_name: self.seat_context_summary(s, chunk) for s in chunk}
+            schemas = {s.player_name: schema_for(s) for s in chunk}
+            prompt = persona_batch.build_batch_prompt(task, shared, blocks, schemas)
+
+            agent = chunk[0].llm_obj
+            per_seat = max(
+                self.get_call_profile(agent, call_type).get("max_tokens") or 80,
+                max(decision.output_budget(schema) for schema in schemas.values()),
+            )
+            profile = self.get_call_profile(agent, "persona_batch")
+            profile["max_tokens"] = per_seat * len(chunk) + 50
+
+            rules, _ = self.role_manager.generate_prompt_segments(chunk[0].role)
+            raw = await self.llm_call(
+                agent, "get_oneshot_response",
+                [{"role": "system", "content": rules},
+                 {"role": "user", "content": prompt}],
+                profile, schema=schemas,
+            )
+            got = persona_batch.split_batch_reply(raw, schemas)
+
+            # 拆回各座位自己的历史，形式与单独请求一致
+            for s in chunk:
+                if s.player_name in got:
+                    s.llm_obj.add_message(
+                        "user", persona_batch.seat_prompt(task, blocks[s.player_name], schemas[s.player_name])
+                    )
+                    s.llm_obj.add_message("assistant", persona_batch.seat_reply(got[s.player_name]))
+            results.update(got)
+
+        return results
+
+    def prompt_token_counts(self):
+        """模板静态部分 + 本局缓存块（角色规则 / 人设）的 token 数"""
+        counts = {f"template:{k}": v for k, v in TEMPLATES.token_counts().items()}
+        for key, tokens in self.role_manager.prompt_cache.token_counts().items():
+            counts[":".join(str(k) for k in key)] = tokens
+        return counts
+
+    def collect_call_stats(self):
+        """按调用类型汇总：请求的 max_tokens 与实际输出长度"""
+        stats = {}
+        for slot in self.role_manager.slots:
+            if slot.is_human:
+                continue
+            for rec in slot.llm_obj.call_log:
+                s = stats.setdefault(rec["call_type"], {
+                    "calls": 0, "requested_tokens": 0, "output_tokens": 0,
+                    "max_output_tokens": 0, "truncated": 0,
+                })
+                s["calls"] += 1
+                s["requested_tokens"] += rec["max_tokens"]
+                s["output_tokens"] += rec["output_tokens"]
+                s["max_output_tokens"] = max(s["max_output_tokens"], rec["output_tokens"])
+                if rec["finish_reason"] == "length":
+                    s["truncated"] += 1
+        return stats
+
+    def on_llm_call(self, player_name, model, record):
+        """每次 LLM 调用后记账，并检查是否超出本局预算"""
+        self.usage.record(
+            player_name, model, record["call_type"], record["prompt_tokens"], record["output_tokens"],
+            cached=record.get("cached", False),
+        )
+        if not self.budget_exceeded and self.usage.over_budget():
+            self.budget_exceeded = True
+            self.channel.emit(
+                f"[Budget] 本局已用 {self.usage.total_tokens} tokens / ${self.usage.total_cost:.4f}，"
+                f"超出预算，切换到省钱模式。"
+            )
+
+    def estimate_usage(self, rounds=None, speak_rounds=2):
+        """
+        开局前估算本局的调用次数 / token / 费用（不发任何请求）。
+        rounds 缺省时按期望局长估算（对局长度分布取自 batch_sim 的随机策略模拟），
+        结果的 "upper_bound" 为每轮只减员 2 人、打到终局的上限；给出 rounds 时直接按打满 rounds 轮估算。
+        """
+        llm_slots = [s for s in self.role_manager.slots if not s.is_human]
+        max_rounds = max(1, (len(self.role_manager.slots) - 2) // 2)
+
+        model_mix = {}
+        for s in llm_slots:
+            model_mix[s.llm_obj.model] = model_mix.get(s.llm_obj.model, 0) + 1
+
+        block_tokens = self.role_manager.prompt_cache.token_counts()
+        role_tokens = [block_tokens.get(("role", s.role)) for s in llm_slots]
+        role_tokens = [t for t in role_tokens if t]
+        system_tokens = block_tokens.get(("rules",), 0) + (sum(role_tokens) // len(role_tokens) if role_tokens else 0)
+        system_tokens = system_tokens or 500
+
+        profiles = {k: self.get_call_profile(llm_slots[0].llm_obj, k) for k in self.call_profiles} if llm_slots else self.call_profiles
+        kwargs = dict(
+            prices=self.usage.prices, speak_rounds=speak_rounds, system_tokens=system_tokens,
+            template_tokens=TEMPLATES.token_counts(), post_game=self.post_game_summary,
+        )
+        if rounds is not None:
+            return estimate_game(len(llm_slots), rounds, model_mix, profiles, **kwargs)
+
+        length = batch_sim.length_profile(
+            len(self.role_manager.slots), self.role_manager.role_counts, seed=self.seed % 2 ** 32
+        )
+        expected = estimate_game(len(llm_slots), None, model_mix, profiles, length=length, **kwargs)
+        upper = estimate_game(len(llm_slots), max_rounds, model_mix, profiles, **kwargs)
+        expected["upper_bound"] = {k: upper[k] for k in ("total_calls", "prompt_tokens", "completion_tokens", "cost")}
+        return expected
+
+    def report_call_stats(self):
+        if self.usage.records:
+            total = self.usage.summary()
+            self.channel.emit(
+                f"\n===== Usage: {total['calls']} calls, {total['prompt_tokens']} prompt + "
+                f"{total['completion_tokens']} completion tokens, ${total['cost']:.4f} ====="
+            )
+            for phase, s in total["by_phase"].items():
+                self.channel.emit(f"{phase:<8} calls={s['calls']:<4} tokens={s['prompt_tokens'] + s['completion_tokens']:<8} cost=${s['cost']:.4f}")
+            if total["cached_calls"]:
+                self.channel.emit(f"cached   calls={total['cached_calls']:<4} saved=${total['cached_cost']:.4f}")
+
+        stats = self.collect_call_stats()
+        if not stats:
+            return
+        self.channel.emit("\n===== Call Stats (requested vs actual tokens) =====")
+        for call_type, s in stats.items():
+            self.channel.emit(
+                f"{call_type:<11} calls={s['calls']:<4} "
+                f"avg_requested={s['requested_tokens'] / s['calls']:.0f} "
+                f"avg_actual={s['output_tokens'] / s['calls']:.0f} "
+                f"max_actual={s['max_output_tokens']} truncated={s['truncated']}"
+            )
+
+    @property
+    def alive(self):
+        return self.state.alive
+
+    @property
+    def werewolf_list(self):
+        return self.state.werewolves
+
     def get_alive_list(self):
-        return [p for p in self.role_manager.slots if p.alive]
+        return self.state.alive
 
     def get_werewolf_list(self):
-        return [p for p in self.role_manager.slots if p.role.lower() == "werewolf" and p.alive]
+        return self.state.werewolves
     
     def get_player_number_info(self):
-        alive_names = ", ".join(slot.player_name for slot in self.alive)
+        alive_names = self.state.alive_names_text
         return (
             f"current alive number: {len(self.alive)}, "
             f"current alive werewolf number: {len(self.werewolf_list)}, "
@@ -191,35 +825,46 @@ class GameManager:
         self.current_gamemode = gamemode
 
 
-    def intro_phase(self):
-        print("===== 自我介绍阶段 =====")
+    async def intro_phase(self):
+        self.channel.emit("===== 自我介绍阶段 =====")
         self.intro = ""
 
+        batched = {}
+        if self.persona_batch_size > 1:
+            batched = await self.batch_persona_actions(
+                [p for p in self.alive if not p.is_human],
+                f"Give a short introduction (<=20 tokens) without revealing your real identity. "
+                f"Reply in {self.language}.",
+                lambda s: {"intro": {"max_len": 200, "hint": "<=20 tokens"}},
+                "intro",
+            )
+
         for p in self.alive:
             if p.is_human:
-                speech = input(f"{p.player_name} 请输入自我介绍：\n")
+                speech = await self.ask_human(f"{p.player_name} 请输入自我介绍：\n", p.player_name)
+            elif p.player_name in batched:
+                speech = batched[p.player_name]["intro"]
             else:
-                prompt = (
-                    f"You are {p.role}. Give a short introduction (<=20 tokens) "
-                    f"without revealing your real identity."
-                    f"Current cycle: Night {self.night_count} / Day {self.day_count}.\n"
-                    f"You MUST reply with language : {self.language}"
+                prompt = TEMPLATES.render(
+                    "intro",
+                    role=p.role, night=self.night_count, day=self.day_count,
+                    language=self.language, role_summary=self.get_alive_role_summary(),
                 )
-                prompt += "The roles in this game are:" + self.get_alive_role_summary()
-                speech = p.llm_obj.get_response(prompt)
+                speech = await self.llm_call(p.llm_obj, "get_response", prompt, self.get_call_profile(p.llm_obj, "intro"))
 
-            print(f"{p.player_name} 's self-intro:'{speech}\n")
+            self.channel.emit(f"{p.player_name} 's self-intro:'{speech}\n")
             self.intro += f"{p.player_name} 's self-intro：{speech}\n"
+            self.memory.add(f"{p.player_name} self-intro: {speech}", "intro")
 
-    def werewolf_mode(self, turn=1):
+    async def werewolf_mode(self, turn=1):
         """狼人：互相可见投票；平票从最高票中随机选出受害者"""
 
         if len(self.werewolf_list) <= 1:
             turn = 1
-        print("===== werewolf Phase =====")
+        self.channel.emit("===== werewolf Phase =====")
 
         # —— 1 行做整个狼人投票（多回合）
-        results = self.multi_turn_choose(
+        results = await self.multi_turn_choose(
             actors=self.werewolf_list,
             alive_players=self.alive,
             prompt_header="You are a Werewolf. Choose someone to kill. Do Not Choose Yourself or Your Partner",
@@ -236,22 +881,38 @@ class GameManager:
 
         # 后续处理
         if victim is None:
-            eliminated_name = random.choice([p.player_name for p in self.alive])
-            victim = next(p for p in self.alive if p.player_name == eliminated_name)
+            eliminated_name = self.rng.choice(self.state.alive_names)
+            victim = self.state.get(eliminated_name)
 
         self.pending_kill = victim.player_name
+        self.stats.record_wolf_kill(self.night_count, self.pending_kill)
+
+        # 狼人夜聊只进狼人的记忆
+        wolves = [p.player_name for p in self.werewolf_list]
+        for rd in results:
+            for actor_name, data in rd.items():
+                if data:
+                    self.memory.add(
+                        f"Night {self.night_count}: werewolf {actor_name} wanted to kill "
+                        f"{data['target']}. {data.get('reason', '')}",
+                        "wolf_chat", visible_to=wolves,
+                    )
+        self.memory.add(
+            f"Night {self.night_count}: werewolves chose to kill {self.pending_kill}.",
+            "wolf_chat", visible_to=wolves,
+        )
 
 
 
-    def seer_mode(self):
+    async def seer_mode(self):
         seers = [p for p in self.alive if p.role.lower() == "seer"]
         if not seers:
             return
 
-        print("\n===== Seer Phase =====")
+        self.channel.emit("\n===== Seer Phase =====")
 
         # —— 1 行：所有 Seer 按顺序匿名投票
-        results = self.multi_turn_choose(
+        results = await self.multi_turn_choose(
             actors=seers,
             alive_players=self.alive,
             prompt_header="You are the Seer. Choose someone to check.",
@@ -268,27 +929,30 @@ class GameManager:
 
         if target is None:
             # 极端情况：所有人 invalid → 随机查一个
-            target = random.choice(self.alive)
+            target = self.rng.choice(self.alive)
 
         # 查验身份
         role = "Werewolf" if target.role.lower() == "werewolf" else "Not Werewolf"
         msg = f"Seer result: {target.player_name} is {role}."
 
+        self.memory.add(
+            f"Night {self.night_count}: {msg}", "seer_result",
+            visible_to=[s.player_name for s in seers],
+        )
+
         # 只告诉 Seer
         for s in seers:
             if s.is_human:
-                print(f"[Only Seers Know] {msg}")
+                self.channel.emit(f"[Only Seers Know] {msg}")
             else:
-                s.llm_obj.conversation_history.append(
-                    {"role":"user", "content":msg}
-                )
+                s.llm_obj.add_message("user", msg)
 
-    def witch_mode(self):
+    async def witch_mode(self):
         witches = [p for p in self.alive if p.role.lower() == "witch"]
         if not witches:
             return
 
-        print("\n===== Witch Phase =====")
+        self.channel.emit("\n===== Witch Phase =====")
 
         # 初始化女巫状态
         if not hasattr(self, "witch_state"):
@@ -299,56 +963,76 @@ class GameManager:
 
         for witch in witches:
             state = self.witch_state[witch.player_name]
-            alive_names = [p.player_name for p in self.alive]
+            alive_names = self.state.alive_names
+
+            # LLM 女巫：救 + 毒一次决策
+            if not witch.is_human:
+                await self.witch_night_action(witch, state, alive_names)
+                continue
 
             # ---- 1) 是否救人 ----
             if state["heal"] and self.pending_kill in alive_names:
-                if witch.is_human:
-                    ans = input(f"是否救 {self.pending_kill}? (y/n): ").strip().lower()
-                    if ans == "y":
-                        state["heal"] = False
-                        self.pending_heal = self.pending_kill
-                        print(f"{witch.player_name} 使用了救人药")
-                else:
-                    prompt = f"You are the Witch. Decide whether to heal {self.pending_kill}. Return JSON: {{'heal':'yes' or 'no'}}"
-                    raw = witch.llm_obj.get_response_batch(prompt)
-                    try:
-                        heal_ans = json.loads(raw.replace("'", "\"")).get("heal","no")
-                    except:
-                        heal_ans = "no"
-
-                    if heal_ans.lower() == "yes":
-                        state["heal"] = False
-                        self.pending_heal = self.pending_kill
-                        #print(f"{witch.player_name} healed {self.pending_kill}")
+                ans = (await self.ask_human(f"是否救 {self.pending_kill}? (y/n): ", witch.player_name)).strip().lower()
+                if ans == "y":
+                    state["heal"] = False
+                    self.pending_heal = self.pending_kill
+                    self.channel.emit(f"{witch.player_name} 使用了救人药")
 
             # ---- 2) 是否毒人 ----
             if state["poison"]:
-                alive_names = [p.player_name for p in self.alive]
-                if witch.is_human:
-                    target = input(f"想毒谁（留空不毒）？可选：{alive_names}\n").strip()
-                    if target in alive_names:
-                        state["poison"] = False
-                        self.pending_poison = target
-                        #print(f"{witch.player_name} 使用毒药毒死 {target}")
-                else:
-                    prompt = "You are the Witch. You may poison one player. Return JSON: {'target':'name' or ''}"
-                    raw = witch.llm_obj.get_response_batch(prompt)
-                    try:
-                        target = json.loads(raw.replace("'", "\"")).get("target", "")
-                    except:
-                        target = ""
-                    if target in alive_names:
-                        state["poison"] = False
-                        self.pending_poison = target
-                        #print(f"{witch.player_name} poisoned {target}")
-
-
-    def process_night_results(self):
+                target = (await self.ask_human(f"想毒谁（留空不毒）？可选：{alive_names}\n", witch.player_name)).strip()
+                if target in alive_names:
+                    state["poison"] = False
+                    self.pending_poison = target
+                    #self.channel.emit(f"{witch.player_name} 使用毒药毒死 {target}")
+
+    async def witch_night_action(self, witch, state, alive_names):
+        """LLM 女巫的复合行动：schema 只包含 witch_state 中仍可用的药"""
+        parts = []
+        if state["heal"] and self.pending_kill in alive_names:
+            parts.append((
+                "heal", {"choices": ["yes", "no"]},
+                f"{self.pending_kill} was attacked tonight. Use your healing potion to save them?",
+            ))
+        if state["poison"]:
+            parts.append((
+                "poison", {"choices": alive_names, "allow_empty": True, "hint": "<name or empty>"},
+                f"poison one alive player, or \"\" to keep the potion. Alive players: {alive_names}",
+            ))
+        if not parts:
+            return
+
+        def check(data):
+            if data.get("heal") == "yes" and data.get("poison") == self.pending_kill:
+                return "you cannot heal and poison the same player"
+            return None
+
+        data = await self.ask_compound_action(
+            witch, "You are the Witch. Decide tonight's potions in ONE reply.", parts, check,
+            context=self.decision_context(witch, f"witch heal poison {self.pending_kill} {' '.join(alive_names)}"),
+        ) or {}
+
+        if data.get("heal") == "yes":
+            state["heal"] = False
+            self.pending_heal = self.pending_kill
+            self.memory.add(
+                f"Night {self.night_count}: you (Witch) healed {self.pending_kill}.",
+                "witch", visible_to=[witch.player_name],
+            )
+        if data.get("poison"):
+            state["poison"] = False
+            self.pending_poison = data["poison"]
+            self.memory.add(
+                f"Night {self.night_count}: you (Witch) poisoned {self.pending_poison}.",
+                "witch", visible_to=[witch.player_name],
+            )
+
+
+    async def process_night_results(self):
         """夜晚结束后统一结算：狼人杀 + 女巫救 + 女巫毒。
         此处才真正执行死亡，并触发 last_words/hunter_shot。"""
 
-        print("\n===== Night Result Settlement =====")
+        self.channel.emit("\n===== Night Result Settlement =====")
 
         final_dead = set()
 
@@ -362,25 +1046,31 @@ class GameManager:
             final_dead.add(self.pending_poison)
 
         if not final_dead:
-            print("No one died last night.\n")
+            self.channel.emit("No one died last night.\n")
             self.notify_all_llms(f"No one died last night: night {self.night_count}.\n")
+            self.pending_kill = None
+            self.pending_heal = None
+            self.pending_poison = None
             return
 
         # 3. 执行真正的死亡（在这里才触发 last_words 和 Hunter）
-        for name in final_dead:
-            player = next(p for p in self.role_manager.slots if p.player_name == name)
-            player.alive = False
+        #    按座位顺序结算；已被猎人带走的不再重复结算
+        for name in sorted(final_dead, key=self.state.seat_of):
+            if not self.state.is_alive(name):
+                continue
+            self.state.kill(name)
 
-            print(f"{name} died last night.")
+            self.channel.emit(f"{name} died last night.")
 
             # 识别死亡原因
             if name == self.pending_poison:
                 death_reason = "poison"
             else:
                 death_reason = "night"   # 狼人刀 or 其他 night death
+            self.stats.record_death(name, self.night_count, death_reason, night=True)
 
             # 遗言
-            words = self.last_words(name, death_reason)
+            words = await self.last_words(name, death_reason)
             self.notify_all_llms(
                 f"{name} died last night: night{self.night_count}. Last words: {words}" + self.get_player_number_info())
 
@@ -391,20 +1081,21 @@ class GameManager:
 
 
     # ✨ 新：支持多轮讨论
-    def speak(self, rounds=2):
+    async def speak(self, rounds=2):
         for i in range(rounds):
-            print(f"\n===== Speak Round {i+1}/{rounds} =====")
-            print(
+            self.channel.emit(f"\n===== Speak Round {i+1}/{rounds} =====")
+            self.channel.emit(
             f"当前存活玩家: {len(self.alive)} 人，其中狼人: {len(self.werewolf_list)} 人\n"
-            f"存活名单: {[p.player_name for p in self.alive]}"
+            f"存活名单: {self.state.alive_names}"
         )
-            self.speak_round(i + 1)
+            await self.speak_round(i + 1)
 
-    def speak_round(self, round_id):
+    async def speak_round(self, round_id):
         current_round = []  # 存储本轮发言，用于后续玩家查看
 
         # 提取上一轮发言
         last_round = getattr(self, "last_round_speeches", [])
+        alive_names = self.state.alive_names
 
         for idx, p in enumerate(self.alive):
 
@@ -417,102 +1108,96 @@ class GameManager:
             # ③ 合并：这是玩家应该看到的全部信息
             visible_info = after_me_last_round + before_me_this_round
 
-            # 格式化成字符串
-            visible_text = "\n".join([f"{name}: {text}" for name, text in visible_info])
+            # 格式化成字符串（大局可以只给最近 K 条原文 + 更早发言的摘要）
+            if self.speech_window > 0:
+                visible_text = discussion.render_visible(
+                    visible_info, self.speech_window, viewer=p.player_name,
+                    digest_max=self.speech_digest_max, mention_only=self.speech_mention_only,
+                )
+            else:
+                visible_text = "\n".join([f"{s.name}: {s.text}" for s in visible_info])
             if not visible_text:
                 visible_text = "None"
 
             # 构造提示词给 LLM
             if p.is_human:
-                speech = input(f"\n你的发言：\n")
+                speech = await self.ask_human(f"\n你的发言：\n", p.player_name)
             else:
-                prompt = f"""
-    Round {round_id}.
-    You are {p.role}.
-    Current cycle: Night {self.night_count} / Day {self.day_count}.
-    Visible speeches to you:
-    {visible_text}
-
-    This is the **daytime speaking phase**, NOT the night action phase.
-        You must NOT output JSON.
-        You must NOT choose targets.
-        Do NOT output anything related to killing, voting, or checking.
-
-    Think step-by-step internally. 
-    Evaluate:
-    1. Player consistency
-    2. Contradictions
-    3. Suspicious behavior
-
-    Give a concise speech (<={self.speech_length} tokens).
-    """
-                prompt += self.get_state_summary()
-                speech = p.llm_obj.get_response(prompt)
+                prompt = TEMPLATES.render(
+                    "speak_round",
+                    round_id=round_id, role=p.role,
+                    night=self.night_count, day=self.day_count,
+                    visible_text=visible_text, speech_length=self.speech_length,
+                    state_summary=self.get_state_summary(),
+                    memory_block=self.recall(p, f"{p.player_name} {p.role} {visible_text}"),
+                )
+                speech = await self.llm_call(p.llm_obj, "get_response", prompt, self.get_call_profile(p.llm_obj, "speech"))
 
-            print(f"{p.player_name} says: {speech}")
+            self.channel.emit(f"{p.player_name} says: {speech}")
 
-            # 保存本轮的发言（以便后续玩家读取）
-            current_round.append((p.player_name, speech))
+            # 保存本轮的发言（以便后续玩家读取），摘要只在这里生成一次
+            current_round.append(discussion.make_speech(
+                p.player_name, speech, alive_names, self.speech_digest_chars
+            ))
+            self.memory.add(f"Day {self.day_count} {p.player_name} said: {speech}", "speech")
 
         # 一轮结束后更新 last_round_speeches
         self.last_round_speeches = current_round
 
     
-    def trigger_hunter_shot(self, hunter_name):
-        """Hunter dies → choose one person to shoot (no win-logic here)"""
+    async def trigger_hunter_shot(self, hunter_name, choice=None):
+        """Hunter dies → choose one person to shoot (no win-logic here)
+        choice 不为 None 时表示目标已经在复合行动中选好，不再单独请求。"""
 
-        hunter = next((p for p in self.role_manager.slots if p.player_name == hunter_name), None)
+        hunter = self.state.get(hunter_name)
         if not hunter:
             return
 
-        print(f"\n===== Hunter {hunter_name} triggers last shot =====")
+        self.channel.emit(f"\n===== Hunter {hunter_name} triggers last shot =====")
 
-        alive_names = [p.player_name for p in self.alive]
+        alive_names = self.state.alive_names
 
         # ---- Human Hunter ----
         if hunter.is_human:
-            print("你是猎人，你可以选择一个人带走（留空则不射）：")
-            print(alive_names)
-            choice = input("> ").strip()
+            self.channel.emit("你是猎人，你可以选择一个人带走（留空则不射）：")
+            self.channel.emit(alive_names)
+            choice = (await self.ask_human("> ", hunter_name)).strip()
             if choice not in alive_names:
-                print("Hunter chose not to shoot.")
+                self.channel.emit("Hunter chose not to shoot.")
                 self.notify_all_llms(f"Hunter chose not to shoot on night: {self.night_count}" )
                 return
-        else:
+        elif choice is None:
             # ---- LLM Hunter ----
-            prompt = f"""
-    You are the Hunter. You are dying.
-    Choose ONE alive player to shoot. If you don't want to shoot, return empty target.
-
-    Alive players: {alive_names}
-    Return only JSON: {{'target':'name' or ''}}
-    """
-            raw = hunter.llm_obj.get_response_batch(prompt)
-            try:
-                choice = json.loads(raw.replace("'", "\"")).get("target", "")
-            except:
-                choice = ""
+            schema = {"target": {"choices": alive_names, "allow_empty": True}}
+            prompt = TEMPLATES.render(
+                "hunter_shot", alive_names=alive_names, json_schema=decision.schema_hint(schema)
+            )
+            data = await self.ask_decision(hunter, prompt, schema)
+            choice = data["target"] if data else ""
 
-            if choice not in alive_names:
-                return
+        if choice not in alive_names:
+            return
 
         # ---- Execute the shot ----
-        target = next(p for p in self.role_manager.slots if p.player_name == choice)
-        target.alive = False
-        print(f"Hunter {hunter_name} shoots and kills {choice}!")
+        target = self.state.kill(choice)
+        self.channel.emit(f"Hunter {hunter_name} shoots and kills {choice}!")
+        self.stats.record_death(
+            choice, self.night_count if self.is_night else self.day_count,
+            "killed by hunter", night=self.is_night,
+        )
 
 
-        lastwords = self.last_words(target.player_name, "killed by hunter")
+        lastwords = await self.last_words(target.player_name, "killed by hunter")
         msg = f"{choice} was killed by hunter {hunter_name} on night {self.night_count}, last words: {lastwords}" + self.get_player_number_info()
         self.notify_all_llms(msg)
 
 
 
-    def vote(self):
+    async def vote(self):
 
-        print("\n===== Public Voting =====")
+        self.channel.emit("\n===== Public Voting =====")
 
-        results = self.multi_turn_choose(
+        results = await self.multi_turn_choose(
             actors=self.alive,
             alive_players=self.alive,
             prompt_header="You are voting. Choose one player to eliminate.",
@@ -520,15 +1205,17 @@ class GameManager:
             turns=1,
             require_reason=False,
             visibility={"mode":"none", "reveal_actors":False, "reveal_partner":False},
+            blind=self.blind_vote,
         )
 
         victim, eliminated_name, votes = self.resolve_vote(
             results, self.alive, strategy="no_elim"
         )
         self.last_vote_result = votes
+        self.stats.record_votes(self.day_count, results)
 
         if victim is None:
-            print("平票，无人出局。")
+            self.channel.emit("平票，无人出局。")
             self.notify_all_llms(f"no one was voted out last day. on day {self.day_count}")
             self.last_vote_eliminated_role = None
             return
@@ -537,19 +1224,20 @@ class GameManager:
 
         # ============= 小丑唯一胜利点 =============
         if role == "jester":
-            victim.alive = False
-            print(f"🎉 小丑 {victim.player_name} 被成功投票出局，他成为唯一赢家！")
+            self.state.kill(victim.player_name)
+            self.stats.record_death(victim.player_name, self.day_count, "jester")
+            self.channel.emit(f"🎉 小丑 {victim.player_name} 被成功投票出局，他成为唯一赢家！")
             self.notify_all_llms(f"Jester {victim.player_name} was voted out, he is the only winner!")
 
-            # 直接写入总结
+            # 直接结束本局，总结和保存交给 game()
             self.winner = f"Jester {victim.player_name}"
-            self.llm_summary()
-            self.save_all_llm_history()
-            exit()
+            self.game_over = True
+            return
 
         # ============= 普通死亡 → 进入统一入口 last_words =============
-        victim.alive = False
-        lastwords = self.last_words(victim.player_name, "banished")
+        self.state.kill(victim.player_name)
+        self.stats.record_death(victim.player_name, self.day_count, "banished")
+        lastwords = await self.last_words(victim.player_name, "banished")
 
         msg = f"{victim.player_name} was banished on day {self.day_count}, last words: {lastwords}" + self.get_player_number_info()
         self.notify_all_llms(msg)
@@ -558,7 +1246,7 @@ class GameManager:
 
 
 
-    def last_words(self, player_name, reason=''):
+    async def last_words(self, player_name, reason=''):
         """
         统一死亡入口：
         - 小丑不走遗言，直接在 vote 中结束游戏
@@ -566,7 +1254,7 @@ class GameManager:
         - 其他角色：正常遗言
         """
 
-        player = next((p for p in self.role_manager.slots if p.player_name == player_name), None)
+        player = self.state.get(player_name)
         if not player:
             return ""
 
@@ -576,34 +1264,60 @@ class GameManager:
         if role == "jester":
             return ""
 
-        print(f"\n===== {player_name} 遗言 =====")
+        self.channel.emit(f"\n===== {player_name} 遗言 =====")
+
+        can_shoot = role == "hunter" and reason != "poison"
+        shot = None
 
         # ---------- 普通角色 last words ----------
         if player.is_human:
-            speech = input("请输入遗言（不超过60字）:\n")[:60]
+            speech = (await self.ask_human("请输入遗言（不超过60字）:\n", player_name))[:60]
+        elif can_shoot:
+            # LLM 猎人：遗言 + 开枪一次决策
+            speech, shot = await self.hunter_last_action(player, reason)
         else:
-            speech = player.llm_obj.get_response(
-                f"You are {player.role}. You are dying because {reason}. Give <=20 token last words."
+            speech = await self.llm_call(
+                player.llm_obj, "get_response",
+                TEMPLATES.render("last_words", role=player.role, reason=reason),
+                self.get_call_profile(player.llm_obj, "last_words"),
             )
 
-        print(f"{player_name} 遗言：{speech}")
-        # 更新存活名单
-        self.alive = self.get_alive_list()
-        self.werewolf_list = self.get_werewolf_list()
+        self.channel.emit(f"{player_name} 遗言：{speech}")
 
         # ---------- 猎人死亡后的技能 ----------
-        if role == "hunter" and reason != "poison":
-            self.trigger_hunter_shot(player_name)
+        if can_shoot:
+            await self.trigger_hunter_shot(player_name, choice=shot)
 
         
 
         return speech
 
-    
-    def llm_summary(self):
+
+    async def hunter_last_action(self, hunter, reason):
+        """LLM 猎人的复合行动：遗言和开枪目标合并为一次请求，返回 (speech, target)"""
+        alive_names = self.state.alive_names
+        parts = [
+            ("last_words", {"max_len": 200, "hint": "<=20 tokens"}, "your last words to the table."),
+            ("target", {"choices": alive_names, "allow_empty": True, "hint": "<name or empty>"},
+             f"ONE alive player to shoot, or \"\" to not shoot. Alive players: {alive_names}"),
+        ]
+        data = await self.ask_compound_action(
+            hunter, f"You are the Hunter. You are dying because {reason}.", parts,
+            context=self.decision_context(hunter, f"hunter shoot werewolf {' '.join(alive_names)}"),
+        )
+        if not data:
+            return "", ""
+        return data["last_words"], data["target"]
+
+    async def llm_summary(self):
         """游戏结束由每个 LLM 吐槽 + 全局总结（现在包含所有真实身份）"""
 
-        print("\n===== Fun Post-Game Comments =====\n")
+        self.enter_phase("summary")
+        if self.budget_exceeded:
+            self.channel.emit("\n[Budget] 已超出本局预算，跳过赛后吐槽和总结。")
+            return
+
+        self.channel.emit("\n===== Fun Post-Game Comments =====\n")
 
         # ==== 整理全局真实身份 ====
         all_roles_map = {
@@ -611,9 +1325,10 @@ class GameManager:
             for slot in self.role_manager.slots
         }
 
-        alive_players = [p.player_name for p in self.alive]
+        alive_players = list(self.state.alive_names)
         dead_players = [p.player_name for p in self.role_manager.slots if not p.alive]
         werewolves = [p.player_name for p in self.role_manager.slots if p.role.lower() == "werewolf"]
+        roles_json = json.dumps(all_roles_map, indent=2, ensure_ascii=False)
 
 
 
@@ -624,88 +1339,72 @@ class GameManager:
             if slot.is_human:
                 continue
 
-            prompt = f"""
-Game ended.
-
-TRUE identities:
-{json.dumps(all_roles_map, indent=2)}
-
-You are {slot.player_name}, TRUE role: {slot.role}.
-Winner: {self.winner}.
-
-Give a short (<=40 tokens), personality-consistent comment in {self.language}.
-Content:
-- Brief personal feeling about this match.
-- Optional reveal of hidden info.
-- One quick “lesson learned” about how to play better in future games
-(based on what happened in this match).
-- Keep humorous or sarcastic tone.
-- No long storytelling.
-    """
+            prompt = TEMPLATES.render(
+                "post_game_comment",
+                roles_json=roles_json, player_name=slot.player_name, role=slot.role,
+                winner=self.winner, language=self.language,
+            )
 
             try:
-                comment = slot.llm_obj.get_response(prompt)
+                comment = await self.llm_call(slot.llm_obj, "get_response", prompt, self.get_call_profile(slot.llm_obj, "comment"))
+            except CacheMiss:
+                raise
             except:
                 comment = "(failed to generate comment)"
 
-            print(f"{slot.player_name} says: {comment}\n")
+            self.channel.emit(f"{slot.player_name} says: {comment}\n")
 
         # -----------------------------------------------------
         # 2. 最终全局总结（上帝视角）
         # -----------------------------------------------------
-        print("\n===== Game Summary =====\n")
+        self.channel.emit("\n===== Game Summary =====\n")
 
         summary_llm = list(self.llm_manager.llm_dict.values())[0]
 
-        final_summary_prompt = f"""
-Werewolf game ENDED.
-
-TRUE identities:
-{json.dumps(all_roles_map, indent=2)}
-
-Alive: {alive_players}
-Dead: {dead_players}
-Werewolves: {werewolves}
-Winner: {self.winner}
-
-Write a concise, structured final summary in {self.language}.
-Include:
-1. Game flow (very brief).
-2. Key turning points.
-3. Good/bad plays from each faction.
-4. Why the winner won (or others lost).
-5. One short “meta tip” for future matches.
-
-Tone:
-- Omniscient narrator.
-- No repetition.
-- No long drama.
-
-    """
+        final_summary_prompt = TEMPLATES.render(
+            "final_summary",
+            roles_json=roles_json, alive_players=alive_players, dead_players=dead_players,
+            werewolves=werewolves, winner=self.winner, language=self.language,
+        )
 
         try:
-            final_summary = summary_llm.get_response(final_summary_prompt)
+            final_summary = await self.llm_call(summary_llm, "get_response", final_summary_prompt, self.get_call_profile(summary_llm, "summary"))
+        except CacheMiss:
+            raise
         except:
             final_summary = "(failed to generate final summary)"
 
-        print(final_summary)
+        self.channel.emit(final_summary)
 
 
     
+    def recall(self, player, query):
+        """从本局检索记忆中取回与 query 最相关、且 player 可见的旧记录"""
+        if self.memory_top_k <= 0 or self.budget_exceeded:
+            return ""
+        # 脚本机器人不读提示，检索块没有意义
+        if not getattr(player.llm_obj, "reads_prompts", True):
+            return ""
+        return self.memory.render(
+            query, viewer=player.player_name, top_k=self.memory_top_k, before=self.memory_mark
+        )
+
     def notify_all_llms(self, msg):
-        for slot in self.role_manager.slots:
-            if not slot.is_human:
-                slot.llm_obj.append_global_event(
-                    f"[Game Update]\n{msg}"
-                )
+        self.memory.add(msg, "update")
+        self.events.append(f"[Game Update]\n{msg}")
 
     def get_state_summary(self):
-        return (
+        summary = (
             f"Game state:\n"
             f"- total_alive = {len(self.alive)}\n"
             f"- werewolves_alive = {len(self.werewolf_list)}\n"
-            f"- alive_players = {[p.player_name for p in self.alive]}\n"
+            f"- alive_players = {self.state.alive_names}\n"
         )
+        if self.vote_digest_days > 0:
+            digest = self.stats.digest(self.vote_digest_days)
+            if digest:
+                summary += digest + "\n"
+        return summary
     
     def get_alive_role_summary(self):
         role_count = {}
@@ -721,7 +1420,7 @@ Tone:
         return "\n".join(lines) + "\n"
 
     
-    def multi_turn_choose(
+    async def multi_turn_choose(
         self,
         actors,
         alive_players,
@@ -731,137 +1430,126 @@ Tone:
         max_retry=3,
         turns=1,
         visibility={"mode":"full", "reveal_actors":False, "reveal_partner":False, "reveal_reason":False},
+        blind=False,
     ):
+        """
+        blind=True 时同一轮内互相看不到彼此的选择（只能看到上一轮），这样的轮次才会走多人设批量推理；
+        否则按座位顺序行动，后行动的人能看到本轮前面的人的选择。
+        """
         alive_names = [p.player_name for p in alive_players]
 
-        turn_history = []
         final_all_rounds = []
 
-        # —— 获取同伴，用于 reveal_partner —— 
-        partner_map = {}
+        # —— 同伴行（同身份的都算同伴，比如多个狼/多个seer），所有 actor 共用一份 ——
+        partner_text = ""
         if visibility.get("reveal_partner", False):
-            # 同身份的都算同伴，比如多个狼/多个seer
-            for p in actors:
-                same_group = [q.player_name for q in actors]
-                partner_map[p.player_name] = same_group
-
-        def build_visible_text(prev_rounds, current_round, actor_index, actors_order):
-            lines = []
-
-            # ---- 上一轮 ----
-            if prev_rounds:
-                last_round = prev_rounds[-1]
-                after_me_last = actors_order[actor_index+1:]
-                before_me_last = actors_order[:actor_index]
-
-                for p in after_me_last + before_me_last:
-                    rec = last_round.get(p.player_name)
-                    if rec and rec.get("target"):
-                        if visibility["mode"] == "anonymous":
-                            base = f"→ {rec['target']}"
-                        else:
-                            base = f"{p.player_name} → {rec['target']}"
-                        # + reason
-                        if visibility.get("reveal_reason") and rec.get("reason"):
-                            base += f"\nreason: {rec['reason']}"
-                        lines.append(base)
-
-            # ---- 当前轮 ----
-            for p in actors_order[:actor_index]:
-                rec = current_round.get(p.player_name)
-                if rec and rec.get("target"):
-                    if visibility["mode"] == "anonymous":
-                        base = f"→ {rec['target']}"
-                    else:
-                        base = f"{p.player_name} → {rec['target']}"
-                    if visibility.get("reveal_reason") and rec.get("reason"):
-                        base += f"\nreason: {rec['reason']}"
-                    lines.append(base)
+            partner_text = f"\nYour partners are: {[q.player_name for q in actors]}"
+
+        anonymous = visibility["mode"] == "anonymous"
+        reveal_reason = visibility.get("reveal_reason")
+
+        def format_record(name, rec):
+            """一条选择记录格式化成可见文本（每人每轮只格式化一次），没有目标返回 None"""
+            if not rec or not rec.get("target"):
+                return None
+            line = f"→ {rec['target']}" if anonymous else f"{name} → {rec['target']}"
+            if reveal_reason and rec.get("reason"):
+                line += f"\nreason: {rec['reason']}"
+            return line
+
+        # 上一轮的已格式化记录（按座位顺序，只保留有目标的）：座位号列表 + 对应文本
+        prev_seats = []
+        prev_lines = []
+
+        def build_visible_text(actor_index):
+            # 上一轮：先看排在我后面的人，再看排在我前面的人
+            split = bisect.bisect_right(prev_seats, actor_index)
+            head = prev_lines[split:]
+            tail = prev_lines[:split]
+            if tail and prev_seats[split - 1] == actor_index:
+                tail = tail[:-1]
+            lines = head + tail + ([] if blind else current_lines)
 
             text = "\n".join(lines) if lines else "None"
+            return text + partner_text
 
-            # ---- reveal_partner: 追加同伴行 ----
-            if visibility.get("reveal_partner", False):
-                me = actors_order[actor_index].player_name
-                partners = partner_map.get(me, [])
-                text += f"\nYour partners are: {partners}"
-
-            return text
-
+        def target_schema(actor):
+            schema = {"target": {"choices": [n for n in alive_names if n != actor.player_name]}}
+            if require_reason:
+                schema["reason"] = {"required": False, "default": "", "max_len": 300}
+            return schema
 
         # ================= 多轮投票逻辑 =================
         for round_id in range(turns):
             current_round = {}
 
-            for actor in actors:
-                actor_index = actors.index(actor)
-
-                visible_text = build_visible_text(
-                    prev_rounds=turn_history,
-                    current_round=current_round,
-                    actor_index=actor_index,
-                    actors_order=actors
+            # 只有盲投（本轮互不可见）才能多人设批量推理，否则会改变"后投者能看到前面的票"的语义
+            batched = {}
+            if blind and self.persona_batch_size > 1:
+                batched = await self.batch_persona_actions(
+                    [a for a in actors if not a.is_human], prompt_header, target_schema, "decision"
                 )
 
+            # 本轮已行动者的已格式化记录（行动顺序即座位顺序）
+            current_seats = []
+            current_lines = []
+
+            def record(actor_index, actor, rec):
+                current_round[actor.player_name] = rec
+                line = format_record(actor.player_name, rec)
+                if line is not None:
+                    current_seats.append(actor_index)
+                    current_lines.append(line)
+
+            for actor_index, actor in enumerate(actors):
+                visible_text = build_visible_text(actor_index)
+
                 # ========== Human ==========
                 if actor.is_human:
-                    print("\nVisible Info:")
-                    print(visible_text)
-                    print("\nChoose your target:")
-                    print(alive_names)
-                    user_t = input("> ").strip()
+                    self.channel.emit("\nVisible Info:")
+                    self.channel.emit(visible_text)
+                    self.channel.emit("\nChoose your target:")
+                    self.channel.emit(alive_names)
+                    user_t = (await self.ask_human("> ", actor.player_name)).strip()
                     rec = None
                     if user_t in alive_names and user_t != actor.player_name:
                         rec = {"target": user_t}
                         if require_reason:
-                            print("\nTypr your reason:")
-                            rec["reason"] = input("> ").strip()
+                            self.channel.emit("\nTypr your reason:")
+                            rec["reason"] = (await self.ask_human("> ", actor.player_name)).strip()
 
                     # 如果本轮需要 reason，但人类不会输入 reason，则自动补 ""
                     if require_reason and rec is not None:
                         rec["reason"] = ""
 
-                    current_round[actor.player_name] = rec
+                    record(actor_index, actor, rec)
                     continue
 
                 # ========== LLM ==========
-                json_schema = (
-                    "{'target':'name','reason':'short'}"
-                    if require_reason else
-                    "{'target':'name'}"
-                )
-
-                prompt = f"""
-    {prompt_header}
-
-    {system_info}
-
-    Current cycle: Night {self.night_count} / Day {self.day_count}.
-
-    Visible info:
-    {visible_text}
-
-    Round {round_id+1}/{turns}
-    Alive players: {alive_names}
+                if actor.player_name in batched:
+                    record(actor_index, actor, batched[actor.player_name])
+                    continue
 
-    Think step-by-step internally.
-    Give ONLY JSON: {json_schema}
-                """
+                schema = target_schema(actor)
+                if not schema["target"]["choices"]:
+                    record(actor_index, actor, None)
+                    continue
 
-                raw = actor.llm_obj.get_response_batch(prompt)
+                json_schema = decision.schema_hint(schema)
 
-                try:
-                    data = json.loads(raw.replace("'", "\""))
-                    tgt = data.get("target", "").strip()
-                except:
-                    tgt = ""
+                prompt = TEMPLATES.render(
+                    "choose",
+                    prompt_header=prompt_header, system_info=system_info,
+                    night=self.night_count, day=self.day_count,
+                    visible_text=visible_text, round_no=round_id + 1, turns=turns,
+                    alive_names=alive_names, json_schema=json_schema,
+                    memory_block=self.recall(actor, f"{prompt_header} {visible_text} {' '.join(alive_names)}"),
+                )
 
-                if tgt in alive_names and tgt != actor.player_name:
-                    current_round[actor.player_name] = data
-                else:
-                    current_round[actor.player_name] = None
+                record(actor_index, actor, await self.ask_decision(actor, prompt, schema, max_retry=max_retry))
 
-            turn_history.append(current_round)
+            # 本轮已格式化的记录直接作为下一轮的"上一轮"
+            prev_seats, prev_lines = current_seats, current_lines
             final_all_rounds.append(current_round)
 
         return final_all_rounds
@@ -898,9 +1586,9 @@ Tone:
                 return None, None, votes
 
         elif strategy == "random_elim":
-            eliminated = random.choice(tied)
+            eliminated = self.rng.choice(tied)
 
-        victim = next((p for p in alive_players if p.player_name == eliminated), None)
+        victim = self.state.get(eliminated) if self.state.is_alive(eliminated) else None
 
         return victim, eliminated, votes
     
@@ -930,9 +1618,9 @@ Tone:
             if not slot.is_human:
                 filename = f"{folder}/{slot.player_name}({slot.name})_game.json"
                 with open(filename, "w", encoding="utf-8") as f:
-                    json.dump(slot.llm_obj.conversation_history, f, indent=2, ensure_ascii=False)
+                    json.dump(slot.llm_obj.export_history(), f, indent=2, ensure_ascii=False)
 
-        print(f"✔ 所有对局记录已保存到 {folder}/")
+        self.channel.emit(f"✔ 所有对局记录已保存到 {folder}/")
         self.save_final_players(folder)
 
     def save_final_players(self, folder):
@@ -950,5 +1638,21 @@ Tone:
         with open(filename, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
 
-        print(f"✔ 最终玩家名单已写入到 {filename}")
+        self.channel.emit(f"✔ 最终玩家名单已写入到 {filename}")
+
+        # 数值化对局记录（投票表 / 夜杀 / 死亡时间线）
+        with open(f"{folder}/stats.json", "w", encoding="utf-8") as f:
+            json.dump(self.stats.to_dict(), f, indent=2, ensure_ascii=False)
+
+        # token / 费用统计
+        with open(f"{folder}/usage.json", "w", encoding="utf-8") as f:
+            json.dump(self.usage.summary(), f, indent=2, ensure_ascii=False)
+
+        # 复现本局所需的信息
+        with open(f"{folder}/game.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "seed": self.seed,
+                "winner": self.winner,
+                "role_counts": self.role_manager.final_role_counts,
+            }, f, indent=2, ensure_ascii=False)
 
@@ -0,0 +1,90 @@
+"""
+对局状态核心：座位索引 + 增量维护的存活 / 阵营集合。
+- 按名字查座位是 O(1)（替代到处 next(...) 的线性扫描）
+- 存活名单、狼人名单和存活名字串都是缓存，只在有人死亡时失效
+- 缓存的列表不会原地修改，遍历中途有人死亡也不受影响
+"""
+
+
+def faction_of(role):
+    role = role.lower()
+    if role == "werewolf":
+        return "werewolf"
+    if role == "jester":
+        return "jester"
+    return "villager"
+
+
+class GameState:
+    def __init__(self, slots):
+        self.slots = list(slots)
+        self.index = {slot.player_name: i for i, slot in enumerate(self.slots)}
+        self.alive_seats = {i for i, slot in enumerate(self.slots) if slot.alive}
+        self.faction_seats = {}     # 阵营 -> 存活座位号集合
+        for i in self.alive_seats:
+            self.faction_seats.setdefault(faction_of(self.slots[i].role), set()).add(i)
+        self._invalidate()
+
+    def _invalidate(self):
+        self._alive = None
+        self._werewolves = None
+        self._alive_names = None
+        self._alive_names_text = None
+
+    # ---------------- 查询 ----------------
+    def get(self, name):
+        """按名字取座位，不存在返回 None"""
+        i = self.index.get(name)
+        return None if i is None else self.slots[i]
+
+    def seat_of(self, name):
+        return self.index.get(name)
+
+    def is_alive(self, name):
+        i = self.index.get(name)
+        return i is not None and i in self.alive_seats
+
+    def count(self, faction=None):
+        if faction is None:
+            return len(self.alive_seats)
+        return len(self.faction_seats.get(faction, ()))
+
+    @property
+    def alive(self):
+        """存活座位（按座位顺序）"""
+        if self._alive is None:
+            self._alive = [self.slots[i] for i in sorted(self.alive_seats)]
+        return self._alive
+
+    @property
+    def werewolves(self):
+        if self._werewolves is None:
+            seats = self.faction_seats.get("werewolf", set())
+            self._werewolves = [self.slots[i] for i in sorted(seats)]
+        return self._werewolves
+
+    @property
+    def alive_names(self):
+        if self._alive_names is None:
+            self._alive_names = [slot.player_name for slot in self.alive]
+        return self._alive_names
+
+    @property
+    def alive_names_text(self):
+        if self._alive_names_text is None:
+            self._alive_names_text = ", ".join(self.alive_names)
+        return self._alive_names_text
+
+    # ---------------- 更新 ----------------
+    def kill(self, name):
+        """标记死亡并更新集合；返回该座位（已死亡或不存在时返回原座位 / None）"""
+        i = self.index.get(name)
+        if i is None:
+            return None
+        slot = self.slots[i]
+        if i in self.alive_seats:
+            slot.alive = False
+            self.alive_seats.discard(i)
+            self.faction_seats.get(faction_of(slot.role), set()).discard(i)
+            self._invalidate()
+        return slot
@@ -0,0 +1,123 @@
+"""
+每局的数值化对局记录（NumPy）：
+- votes[d, voter] = 第 d 次公投中 voter 投给的座位号（-1 = 没投 / 已出局）
+- wolf_kills[n] = 第 n 夜狼人选择的座位号
+- death_cycle / death_cause：每个座位的死亡时间和原因
+每次结算后增量更新；get_state_summary 注入紧凑的表格摘要，分析时直接用数组，不必再解析文本。
+"""
+import numpy as np
+
+# 死亡原因编码；NIGHT_CAUSES 在公开摘要中统一显示为 night（不泄露是否被毒）
+DEATH_CAUSES = {"alive": 0, "night": 1, "poison": 2, "banished": 3, "killed by hunter": 4, "jester": 5}
+CAUSE_NAMES = {v: k for k, v in DEATH_CAUSES.items()}
+NIGHT_CAUSES = {DEATH_CAUSES["night"], DEATH_CAUSES["poison"]}
+
+
+class GameStats:
+    def __init__(self, names):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        n = len(self.names)
+
+        self.votes = np.full((0, n), -1, dtype=np.int16)
+        self.vote_days = np.zeros(0, dtype=np.int16)
+        self.wolf_kills = np.full(0, -1, dtype=np.int16)
+
+        self.death_cycle = np.full(n, -1, dtype=np.int16)     # 死亡发生在第几天 / 第几夜
+        self.death_phase = np.zeros(n, dtype=np.int8)         # 1 = 夜晚，2 = 白天
+        self.death_cause = np.zeros(n, dtype=np.int8)
+        self.death_order = []                                 # 按时间的座位号
+        self._digest = None                                   # 摘要缓存，数据变化时失效
+
+    # ---------------- 增量更新 ----------------
+    def record_votes(self, day, turn_result):
+        """公投结束后写入一行：multi_turn_choose 的结果（多轮时取最后一轮）"""
+        if isinstance(turn_result, dict):
+            turn_result = [turn_result]
+        row = np.full((1, len(self.names)), -1, dtype=np.int16)
+        for rd in turn_result:
+            for voter, data in rd.items():
+                if data and data.get("target") in self.index and voter in self.index:
+                    row[0, self.index[voter]] = self.index[data["target"]]
+        self.votes = np.vstack([self.votes, row])
+        self.vote_days = np.append(self.vote_days, np.int16(day))
+        self._digest = None
+
+    def record_wolf_kill(self, night, name):
+        if len(self.wolf_kills) < night:
+            self.wolf_kills = np.concatenate([
+                self.wolf_kills, np.full(night - len(self.wolf_kills), -1, dtype=np.int16)
+            ])
+        self.wolf_kills[night - 1] = self.index.get(name, -1)
+
+    def record_death(self, name, cycle, cause, night=False):
+        i = self.index.get(name)
+        if i is None or self.death_cause[i] != 0:
+            return
+        self.death_cycle[i] = cycle
+        self.death_phase[i] = 1 if night else 2
+        self.death_cause[i] = DEATH_CAUSES.get(cause, DEATH_CAUSES["night"])
+        self.death_order.append(i)
+        self._digest = None
+
+    # ---------------- 分析 ----------------
+    def votes_received(self):
+        """每个座位累计被投票数"""
+        valid = self.votes[self.votes >= 0]
+        return np.bincount(valid, minlength=len(self.names))
+
+    def agreement(self):
+        """两两投票一致的次数矩阵（同一天投给同一人）"""
+        n = len(self.names)
+        same = np.zeros((n, n), dtype=np.int16)
+        for row in self.votes:
+            voted = row >= 0
+            same += (voted[:, None] & voted[None, :] & (row[:, None] == row[None, :])).astype(np.int16)
+        np.fill_diagonal(same, 0)
+        return same
+
+    def to_dict(self):
+        return {
+            "names": self.names,
+            "vote_days": self.vote_days.tolist(),
+            "votes": self.votes.tolist(),
+            "wolf_kills": self.wolf_kills.tolist(),
+            "death_cycle": self.death_cycle.tolist(),
+            "death_phase": [("", "night", "day")[int(p)] for p in self.death_phase],
+            "death_cause": [CAUSE_NAMES[int(c)] for c in self.death_cause],
+        }
+
+    # ---------------- 提示摘要 ----------------
+    def digest(self, max_days=3):
+        """公开信息的紧凑表格：最近 max_days 次公投 + 死亡时间线"""
+        if self._digest is None or self._digest[0] != max_days:
+            self._digest = (max_days, self._render_digest(max_days))
+        return self._digest[1]
+
+    def _render_digest(self, max_days):
+        lines = []
+
+        rows = self.votes[-max_days:]
+        days = self.vote_days[-max_days:]
+        voters = np.flatnonzero((rows >= 0).any(axis=0))
+
+        if len(voters):
+            width = max(len(self.names[i]) for i in voters)
+            lines.append("Vote table (voter -> target per day, '-' = no vote):")
+            lines.append("voter".ljust(width) + "".join(f" | D{d}" for d in days))
+            for i in voters:
+                cells = [self.names[t] if t >= 0 else "-" for t in rows[:, i]]
+                lines.append(self.names[i].ljust(width) + "".join(f" | {c}" for c in cells))
+
+        if self.death_order:
+            deaths = []
+            for i in self.death_order:
+                cause = int(self.death_cause[i])
+                when = f"{'N' if self.death_phase[i] == 1 else 'D'}{self.death_cycle[i]}"
+                if cause in NIGHT_CAUSES:
+                    deaths.append(f"{when} {self.names[i]}")
+                else:
+                    deaths.append(f"{when} {self.names[i]} ({CAUSE_NAMES[cause]})")
+            lines.append("Deaths: " + ", ".join(deaths))
+
+        return "\n".join(lines)
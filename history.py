@@ -0,0 +1,156 @@
+"""
+紧凑的对话历史：
+- 固定头部：系统提示 + 事件块 + 置顶消息（如自我介绍，不参与裁剪）
+- 最近消息放在定长环形缓冲（deque）里，超长时自动丢弃最旧的
+- API 视图（[{'role', 'content'}]）随消息增删增量维护，每次请求直接复用，不再整表重建
+- 系统提示按段保存（规则 / 角色说明 / 座位私有部分），同局座位共享同一段字符串对象，
+  只在请求时拼接，请求结束后 release_view() 释放拼接结果
+"""
+import json
+import time
+from collections import deque
+from datetime import datetime
+
+EVENTS_HEADER = 'Important events are below:\n'
+
+
+class Message:
+    __slots__ = ("role", "content", "timestamp")
+
+    def __init__(self, role, content, timestamp=None):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp      # time.time()；头部消息为 None
+
+    def to_dict(self):
+        data = {'role': self.role, 'content': self.content}
+        if self.timestamp is not None:
+            data['timestamp'] = datetime.fromtimestamp(self.timestamp).isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        ts = data.get('timestamp')
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts).timestamp()
+        return cls(data['role'], data['content'], ts)
+
+
+class ConversationHistory:
+    def __init__(self, system_prompt, max_length):
+        self.system_parts = self._parts(system_prompt)
+        self.events = Message('system', EVENTS_HEADER)
+        self.pinned = {}                           # key -> Message
+        self.recent = deque(maxlen=max_length)
+        self._view = [{'role': 'system', 'content': ''}, self._api(self.events)]
+
+    @staticmethod
+    def _parts(content):
+        """系统提示可以是字符串，也可以是若干共享段组成的 tuple"""
+        return (content,) if isinstance(content, str) else tuple(content)
+
+    @property
+    def system(self):
+        return Message('system', "".join(self.system_parts))
+
+    @staticmethod
+    def _api(msg):
+        return {'role': msg.role, 'content': msg.content}
+
+    @property
+    def head_length(self):
+        return 2 + len(self.pinned)
+
+    def __len__(self):
+        return self.head_length + len(self.recent)
+
+    def __iter__(self):
+        yield self.system
+        yield self.events
+        yield from self.pinned.values()
+        yield from self.recent
+
+    # ---------------- 修改 ----------------
+    def append(self, role, content):
+        return self._push(Message(role, content, time.time()))
+
+    def _push(self, msg):
+        """追加一条消息；缓冲已满时同时从视图中删掉最旧的一条"""
+        if len(self.recent) == self.recent.maxlen:
+            del self._view[self.head_length]
+        self.recent.append(msg)
+        self._view.append(self._api(msg))
+        return msg
+
+    def set_system(self, content):
+        self.system_parts = self._parts(content)
+
+    def set_events(self, content):
+        self.events.content = content
+        self._view[1]['content'] = content
+
+    def pin(self, key, role, content):
+        """置顶消息：放在事件块之后，不会被裁剪；同一个 key 再次调用时替换内容"""
+        msg = self.pinned.get(key)
+        if msg is not None:
+            msg.role = role
+            msg.content = content
+            self._view[2 + list(self.pinned).index(key)] = self._api(msg)
+            return
+        msg = Message(role, content)
+        self._view.insert(self.head_length, self._api(msg))
+        self.pinned[key] = msg
+
+    def clear(self):
+        """只保留系统提示，事件块回到初始状态"""
+        self.pinned.clear()
+        self.recent.clear()
+        self.events.content = EVENTS_HEADER
+        self._view = [{'role': 'system', 'content': ''}, self._api(self.events)]
+
+    # ---------------- 读取 ----------------
+    def api_view(self, events_suffix=""):
+        """
+        发送给 API 的消息列表。返回的是内部维护的视图本身（调用方不要修改）；
+        系统提示在此时拼接，events_suffix 为请求时才渲染的事件文本，拼在事件块后面。
+        """
+        self._view[0]['content'] = "".join(self.system_parts)
+        self._view[1]['content'] = self.events.content + events_suffix
+        return self._view
+
+    def release_view(self):
+        """请求发出后释放拼接出来的系统提示和事件块，只保留共享段的引用"""
+        self._view[0]['content'] = ''
+        self._view[1]['content'] = self.events.content
+
+    def to_list(self, events_suffix=""):
+        data = [msg.to_dict() for msg in self]
+        data[1]['content'] += events_suffix
+        # 置顶消息带上自己的 key，from_list 据此恢复为置顶
+        for i, key in enumerate(self.pinned, start=2):
+            data[i]['pinned'] = key
+        return data
+
+    @classmethod
+    def from_list(cls, data, max_length):
+        """从 to_list 的结果恢复：前两条为系统提示和事件块，带 "pinned" 的恢复为置顶消息，其余按普通消息处理"""
+        history = cls(data[0]['content'] if data else '', max_length)
+        rest = data[1:]
+        if rest and rest[0]['role'] == 'system':
+            history.set_events(rest[0]['content'])
+            rest = rest[1:]
+        for item in rest:
+            if 'pinned' in item:
+                history.pin(item['pinned'], item['role'], item['content'])
+            else:
+                history._push(Message.from_dict(item))
+        return history
+
+    def dump(self, path, events_suffix=""):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_list(events_suffix), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path, max_length):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_list(json.load(f), max_length)
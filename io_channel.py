@@ -0,0 +1,149 @@
+"""
+引擎与外界的输入输出通道：GameManager / RoleManager 的全部输出和人类输入都经过这里，不直接 print / input。
+
+- ConsoleChannel：控制台（默认）
+- NullChannel：丢弃输出，人类输入一律返回空字符串（纯引擎模式 / 基准测试）
+- BufferedChannel：输出存进内存；人类输入由 responder 回调或预设答案给出（测试、回放）
+- QueueChannel：输出和人类输入请求都放进队列，由其他线程 / 协程（网页、机器人服务等）消费并作答
+
+人类输入是一个 HumanRequest：可以同步 wait()，也可以 await。
+"""
+import asyncio
+import queue
+import threading
+
+
+class HumanRequest:
+    """一次人类输入请求；answer() 可以在任意线程调用"""
+
+    def __init__(self, prompt, player=None):
+        self.prompt = prompt
+        self.player = player
+        self.value = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def answer(self, text):
+        self.value = "" if text is None else str(text)
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """阻塞等待作答；超时返回空字符串"""
+        if not self._done.wait(timeout):
+            return ""
+        return self.value
+
+    async def wait_async(self):
+        if not self.done:
+            await asyncio.get_running_loop().run_in_executor(None, self._done.wait)
+        return self.value
+
+    def __await__(self):
+        return self.wait_async().__await__()
+
+
+class IOChannel:
+    def emit(self, *parts, sep=" ", end="\n"):
+        """输出一条消息（参数与 print 相同）"""
+        raise NotImplementedError
+
+    def request(self, prompt, player=None):
+        """发起一次人类输入请求，返回 HumanRequest"""
+        raise NotImplementedError
+
+    def ask(self, prompt, player=None):
+        """同步获取人类输入"""
+        return self.request(prompt, player).wait()
+
+    async def ask_async(self, prompt, player=None):
+        return await self.request(prompt, player)
+
+
+class ConsoleChannel(IOChannel):
+    def emit(self, *parts, sep=" ", end="\n"):
+        print(*parts, sep=sep, end=end)
+
+    def request(self, prompt, player=None):
+        req = HumanRequest(prompt, player)
+        req.answer(input(prompt))
+        return req
+
+    async def ask_async(self, prompt, player=None):
+        return await asyncio.get_running_loop().run_in_executor(None, input, prompt)
+
+
+class NullChannel(IOChannel):
+    def emit(self, *parts, sep=" ", end="\n"):
+        pass
+
+    def request(self, prompt, player=None):
+        req = HumanRequest(prompt, player)
+        req.answer("")
+        return req
+
+
+class BufferedChannel(IOChannel):
+    """
+    输出按 print 的格式拼进 self.chunks，text() 取全部输出。
+    responder 为 callable(prompt, player) -> str，或预设答案的列表（按顺序取，用完后返回空字符串）。
+    """
+
+    def __init__(self, responder=None, echo_prompts=True):
+        self.chunks = []
+        self.echo_prompts = echo_prompts
+        if responder is None or callable(responder):
+            self._responder = responder
+        else:
+            answers = iter(list(responder))
+            self._responder = lambda prompt, player: next(answers, "")
+
+    def emit(self, *parts, sep=" ", end="\n"):
+        self.chunks.append(sep.join(str(p) for p in parts) + end)
+
+    def request(self, prompt, player=None):
+        req = HumanRequest(prompt, player)
+        req.answer(self._responder(prompt, player) if self._responder else "")
+        if self.echo_prompts:
+            self.chunks.append(f"{prompt}{req.value}\n")
+        return req
+
+    def text(self):
+        return "".join(self.chunks)
+
+    def clear(self):
+        self.chunks.clear()
+
+
+class QueueChannel(IOChannel):
+    """
+    outbox 中依次是 ("output", 文本) 和 ("input", HumanRequest)；
+    消费方对 HumanRequest 调用 answer() 后，引擎继续执行。timeout 秒内无人作答视为空输入。
+    """
+
+    def __init__(self, outbox=None, timeout=None):
+        self.outbox = outbox if outbox is not None else queue.Queue()
+        self.timeout = timeout
+
+    def emit(self, *parts, sep=" ", end="\n"):
+        self.outbox.put(("output", sep.join(str(p) for p in parts) + end))
+
+    def request(self, prompt, player=None):
+        req = HumanRequest(prompt, player)
+        self.outbox.put(("input", req))
+        return req
+
+    def ask(self, prompt, player=None):
+        return self.request(prompt, player).wait(self.timeout)
+
+    async def ask_async(self, prompt, player=None):
+        """与 ask 相同的超时：timeout 秒内无人作答视为空输入，不让整个事件循环上的对局卡住"""
+        req = self.request(prompt, player)
+        try:
+            return await asyncio.wait_for(req.wait_async(), self.timeout)
+        except asyncio.TimeoutError:
+            # 作答为空，同时放掉 wait_async 中仍在等待的线程
+            req.answer("")
+            return ""
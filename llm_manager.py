@@ -3,17 +3,21 @@ import json
 import os
 from dotenv import dotenv_values
 from agent import MultiTurnChatAgent
+from bots import ScriptedAgent
 
 @dataclass
 class LLMManager:
     llm_dict: dict = field(default_factory=dict)
     configs: dict = field(default_factory=dict)
     length : int = 0
+    # 所有模型共享的响应缓存（见 response_cache.py），None = 不使用
+    response_cache: any = None
 
-    def add_llm(self, name: str, base_url: str, model: str):
+    def add_llm(self, name: str, base_url: str, model: str, validate: bool = True):
         """
         添加一个新的 LLM，但不包含 API key。
         API key 必须写入 .env，变量名格式： MODELNAME_1_API_KEY
+        validate=False 时不发送 "hi" 测试请求（批量对局复用已验证过的配置）
         """
         # 读取 API key，强迫用户把它写进 .env，而不是丢 config 里
         env = dotenv_values(".env")   # 每次调用读取一次文件
@@ -27,7 +31,15 @@ class LLMManager:
             api_key=api_key,
             base_url=base_url,
             model=model,
+            json_mode=self.configs.get(name, {}).get('json_mode', False),
         )
+        agent.response_cache = self.response_cache
+        # 异步对局按 (base_url, model) 共享的限流额度，见 clients.py
+        agent.rate_limit = self.configs.get(name, {}).get('rate_limit')
+        if not validate:
+            self._register(name, base_url, model, agent)
+            return True
+
         # 测试添加的模型是否正常工作
         try:
             resp = agent.get_response("hi")
@@ -40,15 +52,8 @@ class LLMManager:
             # 如果 resp 是非空字符串，且不是错误，就认为成功
             if isinstance(resp, str) and len(resp.strip()) > 0:
                 print(f"LLM {name} 模型添加成功，测试回复：{resp[:60]}...")
-                config = {
-                    'base_url': base_url,
-                    'model': model,
-                }
                 agent.clear_history()
-
-                self.configs[name] = config
-                self.llm_dict[name] = agent
-                self.length += 1
+                self._register(name, base_url, model, agent)
                 return True
 
             # 空内容情况
@@ -59,6 +64,17 @@ class LLMManager:
             print(f"警告：LLM {name} 初始化时出现异常：{str(e)}")
             return False
 
+    def _register(self, name, base_url, model, agent):
+        # 保留已有配置中的其他字段（如 call_profiles）
+        config = dict(self.configs.get(name, {}))
+        config.update({
+            'base_url': base_url,
+            'model': model,
+        })
+        self.configs[name] = config
+        self.llm_dict[name] = agent
+        self.length += 1
+
     def remove_llm(self, name):
         if name not in self.llm_dict:
             print(f"模型 {name} 不存在。")
@@ -78,8 +94,10 @@ class LLMManager:
              "model2": {...}
            }
         """
-        save_data = {"length": len(self.configs)}
-        save_data.update(self.configs)
+        # 脚本机器人只存在于内存中，不写入配置文件
+        configs = {k: v for k, v in self.configs.items() if not v.get("bot")}
+        save_data = {"length": len(configs)}
+        save_data.update(configs)
 
         with open(path, "w", encoding="utf-8") as f:
             json.dump(save_data, f, indent=4, ensure_ascii=False)
@@ -128,17 +146,38 @@ class LLMManager:
             agent.clear_history()
         print("以清理所有llm模型历史")
 
+    def add_bot(self, name, policy="heuristic", seed=None, keep_history=False):
+        """添加一个脚本机器人（不调用 API，见 bots.py），不写入 llm_configs.json"""
+        agent = ScriptedAgent(policy=policy, seed=seed, keep_history=keep_history)
+        self.configs[name] = {"bot": policy, "model": agent.model, "seed": seed, "keep_history": keep_history}
+        self.llm_dict[name] = agent
+        self.length += 1
+        return agent
+
     def create_new_agent(self, name):
         config = self.configs[name]
+        if config.get("bot"):
+            # 复制出的机器人各用不同的子种子，保证同一 seed 下结果可复现
+            config["clones"] = config.get("clones", 0) + 1
+            seed = config.get("seed")
+            return ScriptedAgent(
+                policy=config["bot"],
+                seed=None if seed is None else f"{seed}:{config['clones']}",
+                keep_history=config.get("keep_history", False),
+            )
         env = dotenv_values(".env")
         api_key_var = f"{name.upper()}_API_KEY"
         api_key = env.get(api_key_var)
 
-        return MultiTurnChatAgent(
+        agent = MultiTurnChatAgent(
             api_key=api_key,
             base_url=config['base_url'],
-            model=config['model']
-    )
+            model=config['model'],
+            json_mode=config.get('json_mode', False),
+        )
+        agent.response_cache = self.response_cache
+        agent.rate_limit = config.get('rate_limit')
+        return agent
 
     
         
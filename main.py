@@ -1,8 +1,10 @@
 # main.py（扩展版）
+import random
 import sys
 from llm_manager import LLMManager
 from role_manager import RoleManager, NameStrategyCategorized
 from game import GameManager
+from response_cache import ResponseCache
 
 # 全局变量，用于设置 LLM 扮演的玩家数量
 LLM_PLAYER_NUMBER = None  
@@ -64,6 +66,10 @@ def start_game(llm_manager: LLMManager):
         custom_mode = False
         user_name = "HUMAN_PLACEHOLDER"
 
+    # 本局种子：入座、洗牌、角色分配、起名都由它决定，留空时自动生成（开局时会打印出来，填回即可复现）
+    raw_seed = input("随机种子（留空自动生成）： ").strip()
+    seed = int(raw_seed) if raw_seed.isdigit() else random.getrandbits(63)
+
     # 清空上一轮历史
     llm_manager.clear_all_history()
 
@@ -71,6 +77,7 @@ def start_game(llm_manager: LLMManager):
     role_manager = RoleManager(
         llm_manager=llm_manager,
         player_name=user_name,
+        seed=seed,
     )
 
     # 彻底清空旧内容
@@ -89,13 +96,14 @@ def start_game(llm_manager: LLMManager):
     # 初始化 GameManager（内部会处理角色分配等）
     game_manager = GameManager(
         llm_manager=llm_manager,
-        role_manager=role_manager
+        role_manager=role_manager,
+        seed=seed,
     )
 
     print("\n>>> 游戏开始！")
     print(">>> LLM 将自动扮演其他角色。\n")
 
-    game_manager.game()
+    return game_manager.game()
 
 
 def set_llm_player_number():
@@ -121,7 +129,8 @@ def set_llm_player_number():
 
 def main():
 
-    llm_manager = LLMManager()
+    # LLM_CACHE_MODE=record / replay / readthrough 时启用响应缓存
+    llm_manager = LLMManager(response_cache=ResponseCache.from_env())
 
     try:
         llm_manager.load_configs()
@@ -0,0 +1,127 @@
+"""
+每局的本地检索记忆（BM25，纯内存，无网络）：
+所有公开事件、发言和私有结果（预言家查验、狼人夜聊等）都写入索引，
+每次决策时按当前上下文取回少量最相关的旧记录，放进一个小的提示块。
+"""
+import math
+import re
+
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+_CJK_RUN_RE = re.compile(r"[一-鿿]+")
+
+_STOP_WORDS = {
+    "the", "a", "an", "is", "are", "was", "were", "be", "to", "of", "and", "or",
+    "in", "on", "at", "for", "you", "your", "i", "me", "my", "it", "this", "that",
+    "with", "as", "by", "not", "no", "do", "does",
+}
+
+
+def tokenize(text):
+    """英文按词切分，中文按相邻二字切分（单字成词）"""
+    text = text.lower()
+    tokens = [w for w in _WORD_RE.findall(text) if w not in _STOP_WORDS]
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class MemoryItem:
+    __slots__ = ("doc_id", "text", "kind", "visible_to", "length")
+
+    def __init__(self, doc_id, text, kind, visible_to, length):
+        self.doc_id = doc_id
+        self.text = text
+        self.kind = kind
+        self.visible_to = visible_to
+        self.length = length
+
+
+class EventMemory:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.items = []
+        self.postings = {}       # term -> {doc_id: tf}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, text, kind="event", visible_to=None):
+        """
+        写入一条记录。visible_to=None 表示公开，否则为可见玩家名集合。
+        返回 doc_id。
+        """
+        tokens = tokenize(text)
+        doc_id = len(self.items)
+        self.items.append(MemoryItem(
+            doc_id, text.strip(), kind,
+            frozenset(visible_to) if visible_to is not None else None,
+            len(tokens),
+        ))
+        self.total_length += len(tokens)
+
+        for term in tokens:
+            post = self.postings.setdefault(term, {})
+            post[doc_id] = post.get(doc_id, 0) + 1
+        return doc_id
+
+    def private_items(self, viewer, limit=3):
+        """viewer 最近的私有记录（预言家结果、女巫用药、狼人夜聊等）"""
+        found = []
+        for item in reversed(self.items):
+            if item.visible_to is not None and viewer in item.visible_to:
+                found.append(item)
+                if len(found) >= limit:
+                    break
+        return found[::-1]
+
+    def search(self, query, viewer=None, top_k=3, before=None):
+        """
+        BM25 检索，只返回 viewer 可见的记录。
+        before：只在 doc_id < before 的记录中检索（跳过仍在上下文中的近期记录）。
+        """
+        if not self.items or top_k <= 0:
+            return []
+
+        limit = len(self.items) if before is None else min(before, len(self.items))
+        if limit <= 0:
+            return []
+
+        n = len(self.items)
+        avg_len = self.total_length / n if n else 0.0
+        scores = {}
+
+        for term in set(tokenize(query)):
+            post = self.postings.get(term)
+            if not post:
+                continue
+            idf = math.log(1 + (n - len(post) + 0.5) / (len(post) + 0.5))
+            for doc_id, tf in post.items():
+                if doc_id >= limit:
+                    continue
+                item = self.items[doc_id]
+                if item.visible_to is not None and viewer not in item.visible_to:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * item.length / avg_len) if avg_len else self.k1
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda kv: (-kv[1], -kv[0]))[:top_k]
+        # 按时间顺序输出，便于模型理解先后
+        return [self.items[doc_id] for doc_id, _ in sorted(best)]
+
+    def render(self, query, viewer=None, top_k=3, before=None, max_chars=200):
+        """检索结果格式化成提示块（每条压成一行并截断）；没有结果时返回空字符串"""
+        hits = self.search(query, viewer=viewer, top_k=top_k, before=before)
+        if not hits:
+            return ""
+        lines = ["Relevant earlier events:"]
+        for item in hits:
+            text = " ".join(item.text.split())
+            if len(text) > max_chars:
+                text = text[:max_chars - 1] + "…"
+            lines.append(f"- [{item.kind}] {text}")
+        return "\n".join(lines)
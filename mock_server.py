@@ -0,0 +1,313 @@
+"""
+本地的 OpenAI 兼容模拟服务（只用标准库）：实现 POST /chat/completions（也接受 /v1 前缀），
+支持流式（SSE）和非流式两种返回，用于在没有真实 key 的机器上跑通整局、测试并发 / 超时 / 限流和做基准。
+
+回复按提示内容生成“像样”的游戏回复：
+- 提示里有 JSON 格式说明（decision.schema_hint 的形式）时，按字段生成合法 JSON：
+  "<name>" 类字段从 Alive players / alive_players 中选（不选自己），"a" | "b" 类字段在选项中选，其余给短句
+- 多人设批量请求（persona_batch）按座位返回 {座位名: {...}}
+- 其他请求返回一句简短的发言
+
+可配置：总延迟分布、首 token 延迟、每秒 token 数、429 / 5xx 注入比例。
+
+    python mock_server.py --port 8000 --latency 0.3 --latency-dist lognormal --ttft 0.2 --tps 60 --rate-429 0.05
+
+llm_configs.json 指向它：{"mock": {"base_url": "http://127.0.0.1:8000/v1", "model": "mock"}}，
+并在 .env 中写入 MOCK_API_KEY=anything。代码里可以直接在后台线程启动：
+
+    server = MockServer(MockConfig(latency=0.1)).start()
+    ... server.base_url ...
+    server.stop()
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_HINT_RE = re.compile(r"(\{[^{}]*\"[^{}]*\})\s*$")
+_FIELD_RE = re.compile(r'"(\w+)":\s*((?:"[^"]*"(?:\s*\|\s*)?)+)')
+_ALIVE_RE = re.compile(r"(?:Alive players:|alive_players =)\s*(\[[^\]]*\])")
+_SELF_RE = re.compile(r"Your player name is: (.+?)\.\n")
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+SPEECHES = [
+    "I think {name} is acting suspicious today.",
+    "{name} was too quiet, I will watch them.",
+    "No strong read yet, but {name} worries me.",
+    "I trust {name} for now. Let's hear more.",
+]
+
+
+@dataclass
+class MockConfig:
+    host: str = "127.0.0.1"
+    port: int = 8000
+    latency: float = 0.0          # 非流式：整个回复的平均耗时（秒，不含生成 token 的时间）
+    latency_dist: str = "fixed"   # fixed / uniform / exponential / lognormal
+    ttft: float = 0.0             # 流式：首 token 前的平均等待（秒），分布同 latency_dist
+    tps: float = 0.0              # 每秒 token 数，0 = 不限速
+    rate_429: float = 0.0         # 返回 429 的比例
+    rate_5xx: float = 0.0         # 返回 500 / 502 / 503 的比例
+    retry_after: float = 1.0      # 429 的 Retry-After 头
+    seed: int = 0
+    model: str = "mock"
+
+
+def _names(text):
+    """提示中最后一次出现的存活名单"""
+    found = _ALIVE_RE.findall(text)
+    if not found:
+        return []
+    return [a or b for a, b in re.findall(r"'([^']+)'|\"([^\"]+)\"", found[-1])]
+
+
+def _fill(hint, rng, names, me):
+    """按 schema_hint 的字段示例生成一个合法的 JSON 对象"""
+    data = {}
+    others = [n for n in names if n != me] or names
+    for key, value in _FIELD_RE.findall(hint):
+        options = re.findall(r'"([^"]*)"', value)
+        if len(options) > 1:
+            data[key] = rng.choice(options)
+        elif "name" in options[0] or key == "target":
+            allow_empty = "empty" in options[0]
+            data[key] = "" if (allow_empty and rng.random() < 0.3) or not others else rng.choice(others)
+        else:
+            data[key] = rng.choice(SPEECHES).format(name=rng.choice(others)) if others else "ok"
+    return data
+
+
+def generate_reply(messages, rng):
+    """根据请求生成回复文本"""
+    prompt = messages[-1]["content"] if messages else ""
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    me = _SELF_RE.search(system)
+    me = me.group(1) if me else None
+    names = _names(prompt)
+
+    # 多人设批量请求：每个座位一个对象
+    if "keyed by player name" in prompt:
+        reply = {}
+        for block in re.split(r"^### ", prompt, flags=re.M)[1:]:
+            seat = block.split("\n", 1)[0].strip()
+            hint = re.search(r"Reply format: (\{.*\})", block)
+            reply[seat] = _fill(hint.group(1), rng, names, seat) if hint else {}
+        return json.dumps(reply, ensure_ascii=False)
+
+    hint = _HINT_RE.search(prompt.strip()) if "JSON" in prompt and "NOT output JSON" not in prompt else None
+    if hint:
+        return json.dumps(_fill(hint.group(1), rng, names, me), ensure_ascii=False)
+
+    if names:
+        return rng.choice(SPEECHES).format(name=rng.choice([n for n in names if n != me] or names))
+    return "Hello! Let's play."
+
+
+class MockServer:
+    def __init__(self, config=None):
+        self.config = config or MockConfig()
+        self._rng = random.Random(self.config.seed)   # 延迟 / 故障注入
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2] if self.httpd else (self.config.host, self.config.port)
+        return f"http://{host}:{port}/v1"
+
+    def _draw(self, mean):
+        """按 latency_dist 抽一个均值为 mean 的等待时间"""
+        if mean <= 0:
+            return 0.0
+        with self._lock:
+            dist = self.config.latency_dist
+            if dist == "uniform":
+                return self._rng.uniform(0, 2 * mean)
+            if dist == "exponential":
+                return self._rng.expovariate(1 / mean)
+            if dist == "lognormal":
+                sigma = 0.5
+                return self._rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+            return mean
+
+    def _fault(self):
+        """返回要注入的 HTTP 状态码，或 None"""
+        with self._lock:
+            self.requests += 1
+            r = self._rng.random()
+            if r < self.config.rate_429:
+                self.errors += 1
+                return 429
+            if r < self.config.rate_429 + self.config.rate_5xx:
+                self.errors += 1
+                return self._rng.choice([500, 502, 503])
+        return None
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def _send_json(self, status, body, headers=None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json(200, {"object": "list", "data": [{"id": server.config.model, "object": "model"}]})
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+                status = server._fault()
+                if status == 429:
+                    self._send_json(
+                        429, {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_error"}},
+                        {"Retry-After": str(server.config.retry_after)},
+                    )
+                    return
+                if status:
+                    self._send_json(status, {"error": {"message": f"Mock upstream error {status}", "type": "server_error"}})
+                    return
+
+                server.handle_completion(self, body)
+
+        return Handler
+
+    def handle_completion(self, handler, body):
+        messages = body.get("messages") or []
+        model = body.get("model") or self.config.model
+        # 回复内容只由请求本身和种子决定，便于复现
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+        rng = random.Random(f"{self.config.seed}:{digest}")
+        text = generate_reply(messages, rng)
+
+        tokens = _TOKEN_RE.findall(text)
+        max_tokens = body.get("max_tokens")
+        finish_reason = "stop"
+        if max_tokens and len(tokens) > max_tokens:
+            tokens, finish_reason = tokens[:max_tokens], "length"
+            text = "".join(tokens)
+        usage = {
+            "prompt_tokens": sum(len(m.get("content") or "") for m in messages) // 4,
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        per_token = 1 / self.config.tps if self.config.tps > 0 else 0.0
+        cid = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            time.sleep(self._draw(self.config.latency) + per_token * len(tokens))
+            handler._send_json(200, {
+                "id": cid, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+
+        def send(chunk):
+            handler.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+
+        def chunk(delta, reason=None):
+            return {
+                "id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": reason}],
+            }
+
+        try:
+            time.sleep(self._draw(self.config.ttft))
+            send(chunk({"role": "assistant", "content": ""}))
+            for tok in tokens:
+                if per_token:
+                    time.sleep(per_token)
+                send(chunk({"content": tok}))
+            send(chunk({}, finish_reason))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                send({"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                      "choices": [], "usage": usage})
+            handler.wfile.write(b"data: [DONE]\n\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass    # 客户端超时断开
+
+    # ---------------- 启停 ----------------
+    def start(self):
+        """在后台线程启动，返回 self；port=0 时自动选一个空闲端口"""
+        self.httpd = ThreadingHTTPServer((self.config.host, self.config.port), self.make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd = ThreadingHTTPServer((self.config.host, self.config.port), self.make_handler())
+        self.httpd.daemon_threads = True
+        print(f"mock server listening on {self.base_url}")
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.httpd.server_close()
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="非流式回复的平均延迟（秒）")
+    parser.add_argument("--latency-dist", default="fixed", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--ttft", type=float, default=0.0, help="流式首 token 的平均延迟（秒）")
+    parser.add_argument("--tps", type=float, default=0.0, help="每秒 token 数（0 = 不限速）")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="mock")
+    args = parser.parse_args()
+
+    MockServer(MockConfig(
+        host=args.host, port=args.port, latency=args.latency, latency_dist=args.latency_dist,
+        ttft=args.ttft, tps=args.tps, rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after, seed=args.seed, model=args.model,
+    )).serve_forever()
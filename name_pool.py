@@ -0,0 +1,64 @@
+"""
+无放回随机抽取的名字池（懒 Fisher-Yates）：
+只用字典记录被交换过的位置，抽取 / 归还 / 预占都是 O(1)，
+大池子（如 6 个前缀 × 9999 个编号）也不需要预先生成整张表。
+"""
+
+
+class NamePool:
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.taken = 0          # 前 taken 个位置是已抽出的
+        self._value_at = {}     # 位置 -> 值（未出现时值 = 位置）
+        self._pos_of = {}       # 值 -> 位置（同上）
+
+    @property
+    def remaining(self):
+        return self.size - self.taken
+
+    def _swap(self, i, j):
+        vi = self._value_at.get(i, i)
+        vj = self._value_at.get(j, j)
+        self._value_at[i], self._pos_of[vj] = vj, i
+        self._value_at[j], self._pos_of[vi] = vi, j
+
+    def draw(self):
+        """随机抽出一个值；池子空了返回 None"""
+        if self.taken >= self.size:
+            return None
+        j = self.rng.randrange(self.taken, self.size)
+        self._swap(self.taken, j)
+        value = self._value_at.get(self.taken, self.taken)
+        self.taken += 1
+        return value
+
+    def reserve(self, value):
+        """预占指定的值（如玩家自定义的名字）；已被占用返回 False"""
+        pos = self._pos_of.get(value, value)
+        if pos < self.taken:
+            return False
+        self._swap(self.taken, pos)
+        self.taken += 1
+        return True
+
+    def release(self, value):
+        """归还一个已抽出的值"""
+        pos = self._pos_of.get(value, value)
+        if pos >= self.taken:
+            return
+        self.taken -= 1
+        self._swap(pos, self.taken)
+
+    def reset(self):
+        self.taken = 0
+        self._value_at.clear()
+        self._pos_of.clear()
+
+    def checkpoint(self):
+        return (self.taken, dict(self._value_at), dict(self._pos_of))
+
+    def restore(self, state):
+        self.taken, value_at, pos_of = state
+        self._value_at = dict(value_at)
+        self._pos_of = dict(pos_of)
@@ -0,0 +1,82 @@
+"""
+多人设批量推理（面向大规模模拟的可选模式）：
+同一模型背后的若干座位合并成一次请求，模型返回 {座位名: 该座位的结构化动作}，再拆回各自的对话历史，
+自我介绍、盲投这类同时行动的阶段，请求数从 N 降到 N / batch。
+每个座位在请求里有自己的座位块（角色说明、人设、私有记录、最近发言），公开信息只发送一次。
+同一请求里的模型能看到整批座位的块：GameManager.persona_batch_scope="knowledge" 时只合并彼此已知
+对方私有信息的座位（如狼人同伴），座位块里也只放批内所有座位都已知道的私有信息。
+"""
+import json
+
+import decision
+
+
+def group_by_model(seats, batch_size, knowledge=None):
+    """
+    按 (model, base_url, knowledge(slot)) 分组后切块，保持座位原有顺序。
+    knowledge(slot) 相同的座位才能合批（共享同一份私有信息），缺省不区分。
+    """
+    groups = {}
+    for slot in seats:
+        agent = slot.llm_obj
+        key = (agent.model, str(getattr(agent, "base_url", "")), knowledge(slot) if knowledge else None)
+        groups.setdefault(key, []).append(slot)
+
+    chunks = []
+    for members in groups.values():
+        for i in range(0, len(members), batch_size):
+            chunks.append(members[i:i + batch_size])
+    return chunks
+
+
+def build_batch_prompt(task, shared_context, seat_blocks, seat_schemas):
+    """
+    task：所有座位共同的任务说明
+    shared_context：所有座位共享的公开信息（只发送一次）
+    seat_blocks：{座位名: 该座位的上下文摘要（只含批内所有座位都已知的信息）}
+    """
+    lines = [
+        "You are controlling several independent players in a Werewolf game at once.",
+        "Each player only knows the public info plus the notes listed under their own name.",
+        "",
+        "Public info:",
+        shared_context.strip(),
+        "",
+        f"Task for EVERY player: {task}",
+        "",
+    ]
+    for name, block in seat_blocks.items():
+        lines.append(f"### {name}")
+        lines.append(block.strip())
+        lines.append(f"Reply format: {decision.schema_hint(seat_schemas[name])}")
+        lines.append("")
+
+    example = ", ".join(f'"{name}": {{...}}' for name in seat_blocks)
+    lines.append(f"Return ONLY one JSON object keyed by player name: {{{example}}}")
+    return "\n".join(lines)
+
+
+def split_batch_reply(raw, seat_schemas):
+    """把批量回复拆成 {座位名: 校验后的动作}；缺失或不合格的座位不出现在结果里"""
+    if isinstance(raw, str) and raw.strip().startswith("发生错误:"):
+        return {}
+    data = decision.extract_json(raw)
+    if not isinstance(data, dict):
+        return {}
+
+    lookup = {str(k).strip().lower(): v for k, v in data.items()}
+    results = {}
+    for name, schema in seat_schemas.items():
+        clean, error = decision.validate(lookup.get(name.lower()), schema)
+        if error is None:
+            results[name] = clean
+    return results
+
+
+def seat_prompt(task, block, schema):
+    """写回单个座位历史时使用的等价提示（与单独请求时的形式一致）"""
+    return f"{task}\n{block.strip()}\nReturn ONLY JSON: {decision.schema_hint(schema)}"
+
+
+def seat_reply(data):
+    return json.dumps(data, ensure_ascii=False)
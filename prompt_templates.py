@@ -0,0 +1,81 @@
+"""
+提示词模板：
+- PromptTemplate：模板只编译一次，静态部分去掉缩进、行尾空白和多余空行
+- TemplateRegistry：按名字注册 / 渲染模板，并给出静态部分的 token 数
+- BlockCache：每局游戏内缓存已渲染的块（按角色的规则块、按人设的性格块等）
+"""
+import re
+import string
+import textwrap
+
+from agent import estimate_tokens
+
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def normalize_whitespace(text):
+    """去掉公共缩进和行尾空白，连续空行压成一行"""
+    text = textwrap.dedent(text)
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", text).strip("\n")
+
+
+class PromptTemplate:
+    __slots__ = ("name", "text", "fields", "static_tokens")
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = normalize_whitespace(text)
+        parsed = list(string.Formatter().parse(self.text))
+        self.fields = tuple(f for _, f, _, _ in parsed if f)
+        self.static_tokens = estimate_tokens("".join(lit for lit, _, _, _ in parsed))
+
+    def render(self, **values):
+        return self.text.format(**values)
+
+
+class TemplateRegistry:
+    def __init__(self):
+        self.templates = {}
+
+    def register(self, name, text):
+        template = PromptTemplate(name, text)
+        self.templates[name] = template
+        return template
+
+    def get(self, name):
+        return self.templates[name]
+
+    def render(self, name, **values):
+        return self.templates[name].render(**values)
+
+    def token_counts(self):
+        """每个模板静态部分的 token 数"""
+        return {name: t.static_tokens for name, t in self.templates.items()}
+
+
+class BlockCache:
+    """每局游戏的渲染块缓存：key -> 文本，开新局时 clear()"""
+
+    def __init__(self):
+        self._blocks = {}
+        self._tokens = {}
+
+    def get(self, key, builder):
+        text = self._blocks.get(key)
+        if text is None:
+            text = builder()
+            self._blocks[key] = text
+            self._tokens[key] = estimate_tokens(text)
+        return text
+
+    def clear(self):
+        self._blocks.clear()
+        self._tokens.clear()
+
+    def token_counts(self):
+        return dict(self._tokens)
+
+
+# 全局模板表，各模块在导入时注册自己的模板
+TEMPLATES = TemplateRegistry()
@@ -0,0 +1,225 @@
+"""
+LLM 响应缓存（SQLite 单文件，按最近使用淘汰）：
+键 = hash(model, 采样参数, messages)，值 = 回复文本 + finish_reason + usage。
+
+模式：
+- "off"：不使用缓存
+- "record"：总是请求 API，并把结果写入缓存（覆盖旧值）
+- "replay"：只读缓存，未命中抛 CacheMiss（离线重跑回归对局 / 基准）
+- "readthrough"：先查缓存，未命中再请求 API 并写入
+
+命中时的 token 统计沿用录制时的 usage，重放的对局与录制时的预算判断完全一致。
+
+    cache = ResponseCache("response_cache.sqlite", mode="readthrough", max_mb=512)
+    llm_manager = LLMManager(response_cache=cache)
+
+也可以用环境变量配置（见 from_env）：LLM_CACHE_MODE / LLM_CACHE_PATH / LLM_CACHE_MAX_MB。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+MODES = ("off", "record", "replay", "readthrough")
+
+
+class CacheMiss(Exception):
+    """replay 模式下缓存未命中"""
+
+
+def cache_key(model, params, messages):
+    """请求的规范化哈希：参数按键排序，messages 只取 role / content"""
+    payload = json.dumps(
+        {
+            "model": model,
+            "params": params,
+            "messages": [[m["role"], m["content"]] for m in messages],
+        },
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path="response_cache.sqlite", mode="readthrough", max_mb=512, touch_batch=64):
+        if mode not in MODES:
+            raise ValueError(f"未知的缓存模式 {mode!r}，可选：{MODES}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.touch_batch = touch_batch  # 命中时的最近使用时间攒够这么多条再写盘
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        self._lock = threading.Lock()
+        self._pending_touch = {}        # key -> tick
+        self._conn = None
+        if mode != "off":
+            self._open()
+
+    @classmethod
+    def from_env(cls):
+        """从环境变量创建；LLM_CACHE_MODE 未设置时返回 None（不使用缓存）"""
+        mode = os.getenv("LLM_CACHE_MODE", "off")
+        if mode == "off":
+            return None
+        return cls(
+            path=os.getenv("LLM_CACHE_PATH", "response_cache.sqlite"),
+            mode=mode,
+            max_mb=float(os.getenv("LLM_CACHE_MAX_MB", "512")),
+        )
+
+    # ---------------- 存储 ----------------
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        # 容量合计存在库里：多个进程（farm.py 的工作进程）共用同一个文件时，max_mb 是整个文件的上限
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value)"
+            " SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM responses"
+        )
+        self._conn.commit()
+        self._tick = 0                  # 单调递增的使用序号，比时间戳稳定
+        self._sync()
+
+    def _sync(self):
+        """从库里读回容量合计和最大使用序号（其他进程可能写过同一个文件）"""
+        self.total_bytes = self._conn.execute("SELECT value FROM meta WHERE key = 'total_bytes'").fetchone()[0]
+        tick = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM responses").fetchone()[0]
+        self._tick = max(self._tick, tick)
+
+    def _next_tick(self):
+        self._tick += 1
+        return self._tick
+
+    def _flush_touches(self):
+        """写入攒下的最近使用时间（不提交，由调用方提交）"""
+        if self._pending_touch:
+            self._conn.executemany(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                [(tick, key) for key, tick in self._pending_touch.items()],
+            )
+            self._pending_touch.clear()
+
+    def _evict(self):
+        """超出容量时按最近使用时间从旧到新删除"""
+        while self.total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._pending_touch.pop(key, None)
+                self.total_bytes -= size
+                self.evicted += 1
+
+    def get(self, key):
+        """命中返回 {"content", "finish_reason", "usage"}，否则 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._pending_touch[key] = self._next_tick()
+            if len(self._pending_touch) >= self.touch_batch:
+                self._flush_touches()
+                self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, entry):
+        value = json.dumps(entry, ensure_ascii=False)
+        size = len(key) + len(value.encode("utf-8"))
+        with self._lock:
+            # 写事务内先读回库里的合计，记账和淘汰都以整个文件为准，不会被其他进程的写入绕过
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                if old:
+                    self.total_bytes -= old[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, value, size, self._next_tick()),
+                )
+                self._pending_touch.pop(key, None)
+                self.total_bytes += size
+                self._flush_touches()
+                self._evict()
+                self._conn.execute("UPDATE meta SET value = ? WHERE key = 'total_bytes'", (self.total_bytes,))
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def close(self):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    # ---------------- 请求路径 ----------------
+    def lookup(self, model, params, messages):
+        """
+        请求前查缓存：返回 (key, entry)。
+        entry 为 None 表示需要请求 API；replay 模式未命中抛 CacheMiss。
+        """
+        if self.mode == "off":
+            return None, None
+        key = cache_key(model, params, messages)
+        if self.mode == "record":
+            return key, None
+        entry = self.get(key)
+        if entry is None and self.mode == "replay":
+            raise CacheMiss(f"缓存未命中（replay 模式）：{model} {key[:12]}")
+        return key, entry
+
+    def store(self, key, content, finish_reason=None, usage=None):
+        """请求成功后写入缓存（record / readthrough 模式）"""
+        if key is None or self.mode not in ("record", "readthrough"):
+            return
+        self.put(key, {
+            "content": content,
+            "finish_reason": finish_reason,
+            "usage": {
+                "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "completion_tokens": getattr(usage, "completion_tokens", None),
+            },
+        })
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self._conn else 0
+        return {
+            "mode": self.mode,
+            "entries": entries,
+            "bytes": getattr(self, "total_bytes", 0),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
+
+
+class CachedUsage:
+    """缓存中的 usage，属性与 openai 返回的 usage 对象一致"""
+
+    def __init__(self, data):
+        data = data or {}
+        self.prompt_tokens = data.get("prompt_tokens")
+        self.completion_tokens = data.get("completion_tokens")
@@ -0,0 +1,156 @@
+"""
+按计数向量分配角色（复杂度只和角色种类数有关，和玩家数无关）：
+1. 角色总数 == 玩家数：原样使用
+2. 角色比玩家多：多元超几何抽样截断（等价于洗牌后取前 N 个）
+3. 角色比玩家少：最大余数法按比例放大，余数相同的随机决定
+4. 人数 <= 6 至少 1 狼，<= 8 至少 2 狼：不足时从非狼角色中无放回随机替换
+5. single_roles（如 witch / jester）最多 1 个，多出来的变成村民
+
+allocate_batch 一次算 n 局（NumPy），allocate_counts 是 n = 1 的特例，
+simulate 用同一套逻辑抽大量局面并统计分布，用来快速检查不同桌子大小下的平衡性。
+
+    python role_allocation.py --players 6-12 --draws 1000000
+"""
+import argparse
+import random
+
+import numpy as np
+
+WOLF = "werewolf"
+VILLAGER = "villager"
+
+
+def min_wolves(player_cnt):
+    return 1 if player_cnt <= 6 else 2 if player_cnt <= 8 else 0
+
+
+def _columns(role_counts):
+    """角色列：原配置中的角色 + 必要时补上 werewolf / villager 列"""
+    roles = list(role_counts)
+    for extra in (WOLF, VILLAGER):
+        if extra not in roles:
+            roles.append(extra)
+    return roles
+
+
+def allocate_batch(role_counts, player_cnt, n, gen, single_roles=("witch", "jester")):
+    """返回 (roles, counts)，counts 形状为 (n, len(roles))，每行一局"""
+    roles = _columns(role_counts)
+    base = np.array([role_counts.get(r, 0) for r in roles], dtype=np.int64)
+    total = int(base.sum())
+    wolf = roles.index(WOLF)
+    villager = roles.index(VILLAGER)
+
+    if total == 0:
+        counts = np.zeros((n, len(roles)), dtype=np.int64)
+        counts[:, villager] = player_cnt
+
+    elif total == player_cnt:
+        counts = np.tile(base, (n, 1))
+
+    elif total > player_cnt:
+        counts = gen.multivariate_hypergeometric(base, player_cnt, size=n).astype(np.int64)
+
+    else:
+        # 最大余数法：先取整，余下的名额给小数部分最大的角色；同余数时加随机扰动打破平局
+        quota = base * player_cnt / total
+        floor = np.floor(quota).astype(np.int64)
+        left = player_cnt - int(floor.sum())
+        frac = quota - floor
+        frac = np.where(base > 0, frac, -1.0)     # 配置里没有的角色不参与分配
+        keys = frac[None, :] + gen.random((n, len(roles))) * 1e-9
+        top = np.argsort(-keys, axis=1)[:, :left]
+        counts = np.tile(floor, (n, 1))
+        np.add.at(counts, (np.arange(n)[:, None], top), 1)
+
+    # ---- 最少狼人数：从非狼角色里无放回随机替换 ----
+    need = np.maximum(min_wolves(player_cnt) - counts[:, wolf], 0)
+    for step in range(int(need.max()) if len(need) else 0):
+        rows = np.flatnonzero(need > step)
+        pool = counts[rows].copy()
+        pool[:, wolf] = 0
+        sizes = pool.sum(axis=1)
+        ok = sizes > 0
+        rows, pool, sizes = rows[ok], pool[ok], sizes[ok]
+        if not len(rows):
+            break
+        # 按剩余数量做一次类别抽样（等价于随机挑一个非狼座位）
+        pick = gen.random(len(rows)) * sizes
+        chosen = (np.cumsum(pool, axis=1) > pick[:, None]).argmax(axis=1)
+        counts[rows, chosen] -= 1
+        counts[rows, wolf] += 1
+
+    # ---- 单一角色上限 ----
+    for r in single_roles:
+        if r in roles:
+            i = roles.index(r)
+            excess = np.maximum(counts[:, i] - 1, 0)
+            counts[:, i] -= excess
+            counts[:, villager] += excess
+
+    return roles, counts
+
+
+def allocate_counts(role_counts, player_cnt, rng=random, single_roles=("witch", "jester")):
+    """单局分配，返回 {角色: 数量}（只含数量 > 0 的角色，顺序同配置）"""
+    gen = np.random.default_rng(rng.getrandbits(64))
+    roles, counts = allocate_batch(role_counts, player_cnt, 1, gen, single_roles)
+    return {r: int(c) for r, c in zip(roles, counts[0]) if c > 0}
+
+
+def simulate(role_counts, player_cnt, draws=1_000_000, seed=None, single_roles=("witch", "jester")):
+    """
+    抽 draws 局统计角色分布：
+    {"roles": [...], "mean": {...}, "std": {...}, "p_count": {角色: {数量: 概率}},
+     "wolf_share": 狼人占比均值, "distinct_setups": 不同局面数}
+    """
+    gen = np.random.default_rng(seed)
+    roles, counts = allocate_batch(role_counts, player_cnt, draws, gen, single_roles)
+
+    p_count = {}
+    for i, r in enumerate(roles):
+        freq = np.bincount(counts[:, i], minlength=1)
+        p_count[r] = {int(v): float(f) / draws for v, f in enumerate(freq) if f}
+
+    # 每局编码成一个整数（以 player_cnt + 1 为基数），比按行 unique 快得多
+    radix = player_cnt + 1
+    if radix ** len(roles) < 2 ** 62:
+        keys = counts @ (radix ** np.arange(len(roles), dtype=np.int64))
+        distinct = len(np.unique(keys))
+    else:
+        distinct = len(np.unique(counts, axis=0))
+
+    return {
+        "players": player_cnt,
+        "draws": draws,
+        "roles": roles,
+        "mean": {r: float(m) for r, m in zip(roles, counts.mean(axis=0))},
+        "std": {r: float(s) for r, s in zip(roles, counts.std(axis=0))},
+        "p_count": p_count,
+        "wolf_share": float(counts[:, roles.index(WOLF)].mean() / player_cnt),
+        "distinct_setups": int(distinct),
+    }
+
+
+def format_report(result):
+    lines = [
+        f"===== {result['players']} players, {result['draws']} draws, "
+        f"wolf share {result['wolf_share']:.3f}, {result['distinct_setups']} distinct setups ====="
+    ]
+    for r in result["roles"]:
+        dist = ", ".join(f"{k}:{v:.3f}" for k, v in result["p_count"][r].items())
+        lines.append(f"{r:<10} mean={result['mean'][r]:.3f} std={result['std'][r]:.3f}  {dist}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模拟不同人数下的角色分布")
+    parser.add_argument("--players", default="6-12", help="人数或区间，如 8 或 6-60")
+    parser.add_argument("--draws", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    lo, _, hi = args.players.partition("-")
+    default_counts = {"villager": 2, "werewolf": 2, "seer": 1, "witch": 1, "hunter": 1, "jester": 1}
+    for players in range(int(lo), int(hi or lo) + 1):
+        print(format_report(simulate(default_counts, players, args.draws, args.seed)))
@@ -1,10 +1,177 @@
 from dataclasses import dataclass, field
 import random
-from collections import Counter
 
 from llm_manager import LLMManager
+from prompt_templates import BlockCache, normalize_whitespace
+from name_pool import NamePool
+from io_channel import ConsoleChannel
+import role_allocation
+
+# ----------------------------
+# werewolf game roles:
+# ----------------------------
+ROLE_PROMPTS = {
+    "villager": (
+        "You are **a Villager**.\n"
+        "Your only ability is your judgment. You have **no special powers**.\n"
+        "Your goal is to **identify and eliminate all Werewolves**.\n"
+        "You must analyze speech, behavior, and voting patterns carefully.\n"
+        "Act honestly, think critically, and defend the village."
+    ),
+
+    "werewolf": (
+        "You are **a Werewolf**.\n"
+        "Your goal is to **eliminate all Villagers and special roles** without being discovered.\n"
+        "During the night, you cooperate with your fellow Werewolves to select a target to kill.\n"
+        "During the day, pretend to be innocent, mislead the village, and avoid suspicion."
+    ),
+
+    "seer": (
+        "You are **the Seer**.\n"
+        "Each night, you may **inspect one player** to learn whether they are a Werewolf or not.\n"
+        "Your goal is to help the village correctly identify threats **without exposing yourself too early**.\n"
+        "Use your information wisely and guide the village through subtle hints."
+    ),
+
+    "witch": (
+        "You are **the Witch**.\n"
+        "You possess **two powerful potions**: a healing potion (can save one player) and a poison potion (can kill one player).\n"
+        "You may use each potion **only once per game**.\n"
+        "Your goal is to help the village survive while staying unnoticed.\n"
+        "Decide carefully whom to save or eliminate based on behavior and deduction."
+    ),
+
+    "hunter": (
+        "You are **the Hunter**.\n"
+        "If you die, you may **choose one player to kill** before leaving the game.\n"
+        "Your goal is to assist the village and ensure that your final shot hits a Werewolf if possible.\n"
+        "Play cautiously and observe the game closely."
+    ),
+
+    "guard": (
+        "You are **the Guard**.\n"
+        "Each night, you may **protect one player**, preventing them from being killed.\n"
+        "You cannot protect the same player for two consecutive nights.\n"
+        "Your goal is to safeguard key village roles and keep them alive as long as possible."
+    ),
+    "jester": (
+        "You are **the Jester**.\n"
+        "Your goal is *not* to help the village nor the werewolves.\n"
+        "Your ONLY win condition is to get yourself **voted out during the day**.\n"
+        "If the village votes to banish you, YOU become the **sole winner**.\n"
+        "If you die by any other means (werewolves, witch poison, hunter shot), you lose.\n"
+        "If all the werewolves died and you are still alive, you lose"
+        "Act chaotic, confusing, suspicious, or overly dramatic or fake others to believe you are wolf to draw votes, \n"
+    ),
+}
 
-@dataclass
+PERSONALITY_BY_CATEGORY = {
+    "scientist": """
+    You speak rationally, rigorously, and logically.
+    You rely on deduction, evidence and analysis.
+    You rarely talk emotionally. You prefer structured reasoning.
+    """,
+    "anime": """
+    You speak with passion, intensity, and dramatic emotion.
+    You often shout your beliefs and talk about honor and courage.
+    """,
+    "scifi": """
+    You speak calmly, analytically, with futuristic metaphors.
+    You reference technology, logic, and cosmic perspective.
+    """,
+    "celebrity": """
+    You speak with confidence, flair, and unmistakable self-presence.
+    You enjoy grand statements, memorable lines, and attention-grabbing delivery.
+    You reference fame, public image, and the spotlight with ease.
+    """
+}
+
+# 名人个性 override（最高优先级）
+PERSONALITY_OVERRIDES = {
+    # Scientist
+    "newton": """
+You are methodical, exact, and intensely analytical.
+You rely on strict logical structure and rarely express emotion.
+You view the world through mathematics, force, and causality.
+""",
+
+    "einstein": """
+You are imaginative, warm, witty, and fond of creative analogies.
+You approach problems with curiosity, humor, and playful insight.
+You enjoy bending intuition and questioning assumptions.
+""",
+
+    "feynman": """
+You are energetic, conversational, and delight in explaining things simply.
+You use vivid metaphors, casual humor, and practical reasoning.
+You emphasize intuition and the joy of discovery.
+""",
+
+    "galileo galilei": """
+You are bold, skeptical, and unafraid to challenge established ideas.
+You speak with clarity, observation-driven logic, and rebellious confidence.
+You emphasize empirical truth over authority.
+""",
+
+    "oppenheimer": """
+You are articulate, introspective, and philosophical in tone.
+You speak with measured precision and a sense of responsibility.
+You blend scientific insight with ethical reflection and subtle metaphors.
+""",
+
+    # Anime
+    "eric cartman": """
+You speak loudly, impulsively, and with exaggerated personality.
+You lean into chaotic confidence, dramatic exaggeration, and blunt humor.
+You do not hide your emotions and often escalate situations.
+""",
+
+    "butters stotch": """
+You speak gently, nervously, and with innocent enthusiasm.
+You show kindness, confusion, and hopeful energy in your tone.
+You often sound overwhelmed but eager to help.
+""",
+
+    # Sci-fi
+    "doctor strange": """
+You speak with calm confidence, mystical clarity, and cosmic perspective.
+You reference parallel realities, metaphysical forces, and intricate causality.
+Your tone blends wisdom, detachment, and subtle theatrical flair.
+""",
+
+    # Celebrity
+    "donald trump": """
+You speak with strong confidence, simple bold phrasing, and assertive rhythm.
+You emphasize winning, success, personal achievement, and public impact.
+You use short memorable statements and repeat key ideas for effect.
+""",
+
+    "elon musk": """
+You speak with a mix of technical directness and futuristic ambition.
+You reference engineering, innovation, large-scale projects, and long-term vision.
+Your tone blends dryness, intensity, and a focus on solving big problems.
+""",
+
+    "kobe bryant": """
+You speak with relentless competitiveness and unwavering self-belief.
+You reference discipline, late-night training, obsession with mastery, and the Mamba mentality.
+Your tone is sharp, intense, and focused, carrying the energy of someone who pushes past every limit.
+
+You often sprinkle in your iconic casual lines such as “man!” or “what can I say?” 
+These phrases appear naturally, usually after emphasizing effort, responsibility, or excellence.
+
+You balance seriousness with a confident, almost amused self-awareness,
+as if you already know the outcome because you outworked everyone else.
+"""
+
+}
+
+# 性格文本只在导入时规整一次空白
+PERSONALITY_BY_CATEGORY = {k: normalize_whitespace(v) for k, v in PERSONALITY_BY_CATEGORY.items()}
+PERSONALITY_OVERRIDES = {k: normalize_whitespace(v) for k, v in PERSONALITY_OVERRIDES.items()}
+
+
+@dataclass(slots=True)
 class PlayerSlot:
     name: str
     is_human: bool
@@ -35,6 +202,15 @@ class RoleManager:
     characterize_mode: str = 'special'
     characterize_category: dict = field(default_factory=dict)
     single_roles : list = field(default_factory=lambda:["witch", "jester"])
+    # 每局渲染好的规则块 / 人设块，assign_roles 时清空
+    prompt_cache: BlockCache = field(default_factory=BlockCache)
+    # 输出 / 人类输入通道（见 io_channel.py），GameManager 会换成本局的通道
+    channel: any = field(default_factory=ConsoleChannel)
+    # 本局的随机数发生器（洗牌 / 角色分配 / 抽选模型），GameManager 按本局种子替换
+    rng: random.Random = None
+    # 未给出 rng 时用它创建（None = 不固定）：add_llm_agents 抽选模型发生在 GameManager 播种之前，
+    # 用本局种子构造 RoleManager 才能让入座也可复现
+    seed: int = None
 
 
     def __post_init__(self):
@@ -45,6 +221,8 @@ class RoleManager:
         """
         if self.slots is None:
             self.slots = []
+        if self.rng is None:
+            self.rng = random.Random(None if self.seed is None else f"{self.seed}:seats")
         # player_number 不再瞎设，按 slots 长度算
         self.player_number = len(self.slots)
 
@@ -66,13 +244,13 @@ class RoleManager:
             used |= set(slot.player_name for slot in self.slots if slot.player_name)
 
             if name in used:
-                print(f"[Name Error] 名称 '{name}' 已被占用，请重新输入。")
+                self.channel.emit(f"[Name Error] 名称 '{name}' 已被占用，请重新输入。")
                 while True:
-                    new_name = input("请输入一个未被占用的玩家名称： ").strip()
+                    new_name = self.channel.ask("请输入一个未被占用的玩家名称： ", name).strip()
                     if new_name not in used:
                         name = new_name
                         break
-                    print("依然重复，请重新输入。")
+                    self.channel.emit("依然重复，请重新输入。")
 
             # 自定义名称直接写入 player_name
             player_name = name
@@ -121,7 +299,7 @@ class RoleManager:
 
         # ===== 情况 1：玩家数量 ≤ 已有模型数量 =====
         if player_number <= llm_count:
-            chosen = random.sample(llm_names, player_number)
+            chosen = self.rng.sample(llm_names, player_number)
             for name in chosen:
                 agent = self.llm_manager.llm_dict[name]   # 不新建，直接复用
                 self.slots.append(PlayerSlot(
@@ -172,110 +350,21 @@ class RoleManager:
     # ------------------------------
     def generate_role_list(self, player_cnt: int):
         """
-        扩展规则（优化版）：
-        1. 按 role_counts 的比例进行缩放（非随机抽签）
-        2. 四舍五入后可能出现总数不等于玩家数 → 自动修正
-        3. 若 role_counts 本身比玩家多 → 截断
+        按计数向量分配角色（见 role_allocation.py）：
+        1. 角色比玩家多 → 多元超几何抽样截断
+        2. 角色比玩家少 → 最大余数法按比例放大
+        3. 最少狼人数、single_roles 最多 1 个
         4. 最终返回洗牌后的角色列表 + 更新 final_role_counts
         """
+        counts = role_allocation.allocate_counts(
+            self.role_counts, player_cnt, self.rng, single_roles=self.single_roles
+        )
+        self.final_role_counts = counts
 
-        # ===== 1. 基础池 =====
-        pool = []
-        for r, c in self.role_counts.items():
-            pool.extend([r] * c)
-
-        total_roles = len(pool)
-
-        # ===== 2. 刚好匹配：直接洗牌返回 =====
-        if total_roles == player_cnt:
-            random.shuffle(pool)
-            self.final_role_counts = dict(Counter(pool))
-            return pool
-
-        # ===== 3. 角色比玩家多：裁剪 =====
-        if total_roles > player_cnt:
-            random.shuffle(pool)
-            trimmed = pool[:player_cnt]
-            self.final_role_counts = dict(Counter(trimmed))
-            return trimmed
-
-        # ===== 4. 角色不足：按比例扩展 =====
-        deficit = player_cnt - total_roles
-        base_total = sum(self.role_counts.values())  # = total_roles
-
-        # 比例扩展的初步整数估计
-        scaled = {
-            r: int(c / base_total * player_cnt)
-            for r, c in self.role_counts.items()
-        }
-
-        # 修正：由于 int 截断，可能总数和 player_cnt 不一致
-        scaled_total = sum(scaled.values())
-        diff = player_cnt - scaled_total
-
-        # diff > 0 时随机补齐 diff 个角色（按比例随机）
-        if diff > 0:
-            roles = list(self.role_counts.keys())
-            weights = list(self.role_counts.values())  # 使用原始权重作为随机依据
-            for _ in range(diff):
-                chosen = random.choices(roles, weights=weights)[0]
-                scaled[chosen] += 1
-
-        # ===== 5. 生成最终池 =====
-        final_pool = []
-        for r, c in scaled.items():
-            final_pool.extend([r] * c)
-
-        # ===== 6. Werewolf minimal rule =====
-        # 如果玩家数 < 8，强制至少 1~2 狼
-        player_cnt_now = len(final_pool)
-        min_wolf = 1 if player_cnt_now <= 6 else 2 if player_cnt_now <= 8 else 0
-
-        if min_wolf > 0:
-            current_wolf = final_pool.count("werewolf")
-
-            if current_wolf < min_wolf:
-                # 需要补狼
-                need = min_wolf - current_wolf
-
-                # 从非狼人角色里换掉一些角色补成 werewolf
-                nonwolves = [i for i, r in enumerate(final_pool) if r != "werewolf"]
-
-                if len(nonwolves) >= need:
-                    indices = random.sample(nonwolves, need)
-                else:
-                    indices = nonwolves  # 不太可能出现，但做个保险
-
-                for idx in indices:
-                    final_pool[idx] = "werewolf"
-
-        # ===== 7. 最终洗牌 + 保存 =====
-        random.shuffle(final_pool)
-        final_pool = self._limit_single_role(final_pool)
-        self.final_role_counts = dict(Counter(final_pool))
+        final_pool = [r for r, c in counts.items() for _ in range(c)]
+        self.rng.shuffle(final_pool)
         return final_pool
 
-    def _limit_single_role(self, role_list):
-        """
-        限制某些角色的数量最多为 1（例如 witch、jester）。
-        多出来的全部替换成村民。
-        """
-
-        for sr in self.single_roles:
-            count = role_list.count(sr)
-            if count > 1:
-                idxs = [i for i, r in enumerate(role_list) if r == sr]
-
-                # 随机保留一个
-                keep = random.choice(idxs)
-
-                # 其余改成 villager
-                for i in idxs:
-                    if i != keep:
-                        role_list[i] = "villager"
-
-        return role_list
-
 
     # ------------------------------
     # 分配角色
@@ -291,14 +380,24 @@ class RoleManager:
         - 结构清晰：先分配角色 → 再分配名字 → 再注入系统 prompt
         """
 
+        # 新的一局：规则块与人设块重新渲染
+        self.prompt_cache.clear()
+
+        # 新的一局：名字池复位，并先预占玩家自定义的名字
+        if hasattr(self.name_strategy, "reset"):
+            self.name_strategy.reset()
+            for slot in self.slots:
+                if slot.is_human and slot.player_name:
+                    self.name_strategy.reserve(slot.player_name)
+
         # 1. 随机打乱玩家顺序（保持你的原始结构）
-        random.shuffle(self.slots)
+        self.rng.shuffle(self.slots)
 
         # 2. 生成角色列表
         roles = self.generate_role_list(len(self.slots))
 
         if self.reveal_role_number:
-            print("本局角色数量：", self.final_role_counts)
+            self.channel.emit("本局角色数量：", self.final_role_counts)
 
         # ========================
         # 第 1 轮：分配角色
@@ -327,9 +426,9 @@ class RoleManager:
                         slot.player_name = slot.name
 
                 # 这里统一告诉玩家自己叫什么
-                print(f"你的名字是：{slot.player_name}")
+                self.channel.emit(f"你的名字是：{slot.player_name}")
                 # 打印角色说明
-                print(self.generate_role_prompt(slot.role))
+                self.channel.emit(self.generate_role_prompt(slot.role))
                 continue
 
             else:
@@ -351,28 +450,43 @@ class RoleManager:
         for slot in self.slots:
             if slot.is_human:
                 # 玩家打印角色说明（原始逻辑）
-                print(self.generate_role_prompt(slot.role))
+                self.channel.emit(self.generate_role_prompt(slot.role))
                 continue
 
-            # LLM prompt 生成一次即可（修复你的重复赋值问题）
-            full_prompt = self.generate_full_prompt(slot.role)
-            full_prompt += f"\nYour player name is: {slot.player_name}.\n"
-
-            # 如果是特殊角色则加入人格（保持你的逻辑）
-            if slot.special_character and hasattr(self.name_strategy, "generate_personality"):
-                personality_text = self.name_strategy.generate_personality(
-                    slot.player_name,
-                    getattr(slot, "special_category", None)
-                )
-                full_prompt += f"{personality_text}\n"
+            # 系统提示按段注入：规则 / 角色说明是本局共享的同一个字符串，只有名字和人设是座位私有的
+            rules, _ = self.generate_prompt_segments(slot.role)
 
             # 最终注入
-            slot.llm_obj.set_system_prompt(full_prompt)
+            slot.llm_obj.set_system_prompt((rules,) + self.seat_prompt_segments(slot))
 
     # ------------------------------
     # 生成完整提示（游戏规则 + 角色规则）
     # ------------------------------
     def generate_full_prompt(self, role):
+        return "".join(self.generate_prompt_segments(role))
+
+    def generate_prompt_segments(self, role):
+        """(规则块, 角色块)：每局各只渲染一次，所有座位共享同一个字符串对象"""
+        rules = self.prompt_cache.get(("rules",), self._render_rules)
+        role_block = self.prompt_cache.get(("role", role), lambda: self.generate_role_prompt(role))
+        return (rules, role_block)
+
+    def seat_prompt_segments(self, slot):
+        """座位自己的系统提示段：角色说明 + 名字 + 人设（不含所有座位共用的规则块）"""
+        _, role_block = self.generate_prompt_segments(slot.role)
+        segments = (role_block, f"\nYour player name is: {slot.player_name}.\n")
+
+        # 如果是特殊角色则加入人格（保持你的逻辑）
+        if slot.special_character and hasattr(self.name_strategy, "generate_personality"):
+            category = getattr(slot, "special_category", None)
+            personality_text = self.prompt_cache.get(
+                ("persona", slot.player_name, category),
+                lambda: self.name_strategy.generate_personality(slot.player_name, category),
+            )
+            segments += (personality_text, "\n")
+        return segments
+
+    def _render_rules(self):
         prompt = self.game_rules + "\n\n"
         
 
@@ -382,79 +496,14 @@ class RoleManager:
                 prompt += f"- {r}: {cnt} \n"
             prompt += "\n"
 
-        prompt += self.generate_role_prompt(role)
         return prompt
 
         # ------------------------------
         # 类似 switch(role) 的角色规则逻辑
         # ------------------------------
     def generate_role_prompt(self, role):
-
-        #----------------------------
-        # werewolf game roles:
-        # ---------------------------
-        role_prompts = {
-            "villager": (
-                "You are **a Villager**.\n"
-                "Your only ability is your judgment. You have **no special powers**.\n"
-                "Your goal is to **identify and eliminate all Werewolves**.\n"
-                "You must analyze speech, behavior, and voting patterns carefully.\n"
-                "Act honestly, think critically, and defend the village."
-            ),
-
-            "werewolf": (
-                "You are **a Werewolf**.\n"
-                "Your goal is to **eliminate all Villagers and special roles** without being discovered.\n"
-                "During the night, you cooperate with your fellow Werewolves to select a target to kill.\n"
-                "During the day, pretend to be innocent, mislead the village, and avoid suspicion."
-            ),
-
-            "seer": (
-                "You are **the Seer**.\n"
-                "Each night, you may **inspect one player** to learn whether they are a Werewolf or not.\n"
-                "Your goal is to help the village correctly identify threats **without exposing yourself too early**.\n"
-                "Use your information wisely and guide the village through subtle hints."
-            ),
-
-            "witch": (
-                "You are **the Witch**.\n"
-                "You possess **two powerful potions**: a healing potion (can save one player) and a poison potion (can kill one player).\n"
-                "You may use each potion **only once per game**.\n"
-                "Your goal is to help the village survive while staying unnoticed.\n"
-                "Decide carefully whom to save or eliminate based on behavior and deduction."
-            ),
-
-            "hunter": (
-                "You are **the Hunter**.\n"
-                "If you die, you may **choose one player to kill** before leaving the game.\n"
-                "Your goal is to assist the village and ensure that your final shot hits a Werewolf if possible.\n"
-                "Play cautiously and observe the game closely."
-            ),
-
-            "guard": (
-                "You are **the Guard**.\n"
-                "Each night, you may **protect one player**, preventing them from being killed.\n"
-                "You cannot protect the same player for two consecutive nights.\n"
-                "Your goal is to safeguard key village roles and keep them alive as long as possible."
-            ),
-            "jester": (
-                "You are **the Jester**.\n"
-                "Your goal is *not* to help the village nor the werewolves.\n"
-                "Your ONLY win condition is to get yourself **voted out during the day**.\n"
-                "If the village votes to banish you, YOU become the **sole winner**.\n"
-                "If you die by any other means (werewolves, witch poison, hunter shot), you lose.\n"
-                "If all the werewolves died and you are still alive, you lose"
-                "Act chaotic, confusing, suspicious, or overly dramatic or fake others to believe you are wolf to draw votes, \n"
-            ),
-
-        }
-
-        #----------------------------
-        # TuringTest game roles:
-        # ---------------------------
-
-        # fallback
-        return role_prompts.get(
+        # 角色说明是模块级常量，这里只做查表 + fallback
+        return ROLE_PROMPTS.get(
             role,
             f"You are **{role}**.\n"
             "Act strictly according to the standard behavior and objectives of this role."
@@ -463,13 +512,11 @@ class RoleManager:
     
 
 class NameStrategyCategorized(NameStrategy):
-    def __init__(self):
-
-        # 已使用
-        self.used = set()
+    def __init__(self, seed=None):
 
-        # 默认普通名字
+        # 默认普通名字：前缀_编号（1..normal_max）
         self.bases = ["Pine", "Stone", "Echo", "Mint", "Cloud", "River"]
+        self.normal_max = 9999
 
         # 分类配置（可自行添加新类别）
         self.categories = {
@@ -491,8 +538,54 @@ class NameStrategyCategorized(NameStrategy):
             }
         }
 
-        # 已用名字
-        self.used_special = set()
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """新的一局：所有名字回到池中（seed 不为 None 时重新播种，结果可复现）"""
+        if seed is not None or not hasattr(self, "rng"):
+            self.rng = random.Random(seed)
+        self.pools = {cat: NamePool(len(cfg["names"]), self.rng) for cat, cfg in self.categories.items()}
+        self.normal_pool = NamePool(len(self.bases) * self.normal_max, self.rng)
+        self.owned = {}     # 已分配的名字 -> (池 key, 池中的值)
+
+    def checkpoint(self):
+        return (
+            {cat: pool.checkpoint() for cat, pool in self.pools.items()},
+            self.normal_pool.checkpoint(),
+            dict(self.owned),
+            self.rng.getstate(),
+        )
+
+    def restore(self, state):
+        pools, normal, owned, rng_state = state
+        for cat, pool_state in pools.items():
+            self.pools[cat].restore(pool_state)
+        self.normal_pool.restore(normal)
+        self.owned = dict(owned)
+        self.rng.setstate(rng_state)
+
+    def release(self, name):
+        """归还一个名字，之后可以再次分配"""
+        key = self.owned.pop(name, None)
+        if key is None:
+            return
+        pool_key, value = key
+        pool = self.normal_pool if pool_key is None else self.pools[pool_key]
+        pool.release(value)
+
+    def reserve(self, name):
+        """预占一个已被使用的名字（如玩家自定义名），避免系统再分配出同名"""
+        for cat, cfg in self.categories.items():
+            if name in cfg["names"]:
+                value = cfg["names"].index(name)
+                if self.pools[cat].reserve(value):
+                    self.owned[name] = (cat, value)
+                return
+        base, _, number = name.rpartition("_")
+        if base in self.bases and number.isdigit() and 1 <= int(number) <= self.normal_max:
+            value = self.bases.index(base) * self.normal_max + int(number) - 1
+            if self.normal_pool.reserve(value):
+                self.owned[name] = (None, value)
 
 
     def generate(self, slot, index, mode="special", allowed_categories=None):
@@ -501,6 +594,7 @@ class NameStrategyCategorized(NameStrategy):
         # - 如果已经有 player_name（自定义），就直接用
         # - 如果没有，就走系统命名逻辑（和 LLM 一样）
         if slot.is_human and slot.player_name:
+            self.reserve(slot.player_name)
             return slot.player_name
 
         # normal → 永远生成普通 Pine_xxx
@@ -508,7 +602,7 @@ class NameStrategyCategorized(NameStrategy):
             return self._generate_normal(slot)
 
         if mode == "random":
-            if random.random() < 0.5:
+            if self.rng.random() < 0.5:
                 name = self._generate_from_category(slot, allowed_categories)
                 if name:
                     return name
@@ -533,8 +627,7 @@ class NameStrategyCategorized(NameStrategy):
             if allowed_categories and cat not in allowed_categories:
                 continue
 
-            remaining = [n for n in cfg["names"] if n not in self.used_special]
-            if not remaining:
+            if not self.pools[cat].remaining:
                 continue
 
             categories.append(cat)
@@ -543,20 +636,10 @@ class NameStrategyCategorized(NameStrategy):
         if not categories:
             return None
 
-        chosen_cat = random.choices(categories, weights=weights)[0]
-
-        candidates = [
-            n for n in self.categories[chosen_cat]["names"]
-            if n not in self.used_special
-        ]
-
-        if not candidates:
-            return None
-
-        chosen_name = random.choice(candidates)
-
-        self.used_special.add(chosen_name)
-        self.used.add(chosen_name)
+        chosen_cat = self.rng.choices(categories, weights=weights)[0]
+        value = self.pools[chosen_cat].draw()
+        chosen_name = self.categories[chosen_cat]["names"][value]
+        self.owned[chosen_name] = (chosen_cat, value)
 
         slot.special_character = True
         slot.special_category = chosen_cat
@@ -566,128 +649,29 @@ class NameStrategyCategorized(NameStrategy):
 
     
     def _generate_normal(self, slot):
-        while True:
-            base = random.choice(self.bases)
-            name = f"{base}_{random.randint(1,9999)}"
-            if name not in self.used:
-                slot.special_character = False
-                slot.special_category = None
-                self.used.add(name)
-                return name
-
-
-
-    def generate_personality(self, player_name, category=None):
-
-        personality_map = {
-            "scientist": """
-    You speak rationally, rigorously, and logically.
-    You rely on deduction, evidence and analysis.
-    You rarely talk emotionally. You prefer structured reasoning.
-    """,
-            "anime": """
-    You speak with passion, intensity, and dramatic emotion.
-    You often shout your beliefs and talk about honor and courage.
-    """,
-            "scifi": """
-    You speak calmly, analytically, with futuristic metaphors.
-    You reference technology, logic, and cosmic perspective.
-    """,
-        "celebrity": """
-    You speak with confidence, flair, and unmistakable self-presence.
-    You enjoy grand statements, memorable lines, and attention-grabbing delivery.
-    You reference fame, public image, and the spotlight with ease.
-    """
-        }
-
-        # 名人个性 override（最高优先级）
-        override = {
-    # Scientist
-    "newton": """
-You are methodical, exact, and intensely analytical.
-You rely on strict logical structure and rarely express emotion.
-You view the world through mathematics, force, and causality.
-""",
-
-    "einstein": """
-You are imaginative, warm, witty, and fond of creative analogies.
-You approach problems with curiosity, humor, and playful insight.
-You enjoy bending intuition and questioning assumptions.
-""",
-
-    "feynman": """
-You are energetic, conversational, and delight in explaining things simply.
-You use vivid metaphors, casual humor, and practical reasoning.
-You emphasize intuition and the joy of discovery.
-""",
-
-    "galileo galilei": """
-You are bold, skeptical, and unafraid to challenge established ideas.
-You speak with clarity, observation-driven logic, and rebellious confidence.
-You emphasize empirical truth over authority.
-""",
-
-    "oppenheimer": """
-You are articulate, introspective, and philosophical in tone.
-You speak with measured precision and a sense of responsibility.
-You blend scientific insight with ethical reflection and subtle metaphors.
-""",
-
-    # Anime
-    "eric cartman": """
-You speak loudly, impulsively, and with exaggerated personality.
-You lean into chaotic confidence, dramatic exaggeration, and blunt humor.
-You do not hide your emotions and often escalate situations.
-""",
-
-    "butters stotch": """
-You speak gently, nervously, and with innocent enthusiasm.
-You show kindness, confusion, and hopeful energy in your tone.
-You often sound overwhelmed but eager to help.
-""",
-
-    # Sci-fi
-    "doctor strange": """
-You speak with calm confidence, mystical clarity, and cosmic perspective.
-You reference parallel realities, metaphysical forces, and intricate causality.
-Your tone blends wisdom, detachment, and subtle theatrical flair.
-""",
+        value = self.normal_pool.draw()
+        if value is None:
+            raise RuntimeError("普通名字已全部用完，请调大 normal_max 或增加 bases。")
 
-    # Celebrity
-    "donald trump": """
-You speak with strong confidence, simple bold phrasing, and assertive rhythm.
-You emphasize winning, success, personal achievement, and public impact.
-You use short memorable statements and repeat key ideas for effect.
-""",
+        base, number = divmod(value, self.normal_max)
+        name = f"{self.bases[base]}_{number + 1}"
+        self.owned[name] = (None, value)
 
-    "elon musk": """
-You speak with a mix of technical directness and futuristic ambition.
-You reference engineering, innovation, large-scale projects, and long-term vision.
-Your tone blends dryness, intensity, and a focus on solving big problems.
-""",
-
-    "kobe bryant": """
-You speak with relentless competitiveness and unwavering self-belief.
-You reference discipline, late-night training, obsession with mastery, and the Mamba mentality.
-Your tone is sharp, intense, and focused, carrying the energy of someone who pushes past every limit.
-
-You often sprinkle in your iconic casual lines such as “man!” or “what can I say?” 
-These phrases appear naturally, usually after emphasizing effort, responsibility, or excellence.
+        slot.special_character = False
+        slot.special_category = None
+        return name
 
-You balance seriousness with a confident, almost amused self-awareness,
-as if you already know the outcome because you outworked everyone else.
-"""
 
-}
 
+    def generate_personality(self, player_name, category=None):
 
         lname = player_name.lower()
-        if lname in override:
-            return override[lname]
+        if lname in PERSONALITY_OVERRIDES:
+            return PERSONALITY_OVERRIDES[lname]
 
         # 根据分类注入人格
-        if category and category in personality_map:
-            return personality_map[category]
+        if category and category in PERSONALITY_BY_CATEGORY:
+            return PERSONALITY_BY_CATEGORY[category]
 
         # 默认人格
         return "You behave like a normal human with moderate emotion."
@@ -0,0 +1,39 @@
+"""协程形式的整局：与同步接口结果一致、同一事件循环里交错跑多局、在运行中的事件循环里调用 game()"""
+import asyncio
+
+from game import GameManager
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+
+def make_game(seed):
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="heuristic", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager, seed=seed)
+    role_manager.add_llm_agents(player_number=8)
+    return GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=seed, quiet=True,
+                       save_history=False)
+
+
+def outcome(result):
+    return result.winner, result.deaths, result.votes, result.events
+
+
+def test_game_async_matches_game():
+    assert outcome(asyncio.run(make_game(11).game_async())) == outcome(make_game(11).game())
+
+
+def test_games_interleave_on_one_loop():
+    async def main():
+        return await asyncio.gather(*(make_game(seed).game_async() for seed in (1, 2, 3)))
+
+    results = asyncio.run(main())
+    assert [outcome(r) for r in results] == [outcome(make_game(seed).game()) for seed in (1, 2, 3)]
+
+
+def test_game_can_be_called_from_a_running_loop():
+    """Jupyter / 异步服务里已有事件循环在运行，同步的 game() 仍然可用"""
+    async def host():
+        return make_game(5).game()
+
+    assert outcome(asyncio.run(host())) == outcome(make_game(5).game())
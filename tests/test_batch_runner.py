@@ -0,0 +1,42 @@
+"""无人值守批量对局：结果文件、汇总、单局失败不影响其他对局"""
+import json
+
+import batch_runner
+from batch_runner import build_llm_manager, run_batch, run_games
+
+CONFIG = {"bots": {"bot": {"policy": "heuristic", "seed": 0}}, "players": 6, "cache": {"mode": "off"}}
+
+
+def test_run_batch_writes_one_line_per_game(tmp_path):
+    output = tmp_path / "results.jsonl"
+    results, summary = run_batch(dict(CONFIG), games=4, seed=10, output=str(output))
+
+    lines = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [line["seed"] for line in lines] == [10, 11, 12, 13]
+    assert [line["winner"] for line in lines] == [r.winner for r in results]
+    assert summary["games"] == 4 and summary["failed"] == 0
+    assert sum(summary["wins"].values()) == 4
+
+
+def test_concurrent_batch_matches_sequential():
+    _, sequential = run_batch(dict(CONFIG), games=4, seed=10)
+    _, concurrent = run_batch(dict(CONFIG, concurrency=4), games=4, seed=10)
+    assert concurrent["wins"] == sequential["wins"]
+    assert concurrent["calls"] == sequential["calls"]
+
+
+def test_failed_game_is_recorded_and_batch_continues(monkeypatch):
+    real = batch_runner.GameManager
+    created = []
+
+    def flaky(**kwargs):
+        created.append(kwargs["seed"])
+        if kwargs["seed"] == 1:
+            raise RuntimeError("boom")
+        return real(**kwargs)
+
+    monkeypatch.setattr(batch_runner, "GameManager", flaky)
+    results, failures = run_games(build_llm_manager(CONFIG), 3, 6, seed=0)
+    assert created == [0, 1, 2]
+    assert [r.seed for r in results] == [0, 2]
+    assert failures[0]["seed"] == 1 and "boom" in failures[0]["error"]
@@ -0,0 +1,70 @@
+"""脚本机器人：按 schema 给出合法决策；quiet 模式下整局不输出、不写文件"""
+import json
+import os
+
+from bots import ScriptedAgent
+from decision import validate
+from game import GameManager
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+
+def make_game(seed, policy="random"):
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy=policy, seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    return GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=seed, quiet=True,
+                       save_history=False)
+
+
+def test_decisions_always_pass_the_schema_including_cross_field_checks():
+    bot = ScriptedAgent(policy="random", seed=0)
+    schema = {
+        "heal": {"choices": ["yes", "no"]},
+        "poison": {"choices": ["Ann", "Bob"], "allow_empty": True},
+        "reason": {"required": False, "default": ""},
+        "__check__": lambda d: "same player" if d["heal"] == "yes" and d["poison"] == "Ann" else None,
+    }
+    seen = set()
+    for _ in range(200):
+        data = json.loads(bot.get_response_batch("Decide.", {"name": "compound"}, schema))
+        clean, error = validate(data, schema)
+        assert error is None, data
+        seen.add((clean["heal"], clean["poison"]))
+    assert ("yes", "Ann") not in seen and ("no", "") in seen
+    assert [rec["call_type"] for rec in bot.call_log[:1]] == ["compound"]
+
+
+def test_persona_batch_request_is_answered_per_seat():
+    bot = ScriptedAgent(policy="random", seed=1)
+    schema = {"Ann": {"target": {"choices": ["Bob"]}}, "Bob": {"target": {"choices": ["Ann"]}}}
+    reply = json.loads(bot.get_oneshot_response([{"role": "user", "content": "Vote."}], None, schema))
+    assert reply == {"Ann": {"target": "Bob"}, "Bob": {"target": "Ann"}}
+
+
+def test_heuristic_wolves_never_kill_a_partner():
+    for seed in range(10):
+        gm = make_game(seed, policy="heuristic")
+        result = gm.game()
+        wolves = {gm.stats.index[s.player_name] for s in gm.role_manager.slots if s.role == "werewolf"}
+        kills = gm.stats.wolf_kills.tolist()
+        # 狼人胜利判定在夜杀选择之后：获胜那一夜可能已经没有好人可选，这一刀不结算
+        if result.winner == "Werewolves":
+            kills = kills[:-1]
+        assert not wolves & set(kills)
+
+
+def test_quiet_game_prints_nothing_and_writes_nothing(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    result = make_game(seed=3).game()
+    assert result.winner
+    assert capsys.readouterr().out == ""
+    assert os.listdir(tmp_path) == []
+
+
+def test_jester_win_ends_the_game_normally():
+    gm = make_game(seed=5)
+    result = gm.game()                              # 以前这里会 exit()
+    assert result.winner.startswith("Jester")
+    assert gm.game_over and result.deaths[-1]["cause"] == "jester"
@@ -0,0 +1,46 @@
+"""结构化决策的解析、校验和输出预算"""
+import asyncio
+
+import decision
+from game import GameManager
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+TARGET = {"target": {"choices": ["Alice", "Bob"]}}
+WITH_REASON = dict(TARGET, reason={"required": False, "default": "", "max_len": 300})
+
+
+def test_parse_decision_tolerates_wrapping_text():
+    data, error = decision.parse_decision('Sure!\n```json\n{"target": "alice"}\n```', TARGET)
+    assert error is None and data == {"target": "Alice"}
+    assert decision.parse_decision('{"target": "Carol"}', TARGET)[0] is None
+
+
+def test_output_budget_covers_schema():
+    assert decision.output_budget(TARGET) <= 80
+    assert decision.output_budget(WITH_REASON) >= 300
+
+
+def test_decision_max_tokens_never_below_schema_budget():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=4)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=1, quiet=True, save_history=False)
+
+    player = gm.alive[0]
+    seen = []
+    ask = player.llm_obj.get_response_batch
+
+    def get_response_batch(user_input, profile=None, schema=None):
+        seen.append(profile["max_tokens"])
+        return ask(user_input, profile, schema)
+
+    player.llm_obj.get_response_batch = get_response_batch
+    names = [p.player_name for p in gm.alive if p is not player]
+    schema = {"target": {"choices": names}, "reason": {"required": False, "default": "", "max_len": 300}}
+
+    asyncio.run(gm.ask_decision(player, "choose", {"target": {"choices": names}}))
+    asyncio.run(gm.ask_decision(player, "choose", schema))
+    assert seen[0] == gm.call_profiles["decision"]["max_tokens"]
+    assert seen[1] >= decision.output_budget(schema) > seen[0]
@@ -0,0 +1,77 @@
+"""白天讨论的可见窗口：摘要 / 提及只生成一次，渲染时最近 K 条原文、更早的给摘要"""
+import asyncio
+
+import discussion
+from game import GameManager
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+NAMES = ["Alice", "Bob", "Cid", "小明"]
+REASONING = "long reasoning " * 30
+
+
+def test_digest_is_first_sentence_and_mentions_use_word_boundaries():
+    speech = discussion.make_speech("Alice", "I suspect Bob.  Cid seems fine to me.", NAMES)
+    assert speech.digest == "I suspect Bob. [mentions: Bob, Cid]"
+    assert speech.mentions == {"Bob", "Cid"}
+
+    # "Bobby" 不算提到 Bob；中文名按子串匹配；自己的名字不算
+    speech = discussion.make_speech("Alice", "Bobby and 小明说的不对, Alice agrees", NAMES)
+    assert speech.mentions == {"小明"}
+
+    long = discussion.make_speech("Bob", "x" * 200, NAMES, digest_chars=20)
+    assert len(long.digest) == 20 and long.digest.endswith("…")
+
+
+def test_render_keeps_last_k_verbatim_and_caps_digests():
+    speeches = [discussion.make_speech(n, f"{n} talks about Alice. More words.", NAMES)
+                for n in ["Bob", "Cid", "Bob", "Cid", "Bob"]]
+    text = discussion.render_visible(speeches, window=2, digest_max=2)
+    lines = text.split("\n")
+    assert lines[0] == "Earlier (digest):"
+    assert lines[1:3] == ["- Cid: Cid talks about Alice. [mentions: Alice]",     # 只留最近的 2 条摘要
+                          "- Bob: Bob talks about Alice. [mentions: Alice]"]
+    assert lines[3] == "Recent:"
+    assert lines[4:] == ["Cid: Cid talks about Alice. More words.", "Bob: Bob talks about Alice. More words."]
+
+    # window=0 时没有原文，只剩摘要；digest_max=0 时摘要全部丢掉
+    assert "Recent:" not in discussion.render_visible(speeches, window=0)
+    assert discussion.render_visible(speeches, window=1, digest_max=0) == speeches[-1].name + ": " + speeches[-1].text
+
+
+def test_mention_only_keeps_older_speeches_about_the_viewer():
+    speeches = [
+        discussion.make_speech("Bob", "Cid is a wolf.", NAMES),
+        discussion.make_speech("Cid", "Alice is lying.", NAMES),
+        discussion.make_speech("Bob", "Nothing to add.", NAMES),
+    ]
+    text = discussion.render_visible(speeches, window=1, viewer="Alice", mention_only=True)
+    assert "Alice is lying." in text and "Cid is a wolf." not in text
+    assert text.endswith("Bob: Nothing to add.")
+
+
+def test_speaker_prompts_stay_bounded_with_a_window():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=1, quiet=True,
+                     save_history=False, speech_window=2, speech_digest_max=3)
+    gm.day_count = 1
+
+    prompts = []
+    for slot in role_manager.slots:
+        def get_response(user_input, profile=None, name=slot.player_name):
+            prompts.append(user_input)
+            return f"I am {name}. " + REASONING
+        slot.llm_obj.get_response = get_response
+
+    asyncio.run(gm.speak_round(1))
+    asyncio.run(gm.speak_round(2))
+
+    # 第 2 轮每个发言者都能看到 7 条发言，但原文只有最近 2 条，摘要最多 3 条
+    for prompt in prompts[8:]:
+        assert prompt.count(REASONING) == 2
+        digests = prompt.split("Earlier (digest):\n", 1)[1].split("Recent:", 1)[0]
+        assert digests.count("- ") == 3
+    assert len(gm.last_round_speeches) == 8
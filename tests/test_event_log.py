@@ -0,0 +1,67 @@
+"""共享事件日志：只追加、按视角和游标取最近事件，可见事件相同的视角共用渲染结果"""
+from agent import MultiTurnChatAgent
+from event_log import EventLog
+from game import GameManager
+from history import EVENTS_HEADER
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+
+def test_select_keeps_the_last_events_after_the_cursor():
+    log = EventLog(max_events=3)
+    for i in range(6):
+        log.append(f"e{i}\n")
+    assert list(log.select("Ann")) == [3, 4, 5]
+    assert list(log.select("Ann", since=4)) == [4, 5]
+    assert list(log.select("Ann", since=6)) == []
+    assert list(log.select("Ann", limit=1)) == [5]
+    assert log.render("Ann") == "e3\ne4\ne5"
+
+
+def test_private_events_are_skipped_for_other_viewers_without_shrinking_the_window():
+    log = EventLog(max_events=2)
+    log.append("public 0")
+    log.append("to wolves", visible_to=["Cid", "Dan"])
+    log.append("public 1")
+    log.append("to seer", visible_to=["Ann"])
+
+    assert log.render("Ann") == "public 1\nto seer"
+    assert log.render("Cid") == "to wolves\npublic 1"
+    assert log.render("Bob") == "public 0\npublic 1"          # 看不到的事件不占名额
+    assert log.render("Bob", since=1) == "public 1"
+
+
+def test_viewers_with_the_same_events_share_one_string_until_the_log_grows():
+    log = EventLog()
+    log.append("Night 1: Bob died.")
+    a, b = log.render("Ann"), log.render("Cid")
+    assert a is b
+    log.append("Day 1: Ann was banished.")
+    assert log.render("Ann") is not a and log.render("Ann").endswith("banished.")
+
+
+def test_agent_only_sees_events_appended_after_it_attached():
+    log = EventLog()
+    log.append("from an earlier game")
+    agent = MultiTurnChatAgent(api_key="x", base_url="http://127.0.0.1:9/v1", model="m", stream_mode=False)
+    agent.attach_event_log(log, "Ann")
+    assert agent.build_api_messages()[1]["content"] == EVENTS_HEADER
+
+    log.append("secret", visible_to=["Cid"])
+    log.append("Night 1: Bob died.")
+    assert agent.build_api_messages()[1]["content"] == EVENTS_HEADER + "Night 1: Bob died."
+    assert agent.export_history()[1]["content"] == EVENTS_HEADER + "Night 1: Bob died."
+    assert agent.history.events.content == EVENTS_HEADER       # 事件不写进每个座位的历史
+
+
+def test_each_game_broadcasts_once_into_its_own_log():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=9, quiet=True, save_history=False)
+    gm.notify_all_llms("Bob was banished.")
+
+    assert len(gm.events) == 1
+    agents = [s.llm_obj for s in role_manager.slots]
+    assert all(a.event_log is gm.events and a.event_cursor == 0 for a in agents)
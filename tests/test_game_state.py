@@ -0,0 +1,89 @@
+"""对局状态：按名字 O(1) 查座位，死亡时增量更新存活 / 阵营集合，缓存的名单只在死亡时失效"""
+import asyncio
+
+from game import GameManager
+from game_state import GameState, faction_of
+from llm_manager import LLMManager
+from role_manager import PlayerSlot, RoleManager
+
+ROLES = ["werewolf", "seer", "villager", "jester", "werewolf", "hunter"]
+
+
+def make_state():
+    slots = [PlayerSlot(name=f"s{i}", is_human=False, role=role, player_name=f"P{i}")
+             for i, role in enumerate(ROLES)]
+    return GameState(slots)
+
+
+def test_factions_and_lookup():
+    state = make_state()
+    assert [faction_of(r) for r in ("Werewolf", "witch", "jester")] == ["werewolf", "villager", "jester"]
+    assert (state.count(), state.count("werewolf"), state.count("villager"), state.count("jester")) == (6, 2, 3, 1)
+    assert state.get("P3").role == "jester" and state.seat_of("P5") == 5
+    assert state.get("nobody") is None and not state.is_alive("nobody")
+    assert state.alive_names_text == "P0, P1, P2, P3, P4, P5"
+
+
+def test_kill_updates_sets_and_invalidates_cached_lists():
+    state = make_state()
+    alive, wolves, names = state.alive, state.werewolves, state.alive_names
+    assert state.alive is alive                     # 没人死亡时复用缓存
+
+    slot = state.kill("P4")
+    assert slot.role == "werewolf" and not slot.alive
+    assert not state.is_alive("P4")
+    assert (state.count(), state.count("werewolf")) == (5, 1)
+    assert [s.player_name for s in state.werewolves] == ["P0"]
+    assert state.alive_names == ["P0", "P1", "P2", "P3", "P5"]
+    assert state.alive_names_text == "P0, P1, P2, P3, P5"
+
+    # 之前拿到的名单不会被原地修改：遍历中途有人死亡也不受影响
+    assert len(alive) == 6 and len(wolves) == 2 and "P4" in names
+
+
+def test_kill_is_idempotent_and_ignores_unknown_names():
+    state = make_state()
+    state.kill("P2")
+    alive = state.alive
+    assert state.kill("P2").player_name == "P2"     # 已经死亡：返回座位，不再改动
+    assert state.alive is alive and state.count("villager") == 2
+    assert state.kill("nobody") is None
+    assert state.count() == 5
+
+
+def test_slots_dead_at_construction_are_not_counted():
+    slots = make_state().slots
+    slots[1].alive = False
+    state = GameState(slots)
+    assert state.count() == 5 and state.count("villager") == 2 and not state.is_alive("P1")
+
+
+def test_night_settlement_removes_a_killed_jester_immediately():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=5, quiet=True, save_history=False)
+    jester = next(s for s in role_manager.slots if s.role == "jester")
+
+    gm.night_count = 1
+    gm.pending_kill = jester.player_name
+    asyncio.run(gm.process_night_results())
+
+    assert not gm.state.is_alive(jester.player_name) and not jester.alive
+    assert jester not in gm.alive and gm.state.count("jester") == 0
+    assert gm.result().deaths[0]["name"] == jester.player_name
+
+
+def test_state_matches_the_slots_after_a_full_game():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="heuristic", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=6, quiet=True, save_history=False)
+    gm.game()
+
+    slots = role_manager.slots
+    assert gm.alive == [s for s in slots if s.alive]
+    assert gm.werewolf_list == [s for s in slots if s.alive and s.role == "werewolf"]
+    assert gm.state.count("villager") == sum(s.alive and faction_of(s.role) == "villager" for s in slots)
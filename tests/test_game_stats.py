@@ -0,0 +1,70 @@
+"""数值化对局记录：投票矩阵、狼人夜杀、死亡时间线与提示摘要"""
+import numpy as np
+
+from game import GameManager
+from game_stats import GameStats
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+NAMES = ["Ann", "Bob", "Cid", "Dan"]
+
+
+def test_votes_are_stored_as_a_day_by_voter_matrix():
+    stats = GameStats(NAMES)
+    stats.record_votes(1, {"Ann": {"target": "Bob"}, "Bob": {"target": "Ann"}, "Cid": {"target": "Bob"},
+                           "Dan": None})
+    stats.record_votes(2, [{"Ann": {"target": "Zed"}}, {"Ann": {"target": "Cid"}, "Cid": {"target": "Ann"}}])
+
+    assert stats.votes.tolist() == [[1, 0, 1, -1], [2, -1, 0, -1]]     # 多轮时取最后一轮，未知名字不记
+    assert stats.vote_days.tolist() == [1, 2]
+    assert stats.votes_received().tolist() == [2, 2, 1, 0]
+    assert stats.agreement()[0, 2] == 1 and stats.agreement()[0, 0] == 0
+
+
+def test_wolf_kills_grow_per_night_and_deaths_are_recorded_once():
+    stats = GameStats(NAMES)
+    stats.record_wolf_kill(2, "Cid")
+    assert stats.wolf_kills.tolist() == [-1, 2]
+
+    stats.record_death("Cid", 2, "poison", night=True)
+    stats.record_death("Cid", 3, "banished")                # 已经死了，不覆盖
+    stats.record_death("Bob", 3, "banished")
+    assert stats.death_order == [2, 1]
+    assert stats.to_dict()["death_cause"] == ["alive", "banished", "poison", "alive"]
+    assert stats.to_dict()["death_phase"] == ["", "day", "night", ""]
+
+
+def test_digest_hides_night_causes_and_keeps_the_last_days():
+    stats = GameStats(NAMES)
+    for day in (1, 2, 3):
+        stats.record_votes(day, {"Ann": {"target": NAMES[day]}})
+    stats.record_death("Dan", 1, "poison", night=True)
+    stats.record_death("Bob", 1, "banished")
+
+    digest = stats.digest(max_days=2)
+    assert digest.split("\n")[1:] == [
+        "voter | D2 | D3",
+        "Ann | Cid | Dan",
+        "Deaths: N1 Dan, D1 Bob (banished)",
+    ]
+    assert digest is stats.digest(max_days=2)               # 数据没变时复用缓存
+    stats.record_death("Cid", 2, "night", night=True)
+    assert digest != stats.digest(max_days=2)
+
+
+def test_a_game_fills_the_arrays_consistently_with_its_result():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=4, quiet=True, save_history=False)
+    result = gm.game()
+
+    dead = {d["name"] for d in result.deaths}
+    assert dead == {n for n in gm.stats.names if not gm.state.is_alive(n)}
+    assert len(gm.stats.wolf_kills) >= 1 and np.all(gm.stats.wolf_kills >= 0)
+    # 出局的玩家在之后的公投里不再有票
+    for day, row in zip(gm.stats.vote_days, gm.stats.votes):
+        for i in np.flatnonzero(row >= 0):
+            cycle = gm.stats.death_cycle[i]
+            assert cycle < 0 or cycle >= day
@@ -0,0 +1,77 @@
+"""环形缓冲对话历史：裁剪、置顶、增量维护的 API 视图与整表重建一致"""
+from history import EVENTS_HEADER, ConversationHistory
+
+
+def rebuilt(history, suffix=""):
+    """不依赖增量视图、按定义重建的 API 消息列表"""
+    msgs = [{"role": m.role, "content": m.content} for m in history]
+    msgs[1]["content"] += suffix
+    return msgs
+
+
+def test_ring_buffer_drops_oldest_and_keeps_view_in_sync():
+    history = ConversationHistory(("rules\n", "role\n", "name\n"), max_length=3)
+    history.pin("intro", "user", "intros")
+    for i in range(5):
+        history.append("user", f"q{i}")
+        assert history.api_view("ev") == rebuilt(history, "ev")
+        history.release_view()
+
+    view = history.api_view()
+    assert view[0]["content"] == "rules\nrole\nname\n"
+    assert [m["content"] for m in view[2:]] == ["intros", "q2", "q3", "q4"]
+    assert len(history) == 2 + 1 + 3
+
+
+def test_pin_replaces_in_place_and_survives_trimming():
+    history = ConversationHistory("sys", max_length=2)
+    history.pin("intro", "user", "v1")
+    history.append("user", "a")
+    history.pin("intro", "user", "v2")
+    history.append("user", "b")
+    history.append("user", "c")
+    assert [m["content"] for m in history.api_view()[2:]] == ["v2", "b", "c"]
+
+
+def test_release_view_keeps_shared_segments_only():
+    history = ConversationHistory(("shared rules", " mine"), max_length=4)
+    history.api_view("events")
+    history.release_view()
+    assert history._view[0]["content"] == ""
+    assert history._view[1]["content"] == EVENTS_HEADER
+
+
+def test_round_trip_through_list(tmp_path):
+    history = ConversationHistory("sys", max_length=4)
+    history.set_events(EVENTS_HEADER + "night 1: Bob died")
+    history.append("user", "hi")
+    history.append("assistant", "hello")
+    path = tmp_path / "h.json"
+    history.dump(path)
+    loaded = ConversationHistory.load(path, max_length=4)
+    assert loaded.api_view() == history.api_view()
+
+
+def test_round_trip_keeps_pinned_messages_through_eviction():
+    history = ConversationHistory("sys", max_length=2)
+    history.pin("intro", "user", "intros")
+    history.append("user", "a")
+    restored = ConversationHistory.from_list(history.to_list(), max_length=2)
+    for text in ("b", "c", "d"):                    # 环形缓冲被挤满，最旧的普通消息被淘汰
+        history.append("user", text)
+        restored.append("user", text)
+
+    assert restored.api_view() == history.api_view()
+    assert [m["content"] for m in restored.api_view()[2:]] == ["intros", "c", "d"]
+    restored.pin("intro", "user", "intros v2")      # 仍然是同一个置顶项，原位替换
+    assert [m["content"] for m in restored.api_view()[2:]] == ["intros v2", "c", "d"]
+
+
+def test_clear_resets_everything_but_system():
+    history = ConversationHistory("sys", max_length=4)
+    history.pin("intro", "user", "x")
+    history.append("user", "hi")
+    history.set_events("changed")
+    history.clear()
+    assert history.api_view() == [{"role": "system", "content": "sys"},
+                                  {"role": "system", "content": EVENTS_HEADER}]
@@ -0,0 +1,94 @@
+"""输入输出通道：缓冲 / 队列通道，以及整局人类座位经通道作答"""
+import asyncio
+import threading
+
+from game import GameManager
+from io_channel import BufferedChannel, HumanRequest, NullChannel, QueueChannel
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+
+def test_buffered_channel_formats_like_print_and_answers_in_order():
+    channel = BufferedChannel(["yes", "Bob"])
+    channel.emit("a", 1, sep="-")
+    channel.emit("b", end="")
+    assert channel.ask("heal? ") == "yes"
+    assert channel.ask("target? ") == "Bob"
+    assert channel.ask("more? ") == ""              # 预设答案用完
+    assert channel.text() == "a-1\nbheal? yes\ntarget? Bob\nmore? \n"
+
+
+def test_human_request_can_be_answered_from_another_thread_and_awaited():
+    req = HumanRequest("> ", "Alice")
+    threading.Timer(0.05, req.answer, args=("Bob",)).start()
+    assert asyncio.run(req.wait_async()) == "Bob"
+    assert HumanRequest("> ").wait(timeout=0.01) == ""
+
+
+def test_queue_channel_times_out_to_empty_answer():
+    channel = QueueChannel(timeout=0.01)
+    assert channel.ask("> ", "Alice") == ""
+    kind, req = channel.outbox.get_nowait()
+    assert kind == "input" and req.player == "Alice"
+
+
+def test_queue_channel_async_ask_times_out_like_sync():
+    channel = QueueChannel(timeout=0.01)
+    assert asyncio.run(channel.ask_async("> ", "Alice")) == ""
+    _, req = channel.outbox.get_nowait()
+    assert req.done                                 # 等待线程已放掉，事件循环能正常关闭
+
+
+def test_unanswered_human_seat_does_not_stall_an_async_game():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_player("Me")
+    role_manager.add_llm_agents(player_number=7)
+    channel = QueueChannel(timeout=0.01)            # 没有任何消费方作答
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=2, channel=channel,
+                     save_history=False, post_game_summary=False)
+
+    result = asyncio.run(asyncio.wait_for(gm.game_async(), timeout=30))
+    assert result.winner != "Unknown"
+    asked = [item for kind, item in list(channel.outbox.queue) if kind == "input"]
+    assert asked and all(req.done for req in asked)
+
+
+def test_human_seat_plays_a_full_game_through_a_queue():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_player("Me")
+    role_manager.add_llm_agents(player_number=7)
+    channel = QueueChannel()
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=2, channel=channel,
+                     save_history=False, post_game_summary=False)
+
+    asked = []
+
+    def answer_everything():
+        while True:
+            kind, item = channel.outbox.get()
+            if kind == "done":
+                return
+            if kind == "input":
+                asked.append(item.prompt)
+                item.answer("")                     # 人类一律放弃 / 空发言
+
+    consumer = threading.Thread(target=answer_everything)
+    consumer.start()
+    try:
+        result = gm.game()
+    finally:
+        channel.outbox.put(("done", None))
+        consumer.join()
+
+    assert result.winner
+    assert asked, "人类座位应当经通道被询问"
+
+
+def test_null_channel_is_silent():
+    channel = NullChannel()
+    channel.emit("anything")
+    assert channel.ask("> ") == ""
@@ -0,0 +1,87 @@
+"""检索记忆：BM25 排序、可见范围（私有结果只给本人 / 狼人）、只检索本轮之前的记录"""
+import asyncio
+
+from game import GameManager
+from llm_manager import LLMManager
+from memory import EventMemory, tokenize
+from role_manager import RoleManager
+
+
+def test_tokenize_drops_stop_words_and_splits_cjk_into_bigrams():
+    assert tokenize("The Seer checked Bob") == ["seer", "checked", "bob"]
+    assert tokenize("预言家 狼") == ["预言", "言家", "狼"]
+
+
+def test_private_items_are_only_visible_to_their_viewers():
+    memory = EventMemory()
+    memory.add("Day 1 Bob said: Cid is the wolf.", "speech")
+    memory.add("Night 1: Seer result: Cid is Werewolf.", "seer_result", visible_to=["Alice"])
+    memory.add("Night 1: werewolves chose to kill Dan.", "wolf_chat", visible_to=["Cid", "Eve"])
+
+    assert [i.kind for i in memory.search("Cid wolf", viewer="Alice")] == ["speech", "seer_result"]
+    assert [i.kind for i in memory.search("Cid wolf kill", viewer="Bob")] == ["speech"]
+    assert [i.kind for i in memory.search("kill Dan", viewer="Eve")] == ["wolf_chat"]
+    assert memory.search("kill Dan") == []          # 没有 viewer 只能看到公开记录
+    assert [i.kind for i in memory.private_items("Alice")] == ["seer_result"]
+    assert memory.private_items("Bob") == []
+
+
+def test_search_skips_records_still_in_context_and_ranks_by_relevance():
+    memory = EventMemory()
+    memory.add("Bob voted for Cid.", "update")
+    memory.add("Dan was killed at night.", "update")
+    memory.add("Bob and Cid argued about Dan.", "update")
+    mark = len(memory)
+    memory.add("Bob voted for Cid again.", "update")
+
+    hits = memory.search("Bob Cid", top_k=2, before=mark)
+    assert [i.doc_id for i in hits] == [0, 2]       # 按时间顺序输出，跳过 mark 之后的记录
+    assert memory.search("Bob", before=0) == []
+
+    block = memory.render("Dan killed", top_k=1, max_chars=12)
+    assert block == "Relevant earlier events:\n- [update] Dan was kil…"
+
+
+def make_game():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=3, quiet=True,
+                     save_history=False)
+    for slot in role_manager.slots:
+        slot.llm_obj.reads_prompts = True           # 像模型一样读取提示，检索块不会被跳过
+    return gm
+
+
+def test_night_results_are_recalled_only_by_the_seats_that_saw_them():
+    gm = make_game()
+    gm.night_count = 1
+    gm.is_night = True
+    asyncio.run(gm.werewolf_mode())
+    asyncio.run(gm.seer_mode())
+    gm.memory_mark = len(gm.memory)                 # 进入下一个周期，夜里的记录才可检索
+
+    seats = {s.role: s for s in gm.role_manager.slots}
+    wolves = [s for s in gm.role_manager.slots if s.role == "werewolf"]
+    query = "Night 1 seer result werewolf kill " + " ".join(s.player_name for s in gm.role_manager.slots)
+
+    assert "[seer_result]" in gm.recall(seats["seer"], query)
+    assert all("[wolf_chat]" in gm.recall(w, query) for w in wolves)
+    for role in ("villager", "witch", "hunter", "jester"):
+        block = gm.recall(seats[role], query)
+        assert "[seer_result]" not in block and "[wolf_chat]" not in block
+
+
+def test_recall_is_off_when_disabled_or_over_budget():
+    gm = make_game()
+    gm.notify_all_llms("Bob was banished.")
+    gm.memory_mark = len(gm.memory)
+    seat = gm.role_manager.slots[0]
+    assert "Bob was banished." in gm.recall(seat, "Bob banished")
+
+    gm.budget_exceeded = True
+    assert gm.recall(seat, "Bob banished") == ""
+    gm.budget_exceeded = False
+    gm.memory_top_k = 0
+    assert gm.recall(seat, "Bob banished") == ""
@@ -0,0 +1,106 @@
+"""本地模拟服务：按提示生成合法回复，流式 / 非流式一致，延迟分布与 429 / 5xx 注入"""
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import decision
+from mock_server import MockConfig, MockServer, generate_reply
+
+NAMES = ["Ann", "Bob", "Cid", "Dan", "Eve"]
+
+
+def post(server, body):
+    req = urllib.request.Request(
+        server.base_url + "/chat/completions", data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return resp.read().decode("utf-8")
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(MockServer(MockConfig(port=0, **kwargs)).start())
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def decision_messages():
+    schema = {"target": {"choices": NAMES[1:]}, "vote": {"choices": ["yes", "no"]}, "reason": {"required": False}}
+    prompt = f"Alive players: {NAMES}\nGive ONLY JSON: {decision.schema_hint(schema)}"
+    system = "rules\nYour player name is: Ann.\n"
+    return schema, [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+
+def test_decision_replies_follow_the_schema_and_never_pick_the_speaker():
+    schema, messages = decision_messages()
+    for seed in range(50):
+        data, error = decision.parse_decision(generate_reply(messages, random.Random(seed)), schema)
+        assert error is None and data["target"] != "Ann"
+
+
+def test_stream_and_plain_replies_match_and_respect_max_tokens(serve):
+    server = serve(seed=3)
+    _, messages = decision_messages()
+    plain = json.loads(post(server, {"model": "mock", "messages": messages}))
+    text = plain["choices"][0]["message"]["content"]
+    assert plain["usage"]["completion_tokens"] > 0
+
+    raw = post(server, {"model": "mock", "messages": messages, "stream": True,
+                        "stream_options": {"include_usage": True}})
+    chunks = [json.loads(line[6:]) for line in raw.split("\n") if line.startswith("data: {")]
+    streamed = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+    assert streamed == text                         # 同样的请求得到同样的回复
+    assert chunks[-1]["usage"] == plain["usage"] and raw.rstrip().endswith("data: [DONE]")
+
+    cut = json.loads(post(server, {"model": "mock", "messages": messages, "max_tokens": 2}))
+    assert cut["choices"][0]["finish_reason"] == "length" and cut["usage"]["completion_tokens"] == 2
+
+
+def test_fault_injection_returns_429_with_retry_after_and_5xx(serve):
+    server = serve(rate_429=1.0, retry_after=2.5)
+    with pytest.raises(urllib.error.HTTPError) as err:
+        post(server, {"messages": []})
+    assert err.value.code == 429 and err.value.headers["Retry-After"] == "2.5"
+
+    server = serve(rate_5xx=1.0)
+    codes = set()
+    for _ in range(20):
+        with pytest.raises(urllib.error.HTTPError) as err:
+            post(server, {"messages": []})
+        codes.add(err.value.code)
+    assert codes <= {500, 502, 503} and len(codes) > 1
+    assert (server.requests, server.errors) == (20, 20)
+
+
+def test_fixed_latency_and_tokens_per_second_delay_the_reply(serve):
+    server = serve(latency=0.2, tps=100)
+    start = time.monotonic()
+    reply = json.loads(post(server, {"messages": [{"role": "user", "content": "hi"}]}))
+    elapsed = time.monotonic() - start
+    assert elapsed >= 0.2 + reply["usage"]["completion_tokens"] / 100 - 0.01
+
+
+@pytest.mark.parametrize("dist", ["fixed", "uniform", "exponential", "lognormal"])
+def test_latency_distributions_keep_the_configured_mean(dist):
+    server = MockServer(MockConfig(latency_dist=dist, seed=1))
+    draws = [server._draw(0.3) for _ in range(20000)]
+    assert sum(draws) / len(draws) == pytest.approx(0.3, rel=0.05)
+    assert min(draws) >= 0.0
+    assert server._draw(0.0) == 0.0
+
+
+def test_models_endpoint_lists_the_mock_model(serve):
+    server = serve(model="mock-x")
+    with urllib.request.urlopen(server.base_url + "/models", timeout=10) as resp:
+        assert json.load(resp)["data"][0]["id"] == "mock-x"
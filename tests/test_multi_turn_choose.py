@@ -0,0 +1,78 @@
+"""multi_turn_choose 的可见文本：上一轮排在自己后面 / 前面的选择 + 本轮已行动者的选择"""
+import asyncio
+import json
+
+from game import GameManager
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+
+def make_game():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    return GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=8, quiet=True,
+                       save_history=False)
+
+
+def run(gm, actors, targets, **kwargs):
+    """actors[i] 第 r 轮选择 targets[r][i]；返回每个 actor 每轮看到的可见文本和结果"""
+    seen = {a.player_name: [] for a in actors}
+    for i, actor in enumerate(actors):
+        replies = [{"target": targets[r][i], "reason": f"r{r}"} for r in range(len(targets))]
+
+        def get_response_batch(user_input, profile=None, schema=None, name=actor.player_name, replies=replies):
+            visible = user_input.split("Visible info:\n", 1)[1].split("\nRound ", 1)[0].strip()
+            seen[name].append(visible)
+            return json.dumps(replies.pop(0))
+
+        actor.llm_obj.get_response_batch = get_response_batch
+
+    results = asyncio.run(gm.multi_turn_choose(
+        actors=actors, alive_players=gm.alive, prompt_header="Vote.", turns=len(targets), **kwargs
+    ))
+    return [seen[a.player_name] for a in actors], results
+
+
+def test_each_actor_sees_the_previous_round_from_its_seat_and_this_round_so_far():
+    gm = make_game()
+    a, b, c = gm.alive[:3]
+    t = [s.player_name for s in gm.alive[3:]]
+    seen, results = run(gm, [a, b, c], [[t[0], t[1], t[2]], [t[3], t[4], t[0]]],
+                        visibility={"mode": "full"})
+
+    assert seen[0] == ["None", f"{b.player_name} → {t[1]}\n{c.player_name} → {t[2]}"]
+    assert seen[1] == [
+        f"{a.player_name} → {t[0]}",
+        # 上一轮排在后面的 c，再到前面的 a（不含自己），然后是本轮已行动的 a
+        f"{c.player_name} → {t[2]}\n{a.player_name} → {t[0]}\n{a.player_name} → {t[3]}",
+    ]
+    assert seen[2] == [
+        f"{a.player_name} → {t[0]}\n{b.player_name} → {t[1]}",
+        f"{a.player_name} → {t[0]}\n{b.player_name} → {t[1]}\n{a.player_name} → {t[3]}\n{b.player_name} → {t[4]}",
+    ]
+    assert [r[c.player_name]["target"] for r in results] == [t[2], t[0]]
+
+
+def test_blind_anonymous_rounds_hide_names_and_the_current_round():
+    gm = make_game()
+    a, b, c = gm.alive[:3]
+    t = [s.player_name for s in gm.alive[3:]]
+    seen, _ = run(gm, [a, b, c], [[t[0], t[1], t[2]], [t[3], t[4], t[0]]],
+                  visibility={"mode": "anonymous", "reveal_partner": True, "reveal_reason": True},
+                  require_reason=True, blind=True)
+
+    partners = f"\nYour partners are: {[a.player_name, b.player_name, c.player_name]}"
+    assert seen[0][0] == "None" + partners and seen[2][0] == "None" + partners
+    assert seen[1][1] == f"→ {t[2]}\nreason: r0\n→ {t[0]}\nreason: r0" + partners
+    assert a.player_name + " →" not in "".join(sum(seen, []))
+
+
+def test_invalid_choices_are_not_shown_to_later_actors():
+    gm = make_game()
+    a, b = gm.alive[:2]
+    seen, results = run(gm, [a, b], [["nobody", gm.alive[2].player_name]],
+                        visibility={"mode": "full"}, max_retry=0)
+    assert results[0][a.player_name] is None
+    assert seen[1] == ["None"]
@@ -0,0 +1,75 @@
+"""名字池：无放回抽取、预占 / 归还、用尽时的行为，以及每局复位"""
+import random
+
+import pytest
+
+from name_pool import NamePool
+from role_manager import NameStrategyCategorized, PlayerSlot
+
+
+def test_pool_draws_every_value_once_then_runs_dry():
+    pool = NamePool(50, random.Random(0))
+    drawn = [pool.draw() for _ in range(50)]
+    assert sorted(drawn) == list(range(50))
+    assert pool.remaining == 0 and pool.draw() is None
+
+
+def test_reserve_and_release():
+    pool = NamePool(5, random.Random(1))
+    assert pool.reserve(3) and not pool.reserve(3)
+    drawn = {pool.draw() for _ in range(4)}
+    assert drawn == {0, 1, 2, 4} and pool.draw() is None
+
+    pool.release(2)
+    pool.release(2)                                 # 重复归还不影响
+    assert pool.remaining == 1 and pool.draw() == 2
+
+
+def test_checkpoint_restores_the_same_future_draws():
+    rng = random.Random(2)
+    pool = NamePool(1000, rng)
+    pool.draw()
+    state, rng_state = pool.checkpoint(), rng.getstate()
+    first = [pool.draw() for _ in range(5)]
+    pool.restore(state)
+    rng.setstate(rng_state)
+    assert [pool.draw() for _ in range(5)] == first
+
+
+def seat():
+    return PlayerSlot(name="s", is_human=False)
+
+
+def test_categories_fall_back_to_normal_names_when_exhausted():
+    names = NameStrategyCategorized(seed=0)
+    special = sum(len(cfg["names"]) for cfg in names.categories.values())
+    got = [names.generate(seat(), 1, mode="special") for _ in range(special + 3)]
+    assert len(set(got)) == len(got)
+    assert all("_" in n for n in got[special:])     # 分类名字用完后给 Pine_12 这样的普通名字
+
+
+def test_normal_pool_exhaustion_raises():
+    names = NameStrategyCategorized(seed=0)
+    names.bases, names.normal_max = ["Pine"], 3
+    names.reset()
+    got = {names.generate(seat(), 1, mode="normal") for _ in range(3)}
+    assert got == {"Pine_1", "Pine_2", "Pine_3"}
+    with pytest.raises(RuntimeError):
+        names.generate(seat(), 1, mode="normal")
+
+    names.release("Pine_2")                         # 归还后可以再分配
+    assert names.generate(seat(), 1, mode="normal") == "Pine_2"
+
+
+def test_reset_returns_every_name_and_reserved_names_are_never_drawn():
+    names = NameStrategyCategorized(seed=0)
+    names.bases, names.normal_max = ["Pine"], 4
+    names.reset()
+    names.reserve("Pine_3")                         # 玩家自定义名
+    got = {names.generate(seat(), 1, mode="normal") for _ in range(3)}
+    assert "Pine_3" not in got
+
+    names.reset(seed=5)
+    first = [names.generate(seat(), 1, mode="special") for _ in range(4)]
+    names.reset(seed=5)
+    assert [names.generate(seat(), 1, mode="special") for _ in range(4)] == first
@@ -0,0 +1,147 @@
+"""角色复合行动：女巫一次决定救 + 毒、猎人一次给出遗言 + 开枪，提示带与其他决策相同的上下文"""
+import asyncio
+import json
+
+from game import GameManager
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+
+def make_game(seed=7):
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    return GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=seed, quiet=True,
+                       save_history=False)
+
+
+def script(slot, replies):
+    """让座位按顺序返回 replies 中的回复，返回收到的提示列表；像模型一样读取提示（检索块不会被跳过）"""
+    prompts = []
+    queue = list(replies)
+    agent = slot.llm_obj
+    agent.reads_prompts = True
+
+    def get_response_batch(user_input, profile=None, schema=None):
+        prompts.append(user_input)
+        return json.dumps(queue.pop(0)) if queue else "no idea"
+
+    agent.get_response_batch = get_response_batch
+    return prompts
+
+
+def seat(gm, role):
+    return next(s for s in gm.role_manager.slots if s.role == role)
+
+
+def night(gm, victim):
+    """进入第一夜，狼人已选定 victim"""
+    gm.night_count = 1
+    gm.is_night = True
+    gm.pending_kill = victim.player_name
+
+
+def test_witch_cannot_heal_and_poison_the_same_player():
+    gm = make_game()
+    witch, victim = seat(gm, "witch"), seat(gm, "villager")
+    other = seat(gm, "werewolf")
+    night(gm, victim)
+    prompts = script(witch, [
+        {"heal": "yes", "poison": victim.player_name},      # 跨字段校验不通过
+        {"heal": "yes", "poison": other.player_name},
+    ])
+    state = {"heal": True, "poison": True}
+    asyncio.run(gm.witch_night_action(witch, state, gm.state.alive_names))
+
+    assert len(prompts) == 2 and "cannot heal and poison the same player" in prompts[1]
+    assert (gm.pending_heal, gm.pending_poison) == (victim.player_name, other.player_name)
+    assert state == {"heal": False, "poison": False}
+
+
+def test_witch_cannot_poison_a_dead_player():
+    gm = make_game()
+    witch, victim = seat(gm, "witch"), seat(gm, "villager")
+    dead = seat(gm, "hunter")
+    gm.state.kill(dead.player_name)
+    night(gm, victim)
+    prompts = script(witch, [{"heal": "no", "poison": dead.player_name}] * 3)
+    state = {"heal": True, "poison": True}
+    asyncio.run(gm.witch_night_action(witch, state, gm.state.alive_names))
+
+    # 每次都被拒绝，重试用完后兜底为不用药
+    assert len(prompts) == 1 + gm.decision_max_retry
+    assert (gm.pending_heal, gm.pending_poison) == (None, None)
+    assert state == {"heal": True, "poison": True}
+
+
+def test_witch_schema_only_offers_remaining_potions():
+    gm = make_game()
+    witch, victim = seat(gm, "witch"), seat(gm, "villager")
+    night(gm, victim)
+    prompts = script(witch, [{"poison": ""}])
+    state = {"heal": False, "poison": True}
+    asyncio.run(gm.witch_night_action(witch, state, gm.state.alive_names))
+
+    assert '"heal"' not in prompts[0] and '"poison"' in prompts[0]
+    assert gm.pending_poison is None and state["poison"]
+
+
+def test_witch_prompt_has_state_summary_and_recall():
+    gm = make_game()
+    witch, victim = seat(gm, "witch"), seat(gm, "villager")
+    gm.memory.add(f"Day 1 {victim.player_name} said: I trust the witch completely.", "speech")
+    gm.memory_mark = len(gm.memory)
+    night(gm, victim)
+    prompts = script(witch, [{"heal": "no", "poison": ""}])
+    asyncio.run(gm.witch_night_action(witch, {"heal": True, "poison": True}, gm.state.alive_names))
+
+    assert gm.get_state_summary().strip() in prompts[0]
+    assert "Current cycle: Night 1" in prompts[0]
+    assert "Relevant earlier events:" in prompts[0] and "I trust the witch" in prompts[0]
+
+
+def test_hunter_last_words_and_shot_in_one_reply():
+    gm = make_game()
+    hunter, wolf = seat(gm, "hunter"), seat(gm, "werewolf")
+    gm.day_count = 1
+    gm.state.kill(hunter.player_name)
+    prompts = script(hunter, [{"last_words": "It was you.", "target": wolf.player_name}])
+    speech = asyncio.run(gm.last_words(hunter.player_name, "banished"))
+
+    assert speech == "It was you."
+    assert len(prompts) == 1 and gm.get_state_summary().split("\n")[0] in prompts[0]
+    assert not gm.state.is_alive(wolf.player_name)
+    assert gm.result().deaths[-1]["cause"] == "killed by hunter"
+
+
+def test_hunter_cannot_shoot_a_dead_player_or_when_poisoned():
+    gm = make_game()
+    hunter, dead = seat(gm, "hunter"), seat(gm, "villager")
+    gm.state.kill(dead.player_name)
+    gm.state.kill(hunter.player_name)
+    alive_before = list(gm.state.alive_names)
+    prompts = script(hunter, [{"last_words": "bye", "target": dead.player_name}] * 3)
+    asyncio.run(gm.last_words(hunter.player_name, "banished"))
+    # 目标不在存活名单里：重试用完后不开枪
+    assert len(prompts) == 1 + gm.decision_max_retry
+    assert gm.state.alive_names == alive_before
+
+    poisoned = make_game()
+    hunter = seat(poisoned, "hunter")
+    poisoned.state.kill(hunter.player_name)
+    prompts = script(hunter, [])
+    asyncio.run(poisoned.last_words(hunter.player_name, "poison"))
+    # 被毒死的猎人只说遗言，不能开枪
+    assert prompts == [] and len(poisoned.state.alive_names) == 7
+
+
+def test_hunter_prompt_has_recall():
+    gm = make_game()
+    hunter, wolf = seat(gm, "hunter"), seat(gm, "werewolf")
+    gm.memory.add(f"Night 1: {wolf.player_name} was checked by the seer: werewolf", "update")
+    gm.memory_mark = len(gm.memory)
+    gm.state.kill(hunter.player_name)
+    prompts = script(hunter, [{"last_words": "", "target": ""}])
+    asyncio.run(gm.last_words(hunter.player_name, "night"))
+    assert "Relevant earlier events:" in prompts[0] and wolf.player_name in prompts[0]
@@ -0,0 +1,107 @@
+"""多人设批量推理：自我介绍和盲投合批、座位块带各自的人设，"knowledge" 范围不混入其他座位的私有信息"""
+import asyncio
+import re
+
+from game import GameManager
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+
+def make_game(seed=3, persona_batch_size=0, **kwargs):
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=seed, quiet=True,
+                     save_history=False, persona_batch_size=persona_batch_size, **kwargs)
+
+    prompts = {}       # 座位名 -> 单独请求的提示
+    batches = []       # 批量请求的提示
+    for slot in role_manager.slots:
+        agent = slot.llm_obj
+        single, oneshot = agent.get_response_batch, agent.get_oneshot_response
+
+        def get_response_batch(user_input, profile=None, schema=None, _name=slot.player_name, _f=single):
+            prompts[_name] = user_input
+            return _f(user_input, profile, schema)
+
+        def get_oneshot_response(messages, profile=None, schema=None, _f=oneshot):
+            batches.append(messages[-1]["content"])
+            return _f(messages, profile, schema)
+
+        agent.get_response_batch = get_response_batch
+        agent.get_oneshot_response = get_oneshot_response
+    return gm, prompts, batches
+
+
+def vote(gm, blind):
+    return asyncio.run(gm.multi_turn_choose(
+        actors=gm.alive, alive_players=gm.alive, prompt_header="You are voting.",
+        system_info=gm.get_state_summary(), visibility={"mode": "none"}, blind=blind,
+    ))
+
+
+def test_sequential_vote_is_never_batched():
+    gm, prompts, batches = make_game(persona_batch_size=4)
+    rounds = vote(gm, blind=False)
+    assert batches == []
+    # 后投的人能看到前面的人的票
+    first, last = gm.alive[0].player_name, gm.alive[-1].player_name
+    assert f"{first} → {rounds[0][first]['target']}" in prompts[last]
+
+
+def test_knowledge_scope_batches_only_partners():
+    plain, plain_prompts, _ = make_game(persona_batch_size=0)
+    vote(plain, blind=True)
+    batched, batched_prompts, batches = make_game(persona_batch_size=4, persona_batch_scope="knowledge")
+    vote(batched, blind=True)
+
+    # 盲投时谁都看不到本轮别人的票
+    assert not any("→" in p for p in plain_prompts.values())
+
+    wolves = {p.player_name for p in batched.alive if p.role.lower() == "werewolf"}
+    assert batches, "狼人同伴应当合批"
+    for prompt in batches:
+        seats = set(re.findall(r"^### (.+)$", prompt, re.M))
+        # 只合并彼此知道底细的座位：批次里全是狼人，不出现其他角色
+        assert seats <= wolves and len(seats) > 1
+        others = {s.role for s in batched.alive if s.player_name not in seats}
+        assert not any(f"role: {role}." in prompt for role in others - {"werewolf"})
+
+    # 没有合批的座位收到的提示与不开批量时完全相同
+    assert set(batched_prompts) == set(plain_prompts) - wolves
+    for name, prompt in batched_prompts.items():
+        assert prompt == plain_prompts[name]
+
+
+def phase_calls(seed, **kwargs):
+    gm, _, _ = make_game(seed=seed, **kwargs)
+    result = gm.game()
+    return {phase: s["calls"] for phase, s in result.usage["by_phase"].items()}, result
+
+
+def test_batching_cuts_calls_in_a_default_game():
+    plain, _ = phase_calls(5)
+    batched, result = phase_calls(5, persona_batch_size=4)
+    # 8 个同模型座位：自我介绍从 8 次降到 2 次
+    assert plain["intro"] == 8
+    assert batched["intro"] == 2
+    assert sum(batched.values()) < sum(plain.values())
+    assert result.winner != "Unknown"
+
+
+def test_blind_vote_is_batched_per_round():
+    calls, result = phase_calls(5, persona_batch_size=4, blind_vote=True)
+    # 每天的公投：存活座位按 4 个一批（遗言 / 猎人开枪另算，所以只比较下限）
+    assert calls["vote"] < sum(len(day["votes"]) for day in result.votes)
+
+
+def test_seat_block_carries_each_seats_persona_and_role_prompt():
+    gm, _, batches = make_game(persona_batch_size=8)
+    asyncio.run(gm.intro_phase())
+    assert len(batches) == 1
+    for slot in gm.role_manager.slots:
+        block = "".join(gm.role_manager.seat_prompt_segments(slot)).strip()
+        assert block in batches[0]
+        # 座位块与该座位单独请求时的系统提示（去掉共用规则块）一致
+        assert "".join(slot.llm_obj.history.system_parts[1:]).strip() == block
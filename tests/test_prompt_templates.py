@@ -0,0 +1,61 @@
+"""提示词模板：静态部分只编译一次并去掉多余空白，每局的规则块 / 角色块只渲染一次"""
+from game import GameManager
+from llm_manager import LLMManager
+from prompt_templates import BlockCache, PromptTemplate, TemplateRegistry
+from role_manager import RoleManager
+
+
+def test_template_strips_indentation_and_blank_lines():
+    template = PromptTemplate("t", """
+        Round {round_id}.
+        You are {role}.
+
+
+        Alive players: {alive}
+    """)
+    assert template.text == "Round {round_id}.\nYou are {role}.\n\nAlive players: {alive}"
+    assert template.fields == ("round_id", "role", "alive")
+    assert template.render(round_id=2, role="seer", alive="A, B").startswith("Round 2.\nYou are seer.")
+
+
+def test_registry_counts_only_static_tokens():
+    registry = TemplateRegistry()
+    registry.register("short", "Vote {target}")
+    registry.register("long", "Vote {target} " + "please think carefully " * 10)
+    counts = registry.token_counts()
+    assert counts["short"] < counts["long"]
+    assert registry.render("short", target="Bob" * 50) == "Vote " + "Bob" * 50
+    assert registry.token_counts() == counts        # 填入的值不影响静态部分的计数
+
+
+def test_block_cache_builds_once_until_cleared():
+    cache = BlockCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return "rules text"
+
+    assert cache.get(("rules",), build) is cache.get(("rules",), build)
+    assert len(calls) == 1 and ("rules",) in cache.token_counts()
+    cache.clear()
+    cache.get(("rules",), build)
+    assert len(calls) == 2
+
+
+def test_role_blocks_are_rendered_once_per_game():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=1, quiet=True, save_history=False)
+
+    counts = gm.prompt_token_counts()
+    assert "template:speak_round" in counts and "rules" in counts
+    # 默认 8 人局有 6 种角色：每种角色一个缓存块，与座位数无关
+    role_keys = [k for k in counts if k.startswith("role:")]
+    assert sorted(role_keys) == sorted(f"role:{r}" for r in set(s.role for s in role_manager.slots))
+
+    first_rules = role_manager.generate_prompt_segments("seer")[0]
+    role_manager.restart()                          # 新的一局重新渲染
+    assert role_manager.generate_prompt_segments("seer")[0] is not first_rules
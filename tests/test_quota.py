@@ -0,0 +1,158 @@
+"""clients.Quota / RateLimiter 的额度判断，以及 farm 的额度代理在多个进程之间共享额度"""
+import asyncio
+import multiprocessing as mp
+import secrets
+import time
+
+import clients
+from farm import BrokeredLimiter, BrokerManager, connect_limiters
+
+
+def test_quota_rpm_spacing():
+    quota = clients.Quota(rpm=60)
+    assert quota.try_acquire(now=100.0) == 0.0
+    quota.release(now=100.0)
+    assert quota.try_acquire(now=100.5) == 0.5      # 相邻两次至少间隔 1 秒
+    assert quota.try_acquire(now=101.0) == 0.0
+
+
+def test_quota_concurrency_cap():
+    quota = clients.Quota(concurrency=2)
+    assert quota.try_acquire() == 0.0
+    assert quota.try_acquire() == 0.0
+    assert quota.try_acquire() == clients.Quota.POLL
+    quota.release()
+    assert quota.try_acquire() == 0.0
+
+
+def test_quota_tpm_window_settles_actual_usage():
+    quota = clients.Quota(tpm=1000)
+    assert quota.try_acquire(400, now=0.0) == 0.0
+    quota.release(400, used=900, now=1.0)           # 实际用量比预占多
+    assert quota.try_acquire(200, now=2.0) == 60.0 - 2.0
+    assert quota.try_acquire(200, now=60.5) == 0.0  # 第一条记录滑出窗口后放行
+
+
+def test_rate_limiter_paces_requests():
+    async def main():
+        limiter = clients.RateLimiter(rpm=1200)     # 0.05 秒一个
+        start = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+            limiter.release()
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.19
+
+
+def test_brokered_limiter_does_not_block_the_event_loop():
+    class SlowBroker:
+        def acquire(self, key, rate_limit, tokens=0):
+            time.sleep(0.2)                         # 模拟一次慢的 socket 往返
+            return 0.0
+
+        def release(self, key, tokens=0, used=None):
+            pass
+
+    async def main():
+        limiter = BrokeredLimiter(SlowBroker(), ("u", "m"), {"rpm": 1})
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        await limiter.acquire()
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 5
+
+
+def test_pending_releases_are_delivered_when_the_worker_shuts_down():
+    from concurrent.futures import ThreadPoolExecutor
+
+    class SlowBroker:
+        released = 0
+
+        def acquire(self, key, rate_limit, tokens=0):
+            return 0.0
+
+        def release(self, key, tokens=0, used=None):
+            time.sleep(0.05)
+            SlowBroker.released += 1
+
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def main():
+        limiter = BrokeredLimiter(SlowBroker(), ("u", "m"), {"concurrency": 1}, executor)
+        for _ in range(3):
+            await limiter.acquire()
+            limiter.release()
+
+    asyncio.run(main())                             # 事件循环关闭时归还还在排队
+    executor.shutdown(wait=True)
+    assert SlowBroker.released == 3
+
+
+def _client(address, authkey, rate_limit, count, hold, out):
+    """子进程：经额度代理申请 count 个名额，每个占用 hold 秒，记下 (开始, 结束) 时间"""
+    executor = connect_limiters(address, authkey)
+
+    async def main():
+        limiter = clients.get_limiter("http://example", "m", rate_limit)
+        spans = []
+        for _ in range(count):
+            await limiter.acquire(10)
+            start = time.time()
+            await asyncio.sleep(hold)
+            spans.append((start, time.time()))
+            limiter.release(10, 10)
+        return spans
+
+    spans = asyncio.run(main())
+    executor.shutdown(wait=True)                    # 退出前送达排队中的归还
+    out.put(spans)
+
+
+def run_clients(rate_limit, processes, count, hold):
+    authkey = secrets.token_bytes(16)
+    manager = BrokerManager(address=("127.0.0.1", 0), authkey=authkey)
+    manager.start()
+    try:
+        ctx = mp.get_context("spawn")
+        out = ctx.Queue()
+        procs = [ctx.Process(target=_client, args=(manager.address, authkey, rate_limit, count, hold, out))
+                 for _ in range(processes)]
+        for p in procs:
+            p.start()
+        spans = [span for _ in procs for span in out.get(timeout=60)]
+        for p in procs:
+            p.join(timeout=10)
+        stats = manager.broker().stats()
+    finally:
+        manager.shutdown()
+    return sorted(spans), stats
+
+
+def test_rpm_is_shared_across_processes():
+    spans, stats = run_clients({"rpm": 600}, processes=3, count=4, hold=0.0)
+    starts = [s for s, _ in spans]
+    assert len(starts) == 12
+    # 3 个进程合计 12 次请求，按 0.1 秒一个排队，总跨度至少 1.1 秒
+    assert starts[-1] - starts[0] >= 1.1 - 0.05
+    assert stats["m@http://example"]["granted"] == 12
+
+
+def test_concurrency_is_shared_across_processes():
+    spans, stats = run_clients({"concurrency": 2}, processes=4, count=3, hold=0.1)
+    events = sorted([(s, 1) for s, _ in spans] + [(e, -1) for _, e in spans], key=lambda x: (x[0], x[1]))
+    in_flight = peak = 0
+    for _, delta in events:
+        in_flight += delta
+        peak = max(peak, in_flight)
+    assert peak <= 2
+    assert stats["m@http://example"]["in_flight"] == 0
@@ -0,0 +1,79 @@
+"""同一种子 → 同一局：顺序、单循环并发、多进程三种跑法的胜负和事件日志完全一致"""
+import asyncio
+
+from batch_runner import build_llm_manager, run_games, run_games_async
+from farm import run_farm
+from game import GameManager
+from role_manager import RoleManager
+
+CONFIG = {
+    "bots": {
+        "smart": {"policy": "heuristic", "seed": 0},
+        "dumb": {"policy": "random", "seed": 7},
+    },
+    "players": 8,
+    "cache": {"mode": "off"},
+}
+TRAJECTORY = ("winner", "roles", "models", "deaths", "votes", "wolf_kills", "events", "nights", "days")
+
+
+def trajectory(result):
+    data = result.to_dict()
+    return {key: data[key] for key in TRAJECTORY}
+
+
+def play(seed):
+    llm_manager = build_llm_manager(CONFIG)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    return GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=seed, quiet=True,
+                       save_history=False).game()
+
+
+def test_same_seed_same_game():
+    assert trajectory(play(42)) == trajectory(play(42))
+    assert trajectory(play(42))["events"] != trajectory(play(43))["events"]
+
+
+def test_sequential_concurrent_and_farm_agree():
+    games, seed = 6, 100
+    sequential, failures = run_games(build_llm_manager(CONFIG), games, 8, seed=seed)
+    assert not failures
+    concurrent, failures = asyncio.run(run_games_async(CONFIG, games, concurrency=games, players=8, seed=seed))
+    assert not failures
+    farmed, failures, _ = run_farm(CONFIG, games, workers=2, concurrency=2, seed=seed)
+    assert not failures
+
+    expected = [trajectory(r) for r in sequential]
+    assert [trajectory(r) for r in concurrent] == expected
+    assert [trajectory(r) for r in farmed] == expected
+    assert [r.seed for r in farmed] == [seed + i for i in range(games)]
+
+
+def test_sequential_reuse_does_not_leak_between_games():
+    """复用同一批 agent 连跑时，第 i 局与单独跑第 i 局相同"""
+    batch, _ = run_games(build_llm_manager(CONFIG), 3, 8, seed=5)
+    alone, _ = run_games(build_llm_manager(CONFIG), 1, 8, seed=7)
+    assert trajectory(batch[2]) == trajectory(alone[0])
+
+
+def test_interactive_entry_is_reproducible(tmp_path, monkeypatch):
+    """main.py 的流程：入座（抽选模型）发生在 GameManager 播种之前，同一种子也要得到同一局"""
+    import main
+    from llm_manager import LLMManager
+
+    monkeypatch.chdir(tmp_path)                     # 对局记录写到临时目录
+    monkeypatch.setattr(main, "LLM_PLAYER_NUMBER", 7)
+
+    def run(seed):
+        llm_manager = LLMManager()
+        for i in range(8):
+            llm_manager.add_bot(f"bot{i}", policy="heuristic" if i % 2 else "random", seed=i)
+        answers = iter(["n", str(seed)])            # 不自定义名字；种子；之后人类玩家一律弃权
+        monkeypatch.setattr("builtins.input", lambda prompt="": next(answers, ""))
+        return main.start_game(llm_manager)
+
+    first, again = run(42), run(42)
+    assert trajectory(first) == trajectory(again)
+    assert first.seed == 42
+    assert any(trajectory(run(seed))["models"] != trajectory(first)["models"] for seed in (43, 44, 45))
@@ -0,0 +1,156 @@
+"""响应缓存：录制 / 重放 / 读穿 / 按最近使用淘汰"""
+import pytest
+
+from response_cache import CacheMiss, ResponseCache, cache_key
+
+MESSAGES = [{"role": "system", "content": "rules"}, {"role": "user", "content": "vote"}]
+PARAMS = {"max_tokens": 80, "temperature": 0.3}
+
+
+class Usage:
+    prompt_tokens = 120
+    completion_tokens = 7
+
+
+def test_key_ignores_param_order_and_extra_message_fields():
+    a = cache_key("m", {"a": 1, "b": 2}, MESSAGES)
+    b = cache_key("m", {"b": 2, "a": 1}, [dict(m, name="x") for m in MESSAGES])
+    assert a == b
+    assert a != cache_key("m2", {"a": 1, "b": 2}, MESSAGES)
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    recorder = ResponseCache(path, mode="record")
+    key, entry = recorder.lookup("m", PARAMS, MESSAGES)
+    assert entry is None                            # record 模式总是请求 API
+    recorder.store(key, '{"target": "Bob"}', "stop", Usage())
+    recorder.close()
+
+    replay = ResponseCache(path, mode="replay")
+    _, entry = replay.lookup("m", PARAMS, MESSAGES)
+    assert entry == {"content": '{"target": "Bob"}', "finish_reason": "stop",
+                     "usage": {"prompt_tokens": 120, "completion_tokens": 7}}
+    with pytest.raises(CacheMiss):
+        replay.lookup("m", dict(PARAMS, temperature=0.9), MESSAGES)
+    replay.store(key, "ignored", "stop", Usage())   # replay 模式不写入
+    assert replay.stats()["entries"] == 1
+    replay.close()
+
+
+def test_readthrough_hits_after_first_store(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), mode="readthrough")
+    key, entry = cache.lookup("m", PARAMS, MESSAGES)
+    assert entry is None
+    cache.store(key, "hello", "stop", Usage())
+    assert cache.lookup("m", PARAMS, MESSAGES)[1]["content"] == "hello"
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, mode="readthrough", max_mb=0.0015, touch_batch=1)  # 约 1.5 KB，放得下两条
+    value = {"content": "x" * 600, "finish_reason": "stop", "usage": {}}
+    cache.put("a", value)
+    cache.put("b", value)
+    assert cache.get("a") is not None               # a 比 b 新
+    cache.put("c", value)                           # 超出容量，淘汰最久未用的 b
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.evicted == 1
+    assert cache.total_bytes <= cache.max_bytes
+    cache.close()
+
+    reopened = ResponseCache(path, mode="readthrough", max_mb=0.0015)
+    assert reopened.stats()["entries"] == 2         # 容量记账在重新打开后保持一致
+    assert reopened.total_bytes <= reopened.max_bytes
+    reopened.close()
+
+
+def test_capacity_is_shared_by_every_connection_to_the_file(tmp_path):
+    """farm.py 的各工作进程各自打开同一个文件：max_mb 是整个文件的上限，而不是每个连接各一份"""
+    path = str(tmp_path / "cache.sqlite")
+    a = ResponseCache(path, mode="readthrough", max_mb=0.0015)
+    b = ResponseCache(path, mode="readthrough", max_mb=0.0015)
+    value = {"content": "x" * 600, "finish_reason": "stop", "usage": {}}
+    a.put("a1", value)
+    b.put("b1", value)
+    a.put("a2", value)                              # 文件里已有 a1、b1：淘汰最久未用的 a1
+    b.put("b2", value)
+
+    assert a.stats()["entries"] == 2
+    assert b.total_bytes <= b.max_bytes
+    assert a.get("a1") is None and a.get("b2") is not None
+    a.close()
+    b.close()
+
+
+def test_agent_replays_recorded_game_offline(tmp_path):
+    """对着本地模拟服务录制，关掉服务后用 replay 模式得到逐字相同的回复"""
+    from agent import MultiTurnChatAgent
+    from mock_server import MockConfig, MockServer
+
+    path = str(tmp_path / "cache.sqlite")
+    prompts = ["Introduce yourself.", 'Vote. Return ONLY JSON: {"target": "<name>"}']
+
+    def run(mode, base_url):
+        cache = ResponseCache(path, mode=mode)
+        agent = MultiTurnChatAgent(api_key="x", base_url=base_url, model="mock", stream_mode=False)
+        agent.response_cache = cache
+        replies = [agent.get_response_batch(p) for p in prompts]
+        cache.close()
+        return replies, [rec["cached"] for rec in agent.call_log]
+
+    server = MockServer(MockConfig(port=0, seed=1)).start()
+    try:
+        recorded, cached = run("record", server.base_url)
+    finally:
+        server.stop()
+    assert cached == [False, False]
+
+    replayed, cached = run("replay", "http://127.0.0.1:9/v1")     # 服务已关闭，只能走缓存
+    assert replayed == recorded
+    assert cached == [True, True]
+
+
+def test_agent_replay_miss_raises_instead_of_replying(tmp_path):
+    """replay 未命中不能变成 "发生错误: ..." 回复文本，否则偏离录制的对局仍然"成功"跑完"""
+    import asyncio
+
+    from agent import MultiTurnChatAgent
+
+    cache = ResponseCache(str(tmp_path / "empty.sqlite"), mode="replay")
+    agent = MultiTurnChatAgent(api_key="x", base_url="http://127.0.0.1:9/v1", model="mock", stream_mode=False)
+    agent.response_cache = cache
+
+    with pytest.raises(CacheMiss):
+        agent.get_response_batch("Vote.")
+    with pytest.raises(CacheMiss):
+        agent.get_response_stream("Vote.")
+    with pytest.raises(CacheMiss):
+        agent.get_oneshot_response(MESSAGES)
+    with pytest.raises(CacheMiss):
+        asyncio.run(agent.get_response_batch_async("Vote."))
+    with pytest.raises(CacheMiss):
+        asyncio.run(agent.get_oneshot_response_async(MESSAGES))
+    assert agent.call_log == []
+    cache.close()
+
+
+def test_batch_records_replay_miss_as_failed_game(tmp_path, monkeypatch):
+    from batch_runner import build_llm_manager, run_games
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".env").write_text("M_API_KEY=x\n", encoding="utf-8")
+    config = {
+        "models": {"m": {"base_url": "http://127.0.0.1:9/v1", "model": "mock"}},
+        "players": 4,
+        "cache": {"mode": "replay", "path": str(tmp_path / "empty.sqlite")},
+        "game": {"role_counts": {"villager": 2, "werewolf": 1, "seer": 1}},
+    }
+    results, failures = run_games(build_llm_manager(config), 2, config["players"], 0, config["game"])
+    assert results == []
+    assert [f["seed"] for f in failures] == [0, 1]
+    assert all(f["error"].startswith("CacheMiss") for f in failures)
@@ -0,0 +1,41 @@
+"""按计数向量分配角色：人数守恒、最少狼人数、单一角色上限、比例放大"""
+import random
+
+import numpy as np
+
+import role_allocation
+
+SETUP = {"villager": 2, "werewolf": 2, "seer": 1, "witch": 1, "hunter": 1, "jester": 1}
+
+
+def test_exact_setup_is_used_as_is():
+    assert role_allocation.allocate_counts(SETUP, 8, random.Random(0)) == SETUP
+
+
+def test_every_draw_keeps_invariants():
+    gen = np.random.default_rng(0)
+    for players in range(4, 16):
+        roles, counts = role_allocation.allocate_batch(SETUP, players, 2000, gen)
+        assert (counts.sum(axis=1) == players).all()
+        assert (counts >= 0).all()
+        wolves = counts[:, roles.index("werewolf")]
+        assert (wolves >= role_allocation.min_wolves(players)).all()
+        for single in ("witch", "jester"):
+            assert (counts[:, roles.index(single)] <= 1).all()
+
+
+def test_scaling_up_keeps_proportions():
+    counts = role_allocation.allocate_counts({"villager": 2, "werewolf": 1}, 12, random.Random(0))
+    assert counts == {"villager": 8, "werewolf": 4}
+
+
+def test_same_rng_state_same_setup():
+    a = role_allocation.allocate_counts(SETUP, 6, random.Random(42))
+    b = role_allocation.allocate_counts(SETUP, 6, random.Random(42))
+    assert a == b
+
+
+def test_truncation_matches_hypergeometric_mean():
+    result = role_allocation.simulate(SETUP, 6, draws=200_000, seed=1)
+    # 8 个角色抽 6 个：seer 的期望数量为 6 / 8
+    assert abs(result["mean"]["seer"] - 0.75) < 0.01
@@ -0,0 +1,58 @@
+"""系统提示按段共享：规则块 / 角色块每局一个字符串对象，只有名字和人设是座位私有的"""
+from game import GameManager
+from llm_manager import LLMManager
+from role_manager import RoleManager
+
+
+def make_game(seed=10):
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0, keep_history=True)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    return GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=seed, quiet=True,
+                       save_history=False)
+
+
+def test_seats_share_the_rules_and_role_segments():
+    gm = make_game()
+    slots = gm.role_manager.slots
+    parts = {s.player_name: s.llm_obj.history.system_parts for s in slots}
+
+    rules = parts[slots[0].player_name][0]
+    assert all(p[0] is rules for p in parts.values())
+    for a in slots:
+        for b in slots:
+            if a.role == b.role:
+                assert parts[a.player_name][1] is parts[b.player_name][1]
+    # 拼接结果与整段生成的提示相同，名字行是座位私有的
+    for s in slots:
+        joined = "".join(parts[s.player_name])
+        assert joined.startswith(gm.role_manager.generate_full_prompt(s.role))
+        assert f"Your player name is: {s.player_name}." in joined
+
+
+def test_persona_blocks_come_from_the_per_game_cache():
+    gm = make_game()
+    cache = gm.role_manager.prompt_cache
+    special = [s for s in gm.role_manager.slots if s.special_character]
+    assert special, "默认的 special 模式下应当有带人设的座位"
+    for s in special:
+        persona = s.llm_obj.history.system_parts[3]
+        assert persona is cache.get(("persona", s.player_name, s.special_category), lambda: None)
+
+
+def test_joined_prompt_is_released_after_a_request():
+    gm = make_game()
+    history = gm.role_manager.slots[0].llm_obj.history
+    view = history.api_view()
+    assert view[0]["content"] == "".join(history.system_parts)
+    history.release_view()
+    assert view[0]["content"] == ""
+
+
+def test_intro_summary_is_one_string_pinned_into_every_seat():
+    gm = make_game()
+    gm.game()
+    pinned = [s.llm_obj.history.pinned["intro"].content for s in gm.role_manager.slots]
+    assert pinned[0].startswith("Self Introductions:")
+    assert all(p is pinned[0] for p in pinned)
@@ -0,0 +1,94 @@
+"""token 统计的分类汇总，以及开局估算与实际对局的对比"""
+from game import GameManager
+from llm_manager import LLMManager
+from role_manager import RoleManager
+from usage import UsageTracker, estimate_game
+
+
+def test_summary_breaks_down_by_call_type():
+    tracker = UsageTracker({"m": {"input": 1.0, "output": 2.0}})
+    tracker.record("A", "m", "speech", 100, 50)
+    tracker.record("B", "m", "speech", 100, 30)
+    tracker.record("A", "m", "decision", 80, 10)
+    by_type = tracker.summary()["by_call_type"]
+    assert by_type["speech"]["calls"] == 2
+    assert by_type["speech"]["completion_tokens"] == 80
+    assert by_type["decision"]["prompt_tokens"] == 80
+
+
+def test_estimate_without_length_is_labelled_upper_bound():
+    est = estimate_game(8, 3, {"m": 1}, {})
+    assert est["basis"] == "upper_bound"
+
+
+def test_expected_estimate_tracks_real_games():
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    games, calls, estimate = 60, 0, None
+    for seed in range(games):
+        role_manager = RoleManager(llm_manager=llm_manager)
+        role_manager.add_llm_agents(player_number=8)
+        gm = GameManager(llm_manager=llm_manager, role_manager=role_manager, seed=seed, quiet=True,
+                         save_history=False, post_game_summary=False)
+        if estimate is None:
+            estimate = gm.estimate_usage()
+        calls += gm.game().usage["calls"]
+
+    mean = calls / games
+    assert estimate["basis"] == "expected"
+    assert estimate["total_calls"] < estimate["upper_bound"]["total_calls"]
+    assert abs(estimate["total_calls"] - mean) / mean < 0.25
+
+
+def make_game(**kwargs):
+    llm_manager = LLMManager()
+    llm_manager.add_bot("bot", policy="random", seed=0)
+    role_manager = RoleManager(llm_manager=llm_manager)
+    role_manager.add_llm_agents(player_number=8)
+    return GameManager(llm_manager=llm_manager, role_manager=role_manager, quiet=True, save_history=False,
+                       **kwargs)
+
+
+def test_crossing_the_budget_switches_to_cheaper_call_profiles():
+    gm = make_game(seed=1, token_budget=1000)
+    seat = gm.role_manager.slots[0]
+    normal = gm.get_call_profile(seat.llm_obj, "speech")
+
+    gm.on_llm_call(seat.player_name, "bot", {"call_type": "speech", "prompt_tokens": 900, "output_tokens": 50})
+    assert not gm.budget_exceeded
+    gm.on_llm_call(seat.player_name, "bot", {"call_type": "speech", "prompt_tokens": 40, "output_tokens": 10})
+    assert gm.budget_exceeded and gm.usage.total_tokens == 1000
+
+    cheap = gm.get_call_profile(seat.llm_obj, "speech")
+    assert normal["max_tokens"] == gm.speech_length * 2
+    assert cheap["max_tokens"] == gm.budget_profiles["speech"]["max_tokens"] < normal["max_tokens"]
+    assert cheap["temperature"] == normal["temperature"]       # 省钱配置只覆盖给出的字段
+
+
+def test_cost_budget_counts_priced_models_only():
+    gm = make_game(seed=1, cost_budget=0.01)
+    gm.usage.prices = {"paid": {"input": 10.0, "output": 30.0}}
+    gm.on_llm_call("A", "free", {"call_type": "speech", "prompt_tokens": 10_000, "output_tokens": 10_000})
+    assert not gm.budget_exceeded
+    gm.on_llm_call("A", "paid", {"call_type": "speech", "prompt_tokens": 400, "output_tokens": 200})
+    assert gm.budget_exceeded                       # 400 * 10 / 1e6 + 200 * 30 / 1e6 = 0.01
+
+
+def test_a_game_over_budget_speaks_once_per_day_and_skips_the_summary():
+    gm = make_game(seed=2, token_budget=1000, post_game_summary=True)
+    for slot in gm.role_manager.slots:
+        hook = slot.llm_obj.usage_hook               # 脚本机器人不计 token：每次调用按 100 个输入 token 记账
+        slot.llm_obj.usage_hook = lambda rec, hook=hook: hook(dict(rec, prompt_tokens=100))
+    gm.game()
+
+    assert gm.budget_exceeded
+    records = gm.usage.records
+    speeches = [r for r in records if r["call_type"] == "speech"]
+    # 第一天开始发言时早已超出预算：每天只发言一轮，且都用省钱配置
+    assert len(speeches) <= 8 * gm.day_count
+    first_day = [r for r in records[:records.index(speeches[0]) + 8] if r["call_type"] == "speech"]
+    assert len({r["seat"] for r in first_day}) == len(first_day)
+    limits = {rec["max_tokens"] for slot in gm.role_manager.slots for rec in slot.llm_obj.call_log
+              if rec["call_type"] == "speech"}
+    assert limits == {gm.budget_profiles["speech"]["max_tokens"]}
+    assert not any(r["phase"] == "summary" for r in records)
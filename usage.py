@@ -0,0 +1,169 @@
+"""
+token / 费用统计：
+- UsageTracker：按调用、座位、阶段、模型、调用类型、整局汇总 token 和费用，支持每局预算
+- estimate_game：开局前的粗略估算（调用次数 / token / 费用）：给出对局长度分布时按期望局长估算，
+  否则按“每轮只减员 2 人、一直打满 rounds 轮”估算，是上限
+
+价格取自 llm_configs.json 中每个模型的 "price": {"input": 每百万输入 token, "output": 每百万输出 token}。
+"""
+
+
+class UsageTracker:
+    def __init__(self, prices=None, token_budget=0, cost_budget=0.0):
+        self.prices = prices or {}          # {model: {"input": x, "output": y}}
+        self.token_budget = token_budget    # 0 = 不限
+        self.cost_budget = cost_budget      # 0 = 不限
+        self.phase = "setup"
+        self.records = []
+        self.total_tokens = 0
+        self.total_cost = 0.0
+
+    def cost_of(self, model, prompt_tokens, completion_tokens):
+        price = self.prices.get(model)
+        if not price:
+            return 0.0
+        return (prompt_tokens * price.get("input", 0) + completion_tokens * price.get("output", 0)) / 1_000_000
+
+    def record(self, seat, model, call_type, prompt_tokens, completion_tokens, cached=False):
+        """cached=True 的调用来自响应缓存：照常计入 token / 费用（重放与录制的预算判断一致），另外单独汇总"""
+        cost = self.cost_of(model, prompt_tokens, completion_tokens)
+        self.records.append({
+            "seat": seat,
+            "model": model,
+            "phase": self.phase,
+            "call_type": call_type,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost": cost,
+            "cached": cached,
+        })
+        self.total_tokens += prompt_tokens + completion_tokens
+        self.total_cost += cost
+
+    def over_budget(self):
+        if self.token_budget and self.total_tokens >= self.token_budget:
+            return True
+        if self.cost_budget and self.total_cost >= self.cost_budget:
+            return True
+        return False
+
+    def aggregate(self, key):
+        """按 key（seat / phase / model / call_type）汇总"""
+        out = {}
+        for rec in self.records:
+            s = out.setdefault(rec[key], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+            s["calls"] += 1
+            s["prompt_tokens"] += rec["prompt_tokens"]
+            s["completion_tokens"] += rec["completion_tokens"]
+            s["cost"] += rec["cost"]
+        return out
+
+    def summary(self):
+        return {
+            "calls": len(self.records),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in self.records),
+            "completion_tokens": sum(r["completion_tokens"] for r in self.records),
+            "total_tokens": self.total_tokens,
+            "cost": round(self.total_cost, 6),
+            "cached_calls": sum(1 for r in self.records if r["cached"]),
+            "cached_cost": round(sum(r["cost"] for r in self.records if r["cached"]), 6),
+            "by_phase": self.aggregate("phase"),
+            "by_seat": self.aggregate("seat"),
+            "by_model": self.aggregate("model"),
+            "by_call_type": self.aggregate("call_type"),
+        }
+
+
+def estimate_game(
+    player_count,
+    rounds,
+    model_mix,
+    call_profiles,
+    prices=None,
+    speak_rounds=2,
+    wolf_ratio=0.25,
+    system_tokens=500,
+    history_tokens=1200,
+    template_tokens=None,
+    output_fill=0.6,
+    retry_rate=0.1,
+    length=None,
+    post_game=True,
+):
+    """
+    开局前的粗略估算。
+    model_mix：{model: 座位占比}，例如 {"qwen-plus": 0.5, "deepseek-chat": 0.5}
+    rounds：length 缺省时使用：假设打满 rounds 轮、每轮按 1 夜杀 + 1 放逐减员（上限）
+    length：对局长度分布（见 batch_sim.length_profile），每轮 (进入该夜的概率, 该夜平均存活,
+            进入该白天的概率, 该白天平均存活)；给出时按期望值估算
+    system_tokens / history_tokens：每次请求携带的系统提示与历史的平均长度
+    output_fill：实际输出占 max_tokens 的比例
+    post_game：是否有赛后点评和总结
+    返回 {"basis": "expected" | "upper_bound", "calls": {...}, "prompt_tokens", "completion_tokens", "cost", "by_model"}
+    """
+    template_tokens = template_tokens or {}
+    base_prompt = system_tokens + history_tokens
+
+    calls = {"intro": player_count, "decision": 0, "compound": 0, "speech": 0,
+             "last_words": 0, "comment": player_count if post_game else 0, "summary": 1 if post_game else 0}
+    if length is None:
+        basis = "upper_bound"
+        alive = player_count
+        for _ in range(rounds):
+            wolves = max(1, round(alive * wolf_ratio))
+            calls["decision"] += wolves + 1          # 狼人夜杀 + 预言家
+            calls["compound"] += 1                   # 女巫
+            calls["last_words"] += 2                 # 夜里死 1 + 白天放逐 1
+            calls["speech"] += speak_rounds * alive
+            calls["decision"] += alive               # 公投
+            alive = max(2, alive - 2)
+    else:
+        basis = "expected"
+        start = length[0][1] if length else player_count
+        for r, (p_night, night_alive, p_day, day_alive) in enumerate(length):
+            # 预言家 / 女巫还活着的概率按整体存活比例近似
+            survive = night_alive / start
+            wolves = max(1, round(night_alive * wolf_ratio))
+            calls["decision"] += p_night * (wolves + survive)
+            calls["compound"] += p_night * survive
+            calls["speech"] += p_day * speak_rounds * day_alive
+            calls["decision"] += p_day * day_alive
+            # 遗言：夜里死亡 + 白天放逐的期望人数
+            next_alive = length[r + 1][1] if r + 1 < len(length) else day_alive - 1
+            calls["last_words"] += p_day * (max(0.0, night_alive - day_alive) + max(0.0, day_alive - next_alive))
+    calls["decision"] *= 1 + retry_rate
+    calls = {k: round(v) for k, v in calls.items()}
+
+    template_of = {"intro": "intro", "decision": "choose", "compound": "choose", "speech": "speak_round",
+                   "last_words": "last_words", "comment": "post_game_comment", "summary": "final_summary"}
+
+    prompt_tokens = 0
+    completion_tokens = 0
+    for call_type, n in calls.items():
+        profile = call_profiles.get(call_type, {})
+        max_out = profile.get("max_tokens") or 100
+        prompt_tokens += n * (base_prompt + template_tokens.get(template_of[call_type], 60))
+        completion_tokens += int(n * max_out * output_fill)
+
+    prices = prices or {}
+    total_share = sum(model_mix.values()) or 1
+    by_model = {}
+    cost = 0.0
+    for model, share in model_mix.items():
+        frac = share / total_share
+        p_tok = int(prompt_tokens * frac)
+        c_tok = int(completion_tokens * frac)
+        price = prices.get(model, {})
+        m_cost = (p_tok * price.get("input", 0) + c_tok * price.get("output", 0)) / 1_000_000
+        by_model[model] = {"prompt_tokens": p_tok, "completion_tokens": c_tok, "cost": round(m_cost, 6)}
+        cost += m_cost
+
+    return {
+        "basis": basis,
+        "calls": calls,
+        "total_calls": sum(calls.values()),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost": round(cost, 6),
+        "by_model": by_model,
+    }